@@ -1,52 +1,75 @@
-from spatialmath import SE3  # Manejo de transformaciones espaciales
 import numpy as np
-from roboticstoolbox import *  # Librería de Peter Corke
+
+from cache_ik import huella, cargar_tabla, guardar_tabla, IK_CACHE_FILE
+from ik_analitica import IKAnalitica
+
+# La cinemática inversa es analítica (ik_analitica). roboticstoolbox (Librería
+# de Peter Corke) tarda varios segundos en importarse y solo se carga si se pide
+# el DHRobot (ver get_robot), por ejemplo para validar la IK contra fkine.
+# Las poses se arman con NumPy como matrices homogéneas 4x4.
+
+
+# -------------------------------
+# Transformaciones homogéneas
+# -------------------------------
+def transl(x, y, z):
+    T = np.eye(4)
+    T[:3, 3] = (x, y, z)
+    return T
+
+
+def rotz(theta):
+    c, s = np.cos(theta), np.sin(theta)
+    T = np.eye(4)
+    T[:2, :2] = [[c, -s], [s, c]]
+    return T
 
 # -------------------------------
 # Función para obtener la posición según el valor c
 # -------------------------------
 ultimoservo=180  # Variable para almacenar la última posición del servo
+# Devuelve (T, servo) con T como matriz homogénea 4x4 de NumPy
 def valor(c):
-    H=SE3.Rz(1.5708) * SE3(.218, 0, .365)
+    H = rotz(1.5708) @ transl(.218, 0, .365)
     abierto = 180
     cerrado = 40
     global ultimoservo
     match c:
         case 0:
             ultimoservo= abierto
-            return H* SE3(0, -.12857, 0), abierto
+            return H @ transl(0, -.12857, 0), abierto
         case 1:
             ultimoservo= abierto
-            return H *SE3(0, -.08571, 0), abierto
+            return H @ transl(0, -.08571, 0), abierto
         case 2:
             ultimoservo= abierto
-            return H* SE3(0, -.04285, 0), abierto
+            return H @ transl(0, -.04285, 0), abierto
         case 3:
             ultimoservo= abierto
-            return H * SE3(0, 0, 0), abierto
+            return H @ transl(0, 0, 0), abierto
         case 4:
             ultimoservo= abierto
-            return H *SE3(0, .04285, 0), abierto
+            return H @ transl(0, .04285, 0), abierto
         case 5:
             ultimoservo= abierto
-            return H* SE3(0, .08571, 0), abierto
+            return H @ transl(0, .08571, 0), abierto
         case 6:
             ultimoservo= abierto
-            return H* SE3(0, .12857, 0), abierto
+            return H @ transl(0, .12857, 0), abierto
         case 7:
             ultimoservo= cerrado
-            return SE3(.196, 0, .317), cerrado
+            return transl(.196, 0, .317), cerrado
         case 8:
             ultimoservo= cerrado
-            return SE3(.196, 0, .317), abierto
+            return transl(.196, 0, .317), abierto
         case 9:
-            return SE3(.118, .068, .425), ultimoservo
+            return transl(.118, .068, .425), ultimoservo
         case 10: # agarrar ficha en un punto alto
             ultimoservo= cerrado
-            return SE3(.164, 0, .412), cerrado
+            return transl(.164, 0, .412), cerrado
         case 11: #mover el robot a lq altura del punto medio
             ultimoservo= abierto
-            return SE3(.164, 0, .412), abierto
+            return transl(.164, 0, .412), abierto
         case _:
             raise ValueError("El valor debe ser un número entero entre 1 y 7.")
 
@@ -56,8 +79,8 @@ def valor(c):
 # -------------------------------
 def mt(c):
     T, servo = valor(c)
-    x = round(T.t[0], 4)
-    y = round(T.t[1], 4)
+    x = round(T[0, 3], 4)
+    y = round(T[1, 3], 4)
     return T, x, y, servo
 
 
@@ -69,39 +92,111 @@ l2 = float(0.210)
 l3 = float(.0901)
 l4 = float(.10)
 
-robot = DHRobot([
-    RevoluteDH(d=l1, a=0, alpha=-(np.pi / 2), offset=0, qlim=[-np.pi, np.pi]),
-    RevoluteDH(d=0, a=l2, alpha=0, offset=-(np.pi / 2), qlim=[(-np.pi) / 4, (np.pi) / 4]),
-    RevoluteDH(d=0, a=l3, alpha=np.pi, offset=(np.pi / 2), qlim=[(-np.pi) / 2, (np.pi) / 2]),
-    RevoluteDH(d=0, a=l4, alpha=0, offset=0, qlim=[(-np.pi) / 2, (np.pi) / 2]),
-], name='MyRobot')
+# Parámetros DH de cada articulación: (d, a, alpha, offset, qlim)
+DH = [
+    (l1, 0, -(np.pi / 2), 0, [-np.pi, np.pi]),
+    (0, l2, 0, -(np.pi / 2), [(-np.pi) / 4, (np.pi) / 4]),
+    (0, l3, np.pi, (np.pi / 2), [(-np.pi) / 2, (np.pi) / 2]),
+    (0, l4, 0, 0, [(-np.pi) / 2, (np.pi) / 2]),
+]
+
+IK = IKAnalitica(DH)
+VERSION_IK = 4  # cambia con el método de IK o el formato de la caché para no reutilizar los anteriores
+
+_robot = None
+
+
+def get_robot():
+    """DHRobot del brazo; importa roboticstoolbox la primera vez que se pide."""
+    global _robot
+    if _robot is None:
+        from roboticstoolbox import DHRobot, RevoluteDH
+        _robot = DHRobot([
+            RevoluteDH(d=d, a=a, alpha=alpha, offset=offset, qlim=qlim) for d, a, alpha, offset, qlim in DH
+        ], name='MyRobot')
+    return _robot
+
+
+def __getattr__(name):
+    # CI.robot sigue disponible, pero se construye solo al usarlo
+    if name == "robot":
+        return get_robot()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+OBJETIVOS = range(12)  # casos de valor()
+
+
+# -------------------------------
+# Caché de soluciones IK
+# -------------------------------
+_tabla_ik = None
+
+
+def poses_objetivo():
+    """Matrices 4x4 de todos los objetivos de valor(), sin alterar ultimoservo."""
+    global ultimoservo
+    guardado = ultimoservo
+    poses = [valor(c)[0] for c in OBJETIVOS]
+    ultimoservo = guardado
+    return poses
+
+
+def huella_geometria():
+    return huella(VERSION_IK, [[d, a, alpha, offset, *qlim] for d, a, alpha, offset, qlim in DH], poses_objetivo())
+
+
+def resolver_ik(c, q_actual=None):
+    """
+    Resuelve la cinemática inversa de un objetivo y devuelve los 4 ángulos en grados.
+    Entre las soluciones se queda con la más cercana a q_actual (grados); sin él,
+    la más cercana a [atan2(y, x), 0, 0, 0], como el q_init que usaba ikine_LM.
+    Lanza ik_analitica.SinSolucionIK si el objetivo no se alcanza.
+    """
+    T, x, y, servo = mt(c)
+    q = IK.resolver_T(T, None if q_actual is None else np.radians(q_actual))
+    return [round(angulo, 4) for angulo in np.degrees(q)]
+
+
+def tabla_ik(path=IK_CACHE_FILE):
+    """
+    Ángulos de todos los objetivos. Se leen del archivo si la huella coincide;
+    si no, se calculan una vez y se guardan.
+    """
+    global _tabla_ik, ultimoservo
+    if _tabla_ik is None:
+        h = huella_geometria()
+        tabla = cargar_tabla(h, path)
+        if tabla is None:
+            guardado = ultimoservo
+            tabla = {c: resolver_ik(c) for c in OBJETIVOS}
+            ultimoservo = guardado
+            guardar_tabla(tabla, h, path)
+        _tabla_ik = tabla
+    return _tabla_ik
 
 
 # -------------------------------
 # FUNCIÓN PRINCIPAL
 # -------------------------------
 def mover_robot(c):
-    try:
-        # Transformación del punto seleccionado
-        T, x, y, servo = mt(c)
-        q1 = round(np.arctan2(y, x), 4)
-        q_init = [q1, 0, 0, 0]
-
-        # Cálculo de la cinemática inversa
-        solution = robot.ikine_LM(T, q_init, mask=[1, 1, 1, 0, 0, 0], joint_limits=True)
-        #print(solution2)
-        q_rad = solution.q
-        q_deg = np.degrees(q_rad)
-        q_deg = [round(angulo, 4) for angulo in q_deg]
-
-        q_deg = np.append(q_deg, servo)
-
-        print(f"Casilla seleccionada: {c}")
-        print("Solución IK:", solution)
-        print("Ángulos (°):", q_deg)
-
-        return q_deg
-
-    except Exception as e:
-        print("Error:", e)
-        return None, None, None
+    """
+    Ángulos (grados) y servo del objetivo c: [q1, q2, q3, q4, servo]. Lanza
+    ik_analitica.SinSolucionIK si no se alcanza y ValueError si c no existe,
+    para que nunca se mande una pose vacía al ESP32. Los ángulos dependen solo
+    de c (siempre la misma solución por objetivo); el servo del punto 9 sigue
+    siendo el último que se mandó (ultimoservo).
+    """
+    # Transformación del punto seleccionado (también actualiza el estado del servo)
+    T, x, y, servo = mt(c)
+
+    # Cinemática inversa: de la caché si el objetivo es fijo, si no se calcula
+    q_deg = tabla_ik().get(c)
+    if q_deg is None:
+        q_deg = resolver_ik(c)
+
+    q_deg = np.append(q_deg, servo)
+
+    print(f"Casilla seleccionada: {c}")
+    print("Ángulos (°):", q_deg)
+
+    return q_deg
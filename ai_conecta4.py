@@ -1,6 +1,16 @@
 import numpy as np
 import random
 import math
+import time
+import collections
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitBoard, WINDOWS, WINDOW_MASKS, CENTER_MASK, H1, is_win_bits
+from move_ordering import MoveOrdering
+from transposition import EXACT, LOWER, UPPER, search_key, TranspositionTable
+from solver import Solver, SolverAborted, score_to_result
 
 # --------------------
 # Configuración / constantes
@@ -11,6 +21,11 @@ EMPTY = 0
 WINDOW_LENGTH = 4
 DEFAULT_DEPTH = 6
 WIN_SCORE = 10**9
+CENTER_WEIGHT = 6         # bonificación por cada ficha propia en la columna central
+TIME_CHECK_NODES = 128   # cada cuántos nodos se revisa el reloj en modo con tiempo
+ID_TT_MB = 4              # tabla temporal para la profundización iterativa si no se pasa tt
+ROOT_TASK_TT_MB = 8       # tabla de cada rama de la raíz en la búsqueda paralela
+SOLVER_EMPTY_CELLS = 16   # con estas casillas vacías o menos el final se resuelve de forma exacta
 
 # --------------------
 # Funciones de tablero
@@ -40,34 +55,63 @@ def get_valid_locations(board):
     return [c for c in range(COLS) if is_valid_location(board, c)]
 
 
+# --------------------
+# Tabla de ventanas para NumPy
+# --------------------
+
+# Índices planos (fila * COLS + columna) de las 69 ventanas de 4 celdas, shape (69, 4).
+# Se arma una sola vez al importar; todas las funciones sobre matrices la usan.
+WINDOW_INDEX = np.array([[r * COLS + c for r, c in w] for w in WINDOWS], dtype=np.intp)
+CENTER_INDEX = np.array([r * COLS + COLS // 2 for r in range(ROWS)], dtype=np.intp)
+
+
+def board_windows(board):
+    """
+    Devuelve las fichas de cada ventana: (69, 4) para un tablero (6,7) o
+    (N, 69, 4) para una pila de tableros (N, 6, 7).
+    """
+    board = np.asarray(board)
+    flat = board.reshape(board.shape[:-2] + (ROWS * COLS,))
+    return flat[..., WINDOW_INDEX]
+
+
+def _scalar_or_array(board, value, kind):
+    # Para un solo tablero se devuelve un escalar de Python, como antes
+    return kind(value) if np.ndim(board) == 2 else value
+
+
 def winning_move(board, piece):
-    # Horizontal
-    for c in range(COLS - 3):
-        for r in range(ROWS):
-            if all(board[r][c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-    # Vertical
-    for c in range(COLS):
-        for r in range(ROWS - 3):
-            if all(board[r + i][c] == piece for i in range(WINDOW_LENGTH)):
-                return True
-    # Diagonal (\)
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            if all(board[r + i][c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-    # Diagonal (/)
-    for r in range(3, ROWS):
-        for c in range(COLS - 3):
-            if all(board[r - i][c + i] == piece for i in range(WINDOW_LENGTH)):
-                return True
-    return False
+    won = np.all(board_windows(board) == piece, axis=-1).any(axis=-1)
+    return _scalar_or_array(board, won, bool)
+
+
+def count_threats(board, piece):
+    """Número de ventanas con 3 fichas de 'piece' y una celda vacía."""
+    windows = board_windows(board)
+    threats = ((windows == piece).sum(axis=-1) == 3) & ((windows == EMPTY).sum(axis=-1) == 1)
+    return _scalar_or_array(board, threats.sum(axis=-1), int)
 
 # --------------------
 # Heurística
 # --------------------
 
-def evaluate_window(window, piece):
+# Pesos de la heurística. Los valores por defecto son los de siempre; otros
+# juegos de pesos se prueban con el torneo de autojuego (tournament.py).
+class EvalParams(collections.namedtuple("EvalParams", "win three two opp_three opp_two center",
+                                        defaults=(10000, 150, 10, -300, -10, CENTER_WEIGHT))):
+    """
+    Pesos de evaluate_window y de la columna central:
+    - win: 4 fichas propias
+    - three / two: 3 o 2 fichas propias con el resto vacío
+    - opp_three / opp_two: lo mismo para el rival (normalmente negativos)
+    - center: por cada ficha propia en la columna central
+    """
+    __slots__ = ()
+
+DEFAULT_PARAMS = EvalParams()
+
+
+def evaluate_window(window, piece, params=DEFAULT_PARAMS):
     score = 0
     opp_piece = 1 if piece == 2 else 2
 
@@ -76,57 +120,75 @@ def evaluate_window(window, piece):
     count_empty = window.count(EMPTY)
 
     if count_piece == 4:
-        score += 10000
+        score += params.win
     elif count_piece == 3 and count_empty == 1:
-        score += 150
+        score += params.three
     elif count_piece == 2 and count_empty == 2:
-        score += 10
+        score += params.two
 
     # Bloqueos del oponente
     if count_opp == 3 and count_empty == 1:
-        score -= 300
+        score += params.opp_three
     elif count_opp == 2 and count_empty == 2:
-        score -= 10
+        score += params.opp_two
 
     return score
 
 
-def score_position(board, piece):
-    score = 0
-    # Prioriza centro
-    center_col = COLS // 2
-    center_array = [int(i) for i in list(board[:, center_col])]
-    center_count = center_array.count(piece)
-    score += center_count * 6
+@functools.lru_cache(maxsize=None)
+def window_scores(params=DEFAULT_PARAMS):
+    """Tabla [fichas propias][fichas rivales] -> puntaje de evaluate_window con 'params'."""
+    return tuple(tuple(evaluate_window([1] * m + [2] * o + [EMPTY] * (WINDOW_LENGTH - m - o), 1, params)
+                       if m + o <= WINDOW_LENGTH else 0
+                       for o in range(WINDOW_LENGTH + 1))
+                 for m in range(WINDOW_LENGTH + 1))
 
-    # Horizontal
-    for r in range(ROWS):
-        row_array = [int(i) for i in list(board[r, :])]
-        for c in range(COLS - 3):
-            window = row_array[c:c + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # Vertical
-    for c in range(COLS):
-        col_array = [int(i) for i in list(board[:, c])]
-        for r in range(ROWS - 3):
-            window = col_array[r:r + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-
-    # Diagonales (\)
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            window = [int(board[r + i][c + i]) for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
-
-    # Diagonales (/)
-    for r in range(3, ROWS):
-        for c in range(COLS - 3):
-            window = [int(board[r - i][c + i]) for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
 
+# Tabla de los pesos por defecto, para el bitboard
+WINDOW_SCORES = window_scores()
+
+
+WINDOW_SCORES_NP = np.array(WINDOW_SCORES)
+
+
+def score_position(board, piece, params=None):
+    """Heurística del tablero para 'piece'; acepta (6,7) o una pila (N, 6, 7)."""
+    board = np.asarray(board)
+    if params is None:
+        table, center = WINDOW_SCORES_NP, CENTER_WEIGHT
+    else:
+        table, center = np.array(window_scores(params)), params.center
+    opp_piece = 1 if piece == 2 else 2
+    windows = board_windows(board)
+    count_piece = (windows == piece).sum(axis=-1)
+    count_opp = (windows == opp_piece).sum(axis=-1)
+    score = table[count_piece, count_opp].sum(axis=-1)
+
+    # Prioriza centro
+    flat = board.reshape(board.shape[:-2] + (ROWS * COLS,))
+    score = score + (flat[..., CENTER_INDEX] == piece).sum(axis=-1) * center
+    return _scalar_or_array(board, score, int)
+
+
+def score_bitboard(pos, piece):
+    """Mismo resultado que score_position, calculado sobre un BitBoard."""
+    if pos.table is not None:
+        # Puntaje mantenido de forma incremental por make/unmake
+        return pos.scores[piece]
+    mine = pos.bits[piece]
+    opp = pos.bits[3 - piece]
+    score = (mine & CENTER_MASK).bit_count() * CENTER_WEIGHT
+    for w in WINDOW_MASKS:
+        score += WINDOW_SCORES[(mine & w).bit_count()][(opp & w).bit_count()]
     return score
 
+
+def new_position(board, params=None):
+    """BitBoard con evaluación incremental equivalente a score_position (con 'params' si se da)."""
+    if params is None:
+        return BitBoard.from_array(board, WINDOW_SCORES, CENTER_WEIGHT)
+    return BitBoard.from_array(board, window_scores(params), params.center)
+
 # --------------------
 # Utilidad: si con un movimiento ganas
 # --------------------
@@ -141,6 +203,15 @@ def try_move_and_win(board, col, piece):
     drop_piece(b_copy, row, col, piece)
     return winning_move(b_copy, piece)
 
+
+def try_move_and_win_bitboard(pos, col, piece):
+    if not pos.can_play(col):
+        return False
+    pos.make(col, piece)
+    win = pos.is_win(piece)
+    pos.unmake()
+    return win
+
 # --------------------
 # Ordenamiento de movimientos por heurística (center first)
 # --------------------
@@ -160,101 +231,658 @@ def order_moves(board, valid_locations, piece):
     scores.sort(reverse=True, key=lambda x: x[0])
     return [col for _, col in scores]
 
+
+def order_moves_bitboard(pos, valid_locations, piece):
+    scores = []
+    for col in valid_locations:
+        pos.make(col, piece)
+        s = score_bitboard(pos, piece) - abs(col - (COLS // 2)) * 1
+        pos.unmake()
+        scores.append((s, col))
+    scores.sort(reverse=True, key=lambda x: x[0])
+    return [col for _, col in scores]
+
 # --------------------
 # Minimax con poda alfa-beta
 # --------------------
 
-def minimax(board, depth, alpha, beta, maximizingPlayer, ai_piece, player_piece):
-    valid_locations = get_valid_locations(board)
-    terminal = (winning_move(board, ai_piece) or winning_move(board, player_piece) or len(valid_locations) == 0)
+class SearchTimeout(Exception):
+    """Se lanza dentro del minimax cuando se agota el tiempo o se cancela la búsqueda."""
+
+
+class SearchStats:
+    """
+    Estadísticas de una búsqueda. Se llenan solo si se pasa un objeto en el
+    parámetro stats de get_best_move o minimax; sin él la búsqueda no mide nada.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaves = 0              # evaluaciones heurísticas en las hojas
+        self.terminals = 0           # nodos con victoria o tablero lleno
+        self.cutoffs = [0] * COLS    # cortes beta según el índice de la jugada que cortó
+        self.cutoff_sources = {"tt": 0, "killer": 0, "history": 0}   # de dónde salió la jugada que cortó
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.eval_time = 0.0         # segundos en score_bitboard (hojas)
+        self.movegen_time = 0.0      # segundos generando y ordenando jugadas
+        self.total_time = 0.0
+        self.depth = 0               # última profundidad completa
+        self.score = None
+        self.move = None
+        self.pv = []                 # variante principal desde la raíz
+        self.iterations = []         # (profundidad, nodos, segundos, puntaje, pv) por iteración completa
+        self.source = None           # "libro", "ganar", "bloquear", "exacto", "única" o "búsqueda"
+        self.proven = None           # (resultado 1/0/-1, medias jugadas hasta el 4 en línea) si fue "exacto"
+        self._pv = {}
+
+    @property
+    def nps(self):
+        return self.nodes / self.total_time if self.total_time > 0 else 0.0
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Fracción de los cortes beta que dio la primera jugada probada."""
+        total = sum(self.cutoffs)
+        return self.cutoffs[0] / total if total else 0.0
+
+    def merge(self, other):
+        """Suma los contadores de otra búsqueda (por ejemplo, de un proceso del pool)."""
+        for name in ("nodes", "leaves", "terminals", "tt_probes", "tt_hits", "tt_cutoffs", "eval_time",
+                     "movegen_time"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.cutoffs = [a + b for a, b in zip(self.cutoffs, other.cutoffs)]
+        for k, v in other.cutoff_sources.items():
+            self.cutoff_sources[k] += v
+
+    def _reset_pv(self):
+        self._pv = {}
+
+    def as_dict(self):
+        return {
+            "move": self.move, "score": self.score, "depth": self.depth, "source": self.source,
+            "nodes": self.nodes, "leaves": self.leaves, "terminals": self.terminals,
+            "cutoffs": list(self.cutoffs), "first_move_cutoff_rate": round(self.first_move_cutoff_rate, 4),
+            "cutoff_sources": dict(self.cutoff_sources),
+            "tt_probes": self.tt_probes, "tt_hits": self.tt_hits, "tt_cutoffs": self.tt_cutoffs,
+            "eval_time": round(self.eval_time, 6), "movegen_time": round(self.movegen_time, 6),
+            "total_time": round(self.total_time, 6), "nps": round(self.nps), "pv": list(self.pv),
+            "iterations": [list(it) for it in self.iterations],
+            "proven": list(self.proven) if self.proven is not None else None,
+        }
+
+    def __str__(self):
+        text = (f"jugada {self.move} ({self.source}), profundidad {self.depth}, puntaje {self.score}\n"
+                f"nodos {self.nodes} ({self.nps:.0f}/s), hojas {self.leaves}, terminales {self.terminals}\n"
+                f"cortes por jugada {self.cutoffs} (primera: {self.first_move_cutoff_rate:.0%}, "
+                f"origen {self.cutoff_sources})\n"
+                f"tabla: {self.tt_hits}/{self.tt_probes} aciertos, {self.tt_cutoffs} cortes\n"
+                f"tiempo {self.total_time:.3f} s (evaluación {self.eval_time:.3f} s, "
+                f"generación {self.movegen_time:.3f} s)\n"
+                f"variante principal {self.pv}")
+        if self.proven is not None:
+            result, plies = self.proven
+            text += f"\nresultado exacto: {('pierde', 'empata', 'gana')[result + 1]}"
+            if plies is not None:
+                text += f" en {plies} medias jugadas"
+        return text
+
+
+class _SearchContext:
+    # Estado compartido por todos los nodos de una búsqueda
+    __slots__ = ("tt", "deadline", "stop", "nodes", "stats", "ordering")
+
+    def __init__(self, tt=None, deadline=None, stop=None, stats=None, ordering=None):
+        self.tt = tt
+        self.deadline = deadline
+        self.stop = stop          # threading.Event opcional para cancelar desde otro hilo
+        self.nodes = 0
+        self.stats = stats        # SearchStats opcional
+        # Killers e historia; se pasa el mismo entre iteraciones de una búsqueda
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+
+
+def minimax(board, depth, alpha, beta, maximizingPlayer, ai_piece, player_piece, tt=None, stats=None):
+    """
+    Acepta un np.ndarray (6,7) o un BitBoard. La búsqueda se hace siempre sobre
+    el bitboard con make/unmake, sin copiar el tablero en cada nodo.
+    - tt: TranspositionTable opcional
+    - stats: SearchStats opcional a llenar
+    """
+    pos = board if isinstance(board, BitBoard) else new_position(board)
+    if stats is None:
+        return _minimax(pos, depth, alpha, beta, maximizingPlayer, ai_piece, player_piece, _SearchContext(tt))
+    stats._reset_pv()
+    start = time.perf_counter()
+    col, score = _minimax(pos, depth, alpha, beta, maximizingPlayer, ai_piece, player_piece,
+                          _SearchContext(tt, stats=stats))
+    stats.total_time += time.perf_counter() - start
+    stats.move, stats.score, stats.depth, stats.pv = col, score, depth, stats._pv.get(0, [])
+    return col, score
+
+
+def _score_to_tt(score, depth):
+    # Los puntajes de victoria dependen de la profundidad restante; se guardan
+    # relativos al nodo para poder reutilizarlos a otra profundidad.
+    if score > WIN_SCORE // 2:
+        return score - depth
+    if score < -WIN_SCORE // 2:
+        return score + depth
+    return score
+
+
+def _score_from_tt(score, depth):
+    if score > WIN_SCORE // 2:
+        return score + depth
+    if score < -WIN_SCORE // 2:
+        return score - depth
+    return score
+
+
+def _minimax(pos, depth, alpha, beta, maximizingPlayer, ai_piece, player_piece, ctx, ply=0):
+    ctx.nodes += 1
+    if ctx.nodes % TIME_CHECK_NODES == 0:
+        if ctx.deadline is not None and time.perf_counter() > ctx.deadline:
+            raise SearchTimeout()
+        if ctx.stop is not None and ctx.stop.is_set():
+            raise SearchTimeout()
+    # Con stats=None cada medición se reduce a una comparación
+    stats = ctx.stats
+    if stats is not None:
+        stats.nodes += 1
+        stats._pv[ply] = []
+        t0 = time.perf_counter()
+
+    valid_locations = pos.valid_moves()
+    if stats is not None:
+        stats.movegen_time += time.perf_counter() - t0
+    ai_wins = pos.is_win(ai_piece)
+    player_wins = pos.is_win(player_piece)
+    terminal = ai_wins or player_wins or len(valid_locations) == 0
 
     if depth == 0 or terminal:
         if terminal:
-            if winning_move(board, ai_piece):
+            if stats is not None:
+                stats.terminals += 1
+            if ai_wins:
                 return (None, WIN_SCORE + depth)
-            elif winning_move(board, player_piece):
+            elif player_wins:
                 return (None, -WIN_SCORE - depth)
             else:
                 return (None, 0)
         else:
-            return (None, score_position(board, ai_piece))
-
-    if maximizingPlayer:
+            if stats is None:
+                return (None, score_bitboard(pos, ai_piece))
+            t0 = time.perf_counter()
+            score = score_bitboard(pos, ai_piece)
+            stats.eval_time += time.perf_counter() - t0
+            stats.leaves += 1
+            return (None, score)
+
+    hash_move = None
+    tt = ctx.tt
+    if tt is not None:
+        key = search_key(pos, maximizingPlayer, ai_piece)
+        entry = tt.probe(key)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry is not None:
+            hash_move = entry[4]
+            if entry[1] >= depth:
+                score = _score_from_tt(entry[2], depth)
+                cut = entry[3] == EXACT
+                if not cut:
+                    if entry[3] == LOWER:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    cut = alpha >= beta
+                if cut:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                        stats._pv[ply] = [hash_move] if hash_move is not None else []
+                    return hash_move, score
+        alpha_orig, beta_orig = alpha, beta
+
+    ordering = ctx.ordering
+    if depth == 1:
+        best_col, value = _frontier(pos, valid_locations, alpha, beta, maximizingPlayer, ai_piece, player_piece,
+                                    ordering, ply, hash_move, stats)
+        if abs(value) > WIN_SCORE // 2:
+            return best_col, value
+    elif maximizingPlayer:
+        if stats is not None:
+            t0 = time.perf_counter()
         value = -math.inf
         best_col = random.choice(valid_locations) if valid_locations else None
-        ordered = order_moves(board, valid_locations, ai_piece)
-        for col in ordered:
-            row = get_next_open_row(board, col)
-            if row is None:
-                continue
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, ai_piece)
-            if winning_move(b_copy, ai_piece):
+        ordered = ordering.order(pos, valid_locations, ai_piece, ply, hash_move, depth)
+        if stats is not None:
+            stats.movegen_time += time.perf_counter() - t0
+        for i, col in enumerate(ordered):
+            pos.make(col, ai_piece)
+            if pos.is_win(ai_piece):
+                pos.unmake()
+                if stats is not None:
+                    stats._pv[ply] = [col]
                 return col, WIN_SCORE + depth
-            _, new_score = minimax(b_copy, depth - 1, alpha, beta, False, ai_piece, player_piece)
+            _, new_score = _minimax(pos, depth - 1, alpha, beta, False, ai_piece, player_piece, ctx, ply + 1)
+            pos.unmake()
             if new_score > value:
                 value = new_score
                 best_col = col
+                if stats is not None:
+                    stats._pv[ply] = [col] + stats._pv.get(ply + 1, [])
             alpha = max(alpha, value)
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs[i] += 1
+                    stats.cutoff_sources[ordering.source(col, ply, hash_move)] += 1
+                ordering.cutoff(pos, col, ai_piece, ply, depth)
                 break
-        return best_col, value
     else:
+        if stats is not None:
+            t0 = time.perf_counter()
         value = math.inf
         best_col = random.choice(valid_locations) if valid_locations else None
-        ordered = order_moves(board, valid_locations, player_piece)
-        for col in ordered:
-            row = get_next_open_row(board, col)
-            if row is None:
-                continue
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, player_piece)
-            if winning_move(b_copy, player_piece):
+        ordered = ordering.order(pos, valid_locations, player_piece, ply, hash_move, depth)
+        if stats is not None:
+            stats.movegen_time += time.perf_counter() - t0
+        for i, col in enumerate(ordered):
+            pos.make(col, player_piece)
+            if pos.is_win(player_piece):
+                pos.unmake()
+                if stats is not None:
+                    stats._pv[ply] = [col]
                 return col, -WIN_SCORE - depth
-            _, new_score = minimax(b_copy, depth - 1, alpha, beta, True, ai_piece, player_piece)
+            _, new_score = _minimax(pos, depth - 1, alpha, beta, True, ai_piece, player_piece, ctx, ply + 1)
+            pos.unmake()
             if new_score < value:
                 value = new_score
                 best_col = col
+                if stats is not None:
+                    stats._pv[ply] = [col] + stats._pv.get(ply + 1, [])
             beta = min(beta, value)
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs[i] += 1
+                    stats.cutoff_sources[ordering.source(col, ply, hash_move)] += 1
+                ordering.cutoff(pos, col, player_piece, ply, depth)
                 break
-        return best_col, value
+
+    if tt is not None:
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(key, depth, _score_to_tt(value, depth), flag, best_col)
+    return best_col, value
+
+
+def _frontier(pos, valid_locations, alpha, beta, maximizingPlayer, ai_piece, player_piece, ordering, ply, hash_move,
+              stats):
+    # Nodo a profundidad 1: todos sus hijos son hojas, así que se evalúan aquí
+    # mismo, sin una llamada recursiva por hoja, cortando en cuanto uno sale de
+    # la ventana. Con evaluación incremental ni siquiera se aplica la jugada:
+    # BitBoard.delta da el puntaje que tendría. Devuelve (columna, puntaje) igual que _minimax.
+    piece = ai_piece if maximizingPlayer else player_piece
+    if stats is not None:
+        t0 = time.perf_counter()
+    ordered = ordering.order(pos, valid_locations, piece, ply, hash_move)
+    if stats is not None:
+        stats.movegen_time += time.perf_counter() - t0
+    full = pos.count() == ROWS * COLS - 1      # después de esta jugada el tablero queda lleno
+    incremental = pos.table is not None
+    own = pos.bits[piece]
+    best_col = None
+    value = -math.inf if maximizingPlayer else math.inf
+    for i, col in enumerate(ordered):
+        if is_win_bits(own | 1 << (col * H1 + pos.heights[col])):
+            if stats is not None:
+                stats.nodes += 1
+                stats.terminals += 1
+                stats._pv[ply] = [col]
+            return col, WIN_SCORE + 1 if maximizingPlayer else -WIN_SCORE - 1
+        if stats is not None:
+            t0 = time.perf_counter()
+        if full:
+            score = 0
+        elif incremental:
+            d_own, d_opp = pos.delta(col, piece)
+            score = pos.scores[ai_piece] + (d_own if maximizingPlayer else d_opp)
+        else:
+            pos.make(col, piece)
+            score = score_bitboard(pos, ai_piece)
+            pos.unmake()
+        if stats is not None:
+            stats.eval_time += time.perf_counter() - t0
+            stats.nodes += 1
+            if full:
+                stats.terminals += 1
+            else:
+                stats.leaves += 1
+        if maximizingPlayer:
+            if score > value:
+                value, best_col = score, col
+            alpha = max(alpha, value)
+        else:
+            if score < value:
+                value, best_col = score, col
+            beta = min(beta, value)
+        if alpha >= beta:
+            if stats is not None:
+                stats.cutoffs[i] += 1
+                stats.cutoff_sources[ordering.source(col, ply, hash_move)] += 1
+            ordering.cutoff(pos, col, piece, ply, 1)
+            break
+    if stats is not None:
+        stats._pv[ply] = [best_col]
+    return best_col, value
+
+
+def iterative_deepening(pos, ai_piece, player_piece, time_ms, tt=None, max_depth=None, workers=1, stop=None,
+                        stats=None, params=None):
+    """
+    Busca a profundidad 1, 2, 3... hasta que se agote time_ms (milisegundos) y
+    devuelve (columna, puntaje, profundidad) de la última iteración completa.
+    La tabla de transposición pasa la mejor jugada de cada iteración a la siguiente
+    para ordenar primero esa rama. Con workers > 1 cada iteración reparte las
+    columnas de la raíz en el pool de procesos, ordenadas por los puntajes de la
+    iteración anterior. stats (SearchStats) acumula todas las iteraciones.
+    params (EvalParams) solo hace falta con workers > 1, para los procesos del pool.
+    """
+    if tt is None:
+        tt = TranspositionTable(ID_TT_MB)
+    if max_depth is None:
+        max_depth = ROWS * COLS - pos.count()
+    deadline = time.perf_counter() + time_ms / 1000.0
+
+    tt.new_search()
+    ordering = MoveOrdering()
+    best = (None, None, 0)
+    order = None
+    start = time.perf_counter()
+    for d in range(1, max_depth + 1):
+        # La primera iteración siempre se completa para tener una jugada
+        limit = deadline if d > 1 else None
+        if d > 1 and stop is not None and stop.is_set():
+            break
+        try:
+            if workers > 1:
+                col, score, scores = parallel_root_search(pos, ai_piece, player_piece, d, workers, tt, order, limit,
+                                                          stop, stats, params)
+                order = sorted(scores, key=lambda c: -scores[c])
+            else:
+                # Cada iteración trabaja sobre una copia: si se aborta a mitad, los
+                # make() pendientes se descartan junto con la copia
+                if stats is not None:
+                    stats._reset_pv()
+                ctx = _SearchContext(tt, limit, stop if d > 1 else None, stats, ordering)
+                col, score = _minimax(pos.copy(), d, -math.inf, math.inf, True, ai_piece, player_piece, ctx)
+                if stats is not None:
+                    stats.pv = stats._pv.get(0, [])
+        except SearchTimeout:
+            break
+        best = (col, score, d)
+        if stats is not None:
+            stats.iterations.append((d, stats.nodes, round(time.perf_counter() - start, 6), score, list(stats.pv)))
+        if abs(score) > WIN_SCORE // 2 or time.perf_counter() >= deadline:
+            break
+    return best
+
+# --------------------
+# Búsqueda paralela en la raíz
+# --------------------
+
+_pool = None
+_pool_workers = 0
+
+
+def get_pool(workers):
+    """Pool de procesos compartido; se crea una vez y se reutiliza entre jugadas."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def _search_root_child(board, col, depth, alpha, ai_piece, player_piece, seed, time_ms=None, with_stats=False,
+                       params=None):
+    # Corre en un proceso del pool: busca la rama 'col' de la raíz con ventana (alpha, inf).
+    # Cada tarea usa su propia tabla para que el resultado no dependa de qué
+    # proceso la ejecute. Con with_stats devuelve (puntaje, SearchStats).
+    random.seed(seed)
+    stats = SearchStats() if with_stats else None
+    pos = new_position(board, params)
+    pos.make(col, ai_piece)
+    if pos.is_win(ai_piece):
+        score = WIN_SCORE + depth
+    else:
+        deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000.0
+        ctx = _SearchContext(TranspositionTable(ROOT_TASK_TT_MB), deadline, stats=stats)
+        try:
+            _, score = _minimax(pos, depth - 1, alpha, math.inf, False, ai_piece, player_piece, ctx, 1)
+        except SearchTimeout:
+            score = None
+    if stats is not None:
+        stats.pv = stats._pv.get(1, [])
+        return score, stats
+    return score
+
+
+def parallel_root_search(pos, ai_piece, player_piece, depth, workers, tt=None, order=None, deadline=None,
+                         stop=None, stats=None, params=None):
+    """
+    Reparte las columnas de la raíz entre 'workers' procesos. La primera columna
+    del orden se busca en este proceso para obtener una cota alfa; el resto se
+    busca en paralelo con esa cota. Devuelve (columna, puntaje, {columna: puntaje}).
+    Los empates se resuelven por el orden de las columnas, así que el resultado
+    es el mismo en cada ejecución si random está sembrado. stats suma los
+    contadores de todos los procesos. params (EvalParams) debe ser el mismo con
+    que se creó pos, porque los procesos reconstruyen la posición.
+    """
+    valid = pos.valid_moves()
+    ordered = order if order else order_moves_bitboard(pos, valid, ai_piece)
+    base_seed = random.getrandbits(32)
+
+    # 1) Primera columna en serie
+    first = ordered[0]
+    work = pos.copy()
+    work.make(first, ai_piece)
+    if work.is_win(ai_piece):
+        if stats is not None:
+            stats.pv = [first]
+        return first, WIN_SCORE + depth, {first: WIN_SCORE + depth}
+    if stats is not None:
+        stats._reset_pv()
+    _, best_score = _minimax(work, depth - 1, -math.inf, math.inf, False, ai_piece, player_piece,
+                             _SearchContext(tt, deadline, stop, stats), 1)
+    best_col = first
+    scores = {first: best_score}
+    pv = [first] + (stats._pv.get(1, []) if stats is not None else [])
+    if best_score > WIN_SCORE // 2 or len(ordered) == 1:
+        if stats is not None:
+            stats.pv = pv
+        return best_col, best_score, scores
+
+    # 2) El resto en paralelo con alfa fijo
+    time_left = None if deadline is None else max(0.0, (deadline - time.perf_counter()) * 1000)
+    board = pos.to_array()
+    pool = get_pool(workers)
+    futures = [(col, pool.submit(_search_root_child, board, col, depth, best_score,
+                                 ai_piece, player_piece, base_seed + col, time_left, stats is not None,
+                                 params))
+               for col in ordered[1:]]
+    for col, future in futures:
+        if stop is not None and stop.is_set():
+            for _, f in futures:
+                f.cancel()
+            raise SearchTimeout()
+        score = future.result()
+        if stats is not None:
+            score, child = score
+            stats.merge(child)
+        if score is None:
+            raise SearchTimeout()
+        scores[col] = score
+        if score > best_score:
+            best_score = score
+            best_col = col
+            if stats is not None:
+                pv = [col] + child.pv
+    if stats is not None:
+        stats.pv = pv
+    return best_col, best_score, scores
+
+# --------------------
+# Solucionador exacto del final
+# --------------------
+
+# Uno por hilo: su tabla de posiciones resueltas sirve para las jugadas
+# siguientes del mismo hilo, y dos búsquedas a la vez (Ponderer, el executor de
+# final_async o las sesiones del servidor) no comparten la tabla.
+_solvers = threading.local()
+
+
+def get_solver():
+    """Solver del hilo actual; se crea la primera vez que se pide."""
+    solver = getattr(_solvers, "solver", None)
+    if solver is None:
+        solver = _solvers.solver = Solver()
+    return solver
 
 # --------------------
 # Función pública requerida: devuelve solo la columna (int)
 # --------------------
 
-def get_best_move(board, color_robot, color_human, depth=DEFAULT_DEPTH):
+def get_best_move(board, color_robot, color_human, depth=DEFAULT_DEPTH, tt=None, time_ms=None, book=None,
+                  workers=1, stop=None, stats=None, params=None, solve_empty=SOLVER_EMPTY_CELLS):
     """
     Devuelve (int) la columna donde el robot debe jugar (0..6).
     - board: numpy.ndarray 6x7, fila0 = top
     - color_robot: 1 o 2
     - color_human: 1 o 2
     - depth: profundidad del minimax
+    - tt: TranspositionTable opcional; conviene usar la misma durante toda la partida
+    - time_ms: si se indica, se ignora depth y se usa profundización iterativa
+      hasta agotar ese tiempo en milisegundos
+    - book: OpeningBook opcional; si la posición está en el libro no se busca
+    - workers: procesos para repartir las columnas de la raíz (1 = búsqueda en serie)
+    - stop: threading.Event opcional para cancelar la búsqueda desde otro hilo; con
+      time_ms devuelve la mejor jugada hasta el momento, si no lanza SearchTimeout
+    - stats: SearchStats opcional; se llena con los contadores de la búsqueda
+    - params: EvalParams opcional con los pesos de la heurística; una tt usada
+      con otros pesos no sirve, sus puntajes no son comparables
+    - solve_empty: con esta cantidad de casillas vacías o menos se usa el
+      solucionador exacto (solver.py) en vez del minimax; None lo desactiva
     """
+    if stats is None:
+        return _best_move(board, color_robot, color_human, depth, tt, time_ms, book, workers, stop, None, params,
+                          solve_empty)
+    start = time.perf_counter()
+    col = _best_move(board, color_robot, color_human, depth, tt, time_ms, book, workers, stop, stats, params,
+                     solve_empty)
+    stats.total_time = time.perf_counter() - start
+    stats.move = col
+    return col
+
+
+def _best_move(board, color_robot, color_human, depth, tt, time_ms, book, workers, stop, stats, params,
+               solve_empty):
     if not isinstance(board, np.ndarray):
         raise ValueError("board debe ser numpy.ndarray 6x7")
     if board.shape != (ROWS, COLS):
         raise ValueError("board shape debe ser (6,7)")
 
-    valid = get_valid_locations(board)
+    pos = new_position(board, params)
+    valid = pos.valid_moves()
     if not valid:
         return None
 
+    # 0) Consultar el libro de aperturas
+    if book is not None:
+        entry = book.lookup(pos, color_robot)
+        if entry is not None and entry[0] in valid:
+            if stats is not None:
+                stats.source, stats.score = "libro", entry[1]
+            return int(entry[0])
+
     # 1) Intentar ganar inmediatamente
     for c in valid:
-        if try_move_and_win(board, c, color_robot):
+        if try_move_and_win_bitboard(pos, c, color_robot):
+            if stats is not None:
+                stats.source, stats.pv = "ganar", [int(c)]
             return int(c)
 
     # 2) Bloquear al humano si puede ganar
     for c in valid:
-        if try_move_and_win(board, c, color_human):
+        if try_move_and_win_bitboard(pos, c, color_human):
+            if stats is not None:
+                stats.source, stats.pv = "bloquear", [int(c)]
             return int(c)
 
-    # 3) Usar minimax
-    col, _ = minimax(board.copy(), depth, -math.inf, math.inf, True, color_robot, color_human)
+    # 3) Con pocas casillas vacías, resolver el final de forma exacta
+    empty = ROWS * COLS - pos.count()
+    if solve_empty is not None and empty <= solve_empty:
+        solver = get_solver()
+        nodes = solver.nodes
+        try:
+            col, score = solver.best_move(pos, color_robot, stop)
+        except SolverAborted:
+            # Con tiempo se cae a la búsqueda normal, que devuelve lo que alcanzó
+            if time_ms is None:
+                raise SearchTimeout()
+            col = None
+        if col is not None:
+            if stats is not None:
+                stats.source, stats.score, stats.depth, stats.pv = "exacto", score, empty, [int(col)]
+                stats.nodes += solver.nodes - nodes
+                stats.proven = score_to_result(score, pos.count())
+            return int(col)
+
+    # 4) Usar minimax
+    if len(valid) == 1:
+        if stats is not None:
+            stats.source, stats.pv = "única", [int(valid[0])]
+        return int(valid[0])
+    if stats is not None:
+        stats.source = "búsqueda"
+    if time_ms is not None:
+        col, score, reached = iterative_deepening(pos, color_robot, color_human, time_ms, tt, workers=workers,
+                                                  stop=stop, stats=stats, params=params)
+    elif workers > 1:
+        if tt is not None:
+            tt.new_search()
+        col, score, _ = parallel_root_search(pos, color_robot, color_human, depth, workers, tt, stop=stop,
+                                             stats=stats, params=params)
+        reached = depth
+    else:
+        if tt is not None:
+            tt.new_search()
+        if stats is not None:
+            stats._reset_pv()
+        col, score = _minimax(pos, depth, -math.inf, math.inf, True, color_robot, color_human,
+                              _SearchContext(tt, stop=stop, stats=stats))
+        reached = depth
+        if stats is not None:
+            stats.pv = stats._pv.get(0, [])
+    if stats is not None:
+        stats.score, stats.depth = score, reached
     if col is None or col not in valid:
-        ordered = order_moves(board, valid, color_robot)
+        ordered = order_moves_bitboard(pos, valid, color_robot)
         return int(ordered[0]) if ordered else int(random.choice(valid))
     return int(col)
 
@@ -268,41 +896,19 @@ if __name__ == "__main__":
 def check_winner(board):
     """
     Revisa si hay un ganador en la matriz de Conecta 4.
+    Acepta un tablero (6,7) o una pila de tableros (N, 6, 7).
     Retorna:
         1 -> si gana amarillo
         2 -> si gana rojo
         0 -> si no hay ganador
     """
-
-    ROWS = 6
-    COLS = 7
-
-    # Horizontal
-    for r in range(ROWS):
-        for c in range(COLS - 3):
-            line = board[r, c:c + 4]
-            if line[0] != 0 and np.all(line == line[0]):
-                return int(line[0])
-
-    # Vertical
-    for r in range(ROWS - 3):
-        for c in range(COLS):
-            line = board[r:r + 4, c]
-            if line[0] != 0 and np.all(line == line[0]):
-                return int(line[0])
-
-    # Diagonal ↘
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            line = np.array([board[r+i, c+i] for i in range(4)])
-            if line[0] != 0 and np.all(line == line[0]):
-                return int(line[0])
-
-    # Diagonal ↗
-    for r in range(3, ROWS):
-        for c in range(COLS - 3):
-            line = np.array([board[r-i, c+i] for i in range(4)])
-            if line[0] != 0 and np.all(line == line[0]):
-                return int(line[0])
-
-    return 0  # No winner
+    windows = board_windows(board)
+    first = windows[..., 0]
+    line = (first != 0) & np.all(windows == windows[..., :1], axis=-1)
+
+    # Primera ventana ganadora en el orden horizontal, vertical, ↘, ↗
+    idx = np.argmax(line, axis=-1)
+    found = np.take_along_axis(line, idx[..., None], axis=-1)[..., 0]
+    piece = np.take_along_axis(first, idx[..., None], axis=-1)[..., 0]
+    winner = np.where(found, piece, 0)
+    return _scalar_or_array(board, winner, int)
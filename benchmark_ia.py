@@ -0,0 +1,358 @@
+"""
+Benchmark del motor de ai_conecta4 sobre un corpus fijo de posiciones.
+
+El corpus (posiciones_benchmark.json) tiene posiciones de apertura, medio juego
+y final. Cuando se conoce, 'best' guarda las jugadas correctas:
+- apertura: teoría conocida (en el tablero vacío solo gana la columna central)
+- medio juego: jugadas que fuerzan la victoria, demostradas con búsqueda
+  completa (los puntajes de victoria del minimax no dependen de la heurística)
+- final: jugadas con el mejor resultado exacto (gana/empata/pierde), resolviendo
+  la posición hasta llenar el tablero
+Las posiciones sin 'best' solo cuentan para la velocidad.
+
+Para cada profundidad se mide minimax (nodos, tiempo, nodos por segundo) y
+get_best_move (tiempo y coincidencia con 'best'), este sin el solucionador
+exacto para que los finales también midan la búsqueda. Aparte, en la categoría
+"solver", se mide el solucionador exacto (solver.py) sobre las posiciones con
+pocas casillas vacías para usarlo en la partida. El resultado se guarda en
+JSON y se puede comparar contra una corrida anterior; sale con código 1 si algo
+empeora más que el umbral.
+
+Uso:
+    python benchmark_ia.py --out bench.json
+    python benchmark_ia.py --compare bench_base.json --threshold 0.10
+    python benchmark_ia.py --generate            # vuelve a generar el corpus
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+import ai_conecta4 as ai
+from bitboard import ROWS, COLS
+from solver import Solver
+from transposition import TranspositionTable
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "posiciones_benchmark.json")
+DEFAULT_DEPTHS = (2, 4, 6, 8)
+DEFAULT_THRESHOLD = 0.10      # 10 %
+SEED = 1234
+REPEAT = 3                    # repeticiones por posición; se toma el tiempo mínimo
+
+# Generación del corpus
+GEN_SEED = 2024
+PHASES = {                    # fase: (jugadas mínimas, máximas, posiciones)
+    "opening": (2, 8, 8),
+    "middlegame": (12, 22, 10),
+    "endgame": (30, 34, 8),
+}
+PROOF_DEPTH = 7               # profundidad para demostrar una victoria forzada en el medio juego
+SOLVE_TT_MB = 64
+
+
+# --------------------
+# Corpus
+# --------------------
+
+def board_to_rows(board):
+    """Tablero (fila 0 = abajo) -> lista de textos de arriba hacia abajo, como se ve."""
+    return ["".join(str(int(v)) for v in row) for row in board[::-1]]
+
+
+def rows_to_board(rows):
+    return np.array([[int(ch) for ch in row] for row in rows[::-1]], dtype=int)
+
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path) as f:
+        corpus = json.load(f)
+    for p in corpus["positions"]:
+        p["board_array"] = rows_to_board(p["board"])
+    return corpus
+
+
+def _random_game(rng, plies):
+    """Partida semi-aleatoria: la mayoría de las jugadas con minimax a profundidad 2."""
+    board = np.zeros((ROWS, COLS), dtype=int)
+    piece = 1
+    for _ in range(plies):
+        valid = ai.get_valid_locations(board)
+        if not valid or ai.check_winner(board) != 0:
+            return None
+        if rng.random() < 0.6:
+            col, _ = ai.minimax(board, 2, -math.inf, math.inf, True, piece, 3 - piece)
+        else:
+            col = rng.choice(valid)
+        ai.drop_piece(board, ai.get_next_open_row(board, col), col, piece)
+        piece = 3 - piece
+    if ai.check_winner(board) != 0 or not ai.get_valid_locations(board):
+        return None
+    return board, piece
+
+
+def _quiet(pos, piece):
+    # Sin victoria inmediata de nadie: get_best_move no la resuelve con sus atajos
+    valid = pos.valid_moves()
+    return not any(ai.try_move_and_win_bitboard(pos, c, p) for c in valid for p in (piece, 3 - piece))
+
+
+def _root_scores(board, piece, depth, tt):
+    pos = ai.new_position(board)
+    scores = {}
+    for col in pos.valid_moves():
+        pos.make(col, piece)
+        if pos.is_win(piece):
+            scores[col] = ai.WIN_SCORE + depth
+        else:
+            _, scores[col] = ai.minimax(pos, depth - 1, -math.inf, math.inf, False, piece, 3 - piece, tt)
+        pos.unmake()
+    return scores
+
+
+def _outcome(score):
+    return 1 if score > ai.WIN_SCORE // 2 else (-1 if score < -ai.WIN_SCORE // 2 else 0)
+
+
+def generate_corpus(path=CORPUS_FILE):
+    """Genera el corpus con partidas sembradas; las respuestas se demuestran por búsqueda completa."""
+    rng = random.Random(GEN_SEED)
+    random.seed(GEN_SEED)
+    positions = [{
+        "name": "vacio", "phase": "opening", "piece": 1,
+        "board": board_to_rows(np.zeros((ROWS, COLS), dtype=int)),
+        "best": [3], "source": "teoría: solo la columna central gana para el primer jugador",
+    }]
+    seen = {tuple(positions[0]["board"])}
+    for phase, (lo, hi, count) in PHASES.items():
+        found = 0
+        attempts = 0
+        while found < count:
+            attempts += 1
+            if attempts > 2000:
+                raise RuntimeError(f"No se encontraron suficientes posiciones de {phase}")
+            game = _random_game(rng, rng.randint(lo, hi))
+            if game is None:
+                continue
+            board, piece = game
+            key = tuple(board_to_rows(board))
+            if key in seen or not _quiet(ai.new_position(board), piece):
+                continue
+            entry = {"name": f"{phase}_{found + 1}", "phase": phase, "piece": piece,
+                     "board": board_to_rows(board), "best": None, "source": None}
+            if phase == "middlegame":
+                scores = _root_scores(board, piece, PROOF_DEPTH, TranspositionTable(SOLVE_TT_MB))
+                winning = sorted(c for c, s in scores.items() if _outcome(s) == 1)
+                if not winning or len(winning) == len(scores):
+                    continue
+                entry["best"] = winning
+                entry["source"] = f"victoria forzada demostrada a {PROOF_DEPTH} jugadas"
+            elif phase == "endgame":
+                empty = int(np.count_nonzero(board == 0))
+                scores = _root_scores(board, piece, empty, TranspositionTable(SOLVE_TT_MB))
+                outcomes = {c: _outcome(s) for c, s in scores.items()}
+                target = max(outcomes.values())
+                best = sorted(c for c, o in outcomes.items() if o == target)
+                if len(best) == len(outcomes):
+                    continue
+                entry["best"] = best
+                entry["source"] = f"resuelta hasta el final ({empty} casillas)"
+            seen.add(key)
+            positions.append(entry)
+            found += 1
+            print(f"{entry['name']}: best={entry['best']}")
+
+    corpus = {"version": 1, "positions": positions}
+    with open(path, "w") as f:
+        json.dump(corpus, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    print(f"Guardadas {len(positions)} posiciones en {path}")
+    return corpus
+
+
+# --------------------
+# Medición
+# --------------------
+
+def run_minimax(board, piece, depth):
+    """(columna, segundos) de una búsqueda a 'depth' sin tabla de transposición."""
+    random.seed(SEED)
+    pos = ai.new_position(board)
+    start = time.perf_counter()
+    col, _ = ai.minimax(pos, depth, -math.inf, math.inf, True, piece, 3 - piece)
+    return col, time.perf_counter() - start
+
+
+def minimax_stats(board, piece, depth):
+    """La misma búsqueda que run_minimax, con contadores (no se usa para medir tiempo)."""
+    random.seed(SEED)
+    stats = ai.SearchStats()
+    ai.minimax(ai.new_position(board), depth, -math.inf, math.inf, True, piece, 3 - piece, stats=stats)
+    return stats
+
+
+def run_best_move(board, piece, depth):
+    random.seed(SEED)
+    start = time.perf_counter()
+    col = ai.get_best_move(board, piece, 3 - piece, depth=depth, tt=TranspositionTable(), solve_empty=None)
+    return col, time.perf_counter() - start
+
+
+def run_solver(board, piece):
+    """(columna, segundos, nodos) del solucionador exacto con la tabla vacía."""
+    solver = Solver()
+    pos = ai.new_position(board)
+    start = time.perf_counter()
+    col, _ = solver.best_move(pos, piece)
+    return col, time.perf_counter() - start, solver.nodes
+
+
+def run_solver_benchmark(corpus, results, repeat=REPEAT, max_empty=ai.SOLVER_EMPTY_CELLS):
+    """Mide el solucionador en las posiciones donde get_best_move lo usaría en la partida."""
+    total_s = 0.0
+    total_nodes = agree = known = count = 0
+    for p, row in zip(corpus["positions"], results["positions"]):
+        board, piece = p["board_array"], p["piece"]
+        if int(np.count_nonzero(board == 0)) > max_empty:
+            continue
+        best_s = math.inf
+        for _ in range(repeat):
+            col, t, nodes = run_solver(board, piece)
+            best_s = min(best_s, t)
+        ok = None
+        if p["best"]:
+            ok = col in p["best"]
+            known += 1
+            agree += ok
+        count += 1
+        total_s += best_s
+        total_nodes += nodes
+        row["solver"] = {"nodes": nodes, "solver_s": round(best_s, 5), "move": col, "ok": ok}
+    results["solver"] = {
+        "positions": count,
+        "nodes": total_nodes,
+        "solver_s": round(total_s, 4),
+        "agreement": round(agree / known, 4) if known else None,
+        "known": known,
+    }
+    print(f"solver ({count} posiciones con {max_empty} casillas vacías o menos): {total_nodes:>9} nodos  "
+          f"{total_s:8.3f} s  aciertos {agree}/{known}")
+    return results
+
+
+def run_benchmark(corpus, depths=DEFAULT_DEPTHS, repeat=REPEAT):
+    results = {"depths": {}, "positions": []}
+    for p in corpus["positions"]:
+        results["positions"].append({"name": p["name"], "phase": p["phase"], "depths": {}})
+
+    for depth in depths:
+        total_nodes = 0
+        cutoffs = [0] * COLS
+        total_mm = 0.0
+        total_gbm = 0.0
+        agree = known = 0
+        for p, row in zip(corpus["positions"], results["positions"]):
+            board, piece = p["board_array"], p["piece"]
+            mm_time = gbm_time = math.inf
+            for _ in range(repeat):
+                col_mm, t = run_minimax(board, piece, depth)
+                mm_time = min(mm_time, t)
+                col, t = run_best_move(board, piece, depth)
+                gbm_time = min(gbm_time, t)
+            ok = None
+            if p["best"]:
+                ok = col in p["best"]
+                known += 1
+                agree += ok
+            stats = minimax_stats(board, piece, depth)
+            nodes = stats.nodes
+            total_nodes += nodes
+            cutoffs = [a + b for a, b in zip(cutoffs, stats.cutoffs)]
+            total_mm += mm_time
+            total_gbm += gbm_time
+            row["depths"][str(depth)] = {"nodes": nodes, "minimax_s": round(mm_time, 5), "minimax_move": col_mm,
+                                         "best_move_s": round(gbm_time, 5), "move": col, "ok": ok}
+        results["depths"][str(depth)] = {
+            "nodes": total_nodes,
+            "minimax_s": round(total_mm, 4),
+            "nps": round(total_nodes / total_mm) if total_mm > 0 else None,
+            "first_move_cutoff_rate": round(cutoffs[0] / sum(cutoffs), 4) if sum(cutoffs) else None,
+            "best_move_s": round(total_gbm, 4),
+            "agreement": round(agree / known, 4) if known else None,
+            "known": known,
+        }
+        d = results["depths"][str(depth)]
+        print(f"depth {depth}: {d['nodes']:>9} nodos  {d['minimax_s']:8.3f} s  {d['nps']:>8} nodos/s  "
+              f"get_best_move {d['best_move_s']:7.3f} s  aciertos {agree}/{known}")
+    return results
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Lista de regresiones de 'current' respecto a 'baseline' mayores que 'threshold'."""
+    problems = []
+    for depth, cur in current["depths"].items():
+        base = baseline.get("depths", {}).get(depth)
+        if base is None:
+            continue
+        if base["nps"] and cur["nps"] < base["nps"] * (1 - threshold):
+            problems.append(f"depth {depth}: nodos/s {cur['nps']} < {base['nps']} (-{1 - cur['nps'] / base['nps']:.0%})")
+        if base["nodes"] and cur["nodes"] > base["nodes"] * (1 + threshold):
+            problems.append(f"depth {depth}: nodos {cur['nodes']} > {base['nodes']}")
+        if base["best_move_s"] and cur["best_move_s"] > base["best_move_s"] * (1 + threshold):
+            problems.append(f"depth {depth}: get_best_move {cur['best_move_s']} s > {base['best_move_s']} s")
+        if base["agreement"] is not None and cur["agreement"] is not None and cur["agreement"] < base["agreement"]:
+            problems.append(f"depth {depth}: aciertos {cur['agreement']:.0%} < {base['agreement']:.0%}")
+    cur, base = current.get("solver"), baseline.get("solver")
+    if cur and base and cur["positions"] == base["positions"]:
+        if base["solver_s"] and cur["solver_s"] > base["solver_s"] * (1 + threshold):
+            problems.append(f"solver: {cur['solver_s']} s > {base['solver_s']} s")
+        if base["agreement"] is not None and cur["agreement"] is not None and cur["agreement"] < base["agreement"]:
+            problems.append(f"solver: aciertos {cur['agreement']:.0%} < {base['agreement']:.0%}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de Conecta 4")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(DEFAULT_DEPTHS))
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="repeticiones por posición (se toma el mínimo)")
+    parser.add_argument("--corpus", default=CORPUS_FILE)
+    parser.add_argument("--out", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--generate", action="store_true", help="regenera el corpus y termina")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_corpus(args.corpus)
+        return
+
+    corpus = load_corpus(args.corpus)
+    results = run_benchmark(corpus, args.depths, args.repeat)
+    run_solver_benchmark(corpus, results, args.repeat)
+    results["meta"] = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                       "machine": platform.machine(), "processor": platform.processor(),
+                       "corpus": len(corpus["positions"])}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.threshold)
+        if problems:
+            print("\nRegresiones respecto a", args.compare)
+            for p in problems:
+                print(" -", p)
+            sys.exit(1)
+        print("\nSin regresiones respecto a", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Representación bitboard del tablero de Conecta 4 para la búsqueda.
+
+Cada columna ocupa ROWS + 1 bits (la fila extra es un centinela siempre en 0),
+así el bit de la celda (fila, columna) es columna * (ROWS + 1) + fila. Se usa la
+misma convención que ai_conecta4: fila 0 = la primera que se llena.
+"""
+
+import random
+
+import numpy as np
+
+# --------------------
+# Configuración / constantes
+# --------------------
+ROWS = 6
+COLS = 7
+EMPTY = 0
+WINDOW_LENGTH = 4
+H1 = ROWS + 1
+
+# Desplazamientos para vertical, horizontal y las dos diagonales
+DIRECTIONS = (1, H1, H1 - 1, H1 + 1)
+
+
+def cell_bit(row, col):
+    return 1 << (col * H1 + row)
+
+
+# Todas las ventanas de 4 celdas del tablero (69), en el mismo orden en que
+# check_winner las recorre: horizontal, vertical, diagonal ↘ y diagonal ↗.
+WINDOWS = (
+    [tuple((r, c + i) for i in range(WINDOW_LENGTH)) for r in range(ROWS) for c in range(COLS - 3)]
+    + [tuple((r + i, c) for i in range(WINDOW_LENGTH)) for r in range(ROWS - 3) for c in range(COLS)]
+    + [tuple((r + i, c + i) for i in range(WINDOW_LENGTH)) for r in range(ROWS - 3) for c in range(COLS - 3)]
+    + [tuple((r - i, c + i) for i in range(WINDOW_LENGTH)) for r in range(3, ROWS) for c in range(COLS - 3)]
+)
+
+WINDOW_MASKS = tuple(sum(cell_bit(r, c) for r, c in w) for w in WINDOWS)
+
+CENTER_MASK = sum(cell_bit(r, COLS // 2) for r in range(ROWS))
+
+# Para cada bit del tablero, las ventanas que lo contienen (a lo sumo 16)
+CELL_WINDOWS = [tuple(i for i, w in enumerate(WINDOW_MASKS) if w >> b & 1) for b in range(COLS * H1)]
+
+# Claves Zobrist: un número aleatorio de 64 bits por (pieza, bit). La semilla es
+# fija para que las claves sean las mismas en cada ejecución.
+_rng = random.Random(0x0C4)
+ZOBRIST = [[0] * (COLS * H1)] + [[_rng.getrandbits(64) for _ in range(COLS * H1)] for _ in (1, 2)]
+
+
+def is_win_bits(bits):
+    """True si el conjunto de fichas 'bits' contiene 4 en línea."""
+    for s in DIRECTIONS:
+        m = bits & (bits >> s)
+        if m & (m >> (2 * s)):
+            return True
+    return False
+
+
+# --------------------
+# Posición
+# --------------------
+
+class BitBoard:
+    """
+    Posición con una máscara de 64 bits por pieza y la altura de cada columna.
+    Los movimientos se aplican con make() y se deshacen con unmake(), sin copiar.
+
+    Si se pasa una tabla de puntajes por ventana (table[propias][rivales]) y el
+    peso de la columna central, la posición además mantiene de forma incremental
+    la cuenta de fichas de cada ventana y el puntaje heurístico de cada pieza
+    (scores[1], scores[2]); make/unmake solo tocan las ventanas de la celda jugada.
+    """
+
+    __slots__ = ("bits", "heights", "key", "table", "center", "counts", "scores",
+                 "_delta_own", "_delta_opp", "_stack")
+
+    def __init__(self, table=None, center=0):
+        self.bits = [0, 0, 0]          # indexado por pieza (1, 2); el 0 no se usa
+        self.heights = [0] * COLS      # siguiente fila libre de cada columna
+        self.key = 0                   # hash Zobrist de las fichas colocadas
+        self.table = table
+        self.center = center
+        self.counts = [None, [0] * len(WINDOWS), [0] * len(WINDOWS)]
+        self.scores = [0, 0, 0]
+        if table is not None:
+            self._set_table(table)
+        self._stack = []
+
+    def _set_table(self, table):
+        n = WINDOW_LENGTH
+        # Cambio de puntaje de una ventana con (m propias, o rivales) al agregar una
+        # ficha propia: para quien juega y para el rival
+        self._delta_own = [[table[m + 1][o] - table[m][o] if m + o < n else 0 for o in range(n + 1)]
+                           for m in range(n + 1)]
+        self._delta_opp = [[table[o][m + 1] - table[o][m] if m + o < n else 0 for o in range(n + 1)]
+                           for m in range(n + 1)]
+        s = self.scores
+        s[0] = s[1] = s[2] = 0
+        c1, c2 = self.counts[1], self.counts[2]
+        for i, w in enumerate(WINDOW_MASKS):
+            m1 = c1[i] = (self.bits[1] & w).bit_count()
+            m2 = c2[i] = (self.bits[2] & w).bit_count()
+            s[1] += table[m1][m2]
+            s[2] += table[m2][m1]
+        s[1] += (self.bits[1] & CENTER_MASK).bit_count() * self.center
+        s[2] += (self.bits[2] & CENTER_MASK).bit_count() * self.center
+
+    @classmethod
+    def from_array(cls, board, table=None, center=0):
+        """Construye la posición desde un np.ndarray (6,7) con 0, 1 y 2."""
+        pos = cls()
+        for r in range(ROWS):
+            for c in range(COLS):
+                piece = int(board[r][c])
+                if piece != EMPTY:
+                    pos.bits[piece] |= cell_bit(r, c)
+                    pos.key ^= ZOBRIST[piece][c * H1 + r]
+        for c in range(COLS):
+            pos.heights[c] = pos._open_row_from(c, 0)
+        if table is not None:
+            pos.table = table
+            pos.center = center
+            pos._set_table(table)
+        return pos
+
+    def to_array(self):
+        board = np.zeros((ROWS, COLS), dtype=int)
+        for piece in (1, 2):
+            b = self.bits[piece]
+            for r in range(ROWS):
+                for c in range(COLS):
+                    if b & cell_bit(r, c):
+                        board[r][c] = piece
+        return board
+
+    def copy(self):
+        pos = BitBoard()
+        pos.bits = self.bits[:]
+        pos.heights = self.heights[:]
+        pos.key = self.key
+        if self.table is not None:
+            pos.table = self.table
+            pos.center = self.center
+            pos.counts = [None, self.counts[1][:], self.counts[2][:]]
+            pos.scores = self.scores[:]
+            pos._delta_own = self._delta_own
+            pos._delta_opp = self._delta_opp
+        return pos
+
+    def occupied(self):
+        return self.bits[1] | self.bits[2]
+
+    def _open_row_from(self, col, row):
+        # Igual que get_next_open_row: la primera fila vacía desde abajo
+        occ = self.bits[1] | self.bits[2]
+        while row < ROWS and occ & cell_bit(row, col):
+            row += 1
+        return row
+
+    def can_play(self, col):
+        # Misma regla que is_valid_location: la celda superior debe estar vacía
+        return not (self.bits[1] | self.bits[2]) & cell_bit(ROWS - 1, col)
+
+    def valid_moves(self):
+        occ = self.bits[1] | self.bits[2]
+        return [c for c in range(COLS) if not occ & cell_bit(ROWS - 1, c)]
+
+    def make(self, col, piece):
+        row = self.heights[col]
+        idx = col * H1 + row
+        self.bits[piece] |= 1 << idx
+        self.key ^= ZOBRIST[piece][idx]
+        d_own = d_opp = 0
+        if self.table is not None:
+            own = self.counts[piece]
+            opp = self.counts[3 - piece]
+            delta_own = self._delta_own
+            delta_opp = self._delta_opp
+            for w in CELL_WINDOWS[idx]:
+                m = own[w]
+                o = opp[w]
+                d_own += delta_own[m][o]
+                d_opp += delta_opp[m][o]
+                own[w] = m + 1
+            if col == COLS // 2:
+                d_own += self.center
+            self.scores[piece] += d_own
+            self.scores[3 - piece] += d_opp
+        self._stack.append((col, row, piece, d_own, d_opp))
+        self.heights[col] = self._open_row_from(col, row + 1)
+        return row
+
+    def delta(self, col, piece):
+        """
+        Cambio de scores[piece] y scores[3 - piece] si 'piece' jugara en 'col',
+        sin aplicar la jugada (requiere tabla de puntajes).
+        """
+        idx = col * H1 + self.heights[col]
+        own = self.counts[piece]
+        opp = self.counts[3 - piece]
+        delta_own = self._delta_own
+        delta_opp = self._delta_opp
+        d_own = d_opp = 0
+        for w in CELL_WINDOWS[idx]:
+            m = own[w]
+            o = opp[w]
+            d_own += delta_own[m][o]
+            d_opp += delta_opp[m][o]
+        if col == COLS // 2:
+            d_own += self.center
+        return d_own, d_opp
+
+    def unmake(self):
+        col, row, piece, d_own, d_opp = self._stack.pop()
+        idx = col * H1 + row
+        self.bits[piece] ^= 1 << idx
+        self.key ^= ZOBRIST[piece][idx]
+        if self.table is not None:
+            own = self.counts[piece]
+            for w in CELL_WINDOWS[idx]:
+                own[w] -= 1
+            self.scores[piece] -= d_own
+            self.scores[3 - piece] -= d_opp
+        self.heights[col] = row
+
+    def is_win(self, piece):
+        return is_win_bits(self.bits[piece])
+
+    def count(self):
+        return (self.bits[1] | self.bits[2]).bit_count()
@@ -0,0 +1,50 @@
+"""
+Caché en disco de las soluciones de cinemática inversa de CI.
+
+Los objetivos de valor() son poses fijas, así que sus ángulos se calculan una
+sola vez y se guardan junto con una huella de los parámetros DH y de las poses.
+Si cambia la geometría o alguna pose, la huella no coincide y se recalcula.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+# Junto al módulo, no en el directorio desde donde se lanzó el programa
+IK_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ik_cache.npz")
+
+
+def huella(*datos):
+    """Hash SHA-256 de los datos (números, listas o arreglos), redondeados a 9 decimales."""
+    h = hashlib.sha256()
+    for d in datos:
+        arr = np.round(np.asarray(d, dtype=np.float64), 9)
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def cargar_tabla(huella_actual, path=IK_CACHE_FILE):
+    """Devuelve {objetivo: ángulos en grados} si el archivo existe y su huella coincide."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["huella"]) != huella_actual:
+                return None
+            return {int(c): [float(v) for v in q] for c, q in zip(data["objetivos"], data["q"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def guardar_tabla(tabla, huella_actual, path=IK_CACHE_FILE):
+    objetivos = sorted(tabla)
+    try:
+        np.savez(path, huella=np.array(huella_actual), objetivos=np.array(objetivos, dtype=int),
+                 q=np.array([tabla[c] for c in objetivos], dtype=np.float64))
+    except OSError as e:
+        # Sin permiso de escritura se sigue con la tabla en memoria
+        print(f"No se pudo guardar la caché IK en {path}: {e}")
+        return
+    print(f"Guardadas {len(objetivos)} soluciones IK en {path}")
@@ -0,0 +1,219 @@
+"""
+Fuentes de imagen para detector_tablero.
+
+- CamaraFoto: pide /shot.jpg a la cámara IP reutilizando la misma conexión HTTP
+  (keep-alive). Es el comportamiento original y queda como respaldo.
+- CamaraMJPEG: lee el stream /video de la cámara IP en un hilo de fondo y guarda
+  los últimos frames decodificados en un buffer circular; leer() devuelve el más
+  reciente sin esperar un viaje de red.
+- CamaraArchivo: lee una imagen o una carpeta de imágenes, para pruebas sin cámara.
+
+Todas tienen leer() -> frame BGR y cerrar().
+"""
+
+import collections
+import glob
+import http.client
+import os
+import threading
+
+import cv2
+import numpy as np
+
+TIMEOUT_S = 5
+BUFFER_FRAMES = 3
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def decodificar_jpeg(datos):
+    return cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class FuenteCamara:
+    """Interfaz común de las fuentes de imagen."""
+
+    def leer(self):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# ---------------- FOTO ÚNICA (RESPALDO) ----------------
+
+class CamaraFoto(FuenteCamara):
+    """Captura un frame por petición a http://ip/shot.jpg con conexión persistente."""
+
+    def __init__(self, ip, ruta="/shot.jpg", timeout=TIMEOUT_S):
+        self.ip = ip
+        self.ruta = ruta
+        self.timeout = timeout
+        self._conexion = None
+
+    def _pedir(self):
+        if self._conexion is None:
+            self._conexion = http.client.HTTPConnection(self.ip, timeout=self.timeout)
+        self._conexion.request("GET", self.ruta, headers={"Connection": "keep-alive"})
+        resp = self._conexion.getresponse()
+        datos = resp.read()
+        if resp.status != 200:
+            raise IOError(f"La cámara respondió {resp.status} a {self.ruta}")
+        return datos
+
+    def leer(self):
+        try:
+            datos = self._pedir()
+        except (http.client.HTTPException, OSError):
+            # La cámara cerró la conexión: se abre una nueva y se reintenta una vez
+            self.cerrar()
+            datos = self._pedir()
+        frame = decodificar_jpeg(datos)
+        if frame is None:
+            raise IOError("No se pudo decodificar la imagen de la cámara")
+        return frame
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+
+# ---------------- STREAM MJPEG ----------------
+
+class CamaraMJPEG(FuenteCamara):
+    """
+    Lee el stream MJPEG de http://ip/video en un hilo de fondo. Los últimos
+    'buffer' frames quedan en memoria; si se corta la conexión se reconecta sola.
+    """
+
+    def __init__(self, ip, ruta="/video", buffer=BUFFER_FRAMES, timeout=TIMEOUT_S):
+        self.ip = ip
+        self.ruta = ruta
+        self.timeout = timeout
+        self.frames = collections.deque(maxlen=buffer)
+        self.contador = 0            # número de frames decodificados desde que se abrió
+        self.error = None
+        self._cond = threading.Condition()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._leer_stream, daemon=True)
+        self._hilo.start()
+
+    def _leer_stream(self):
+        espera = 0.5
+        while not self._detener.is_set():
+            conexion = None
+            try:
+                conexion = http.client.HTTPConnection(self.ip, timeout=self.timeout)
+                conexion.request("GET", self.ruta)
+                resp = conexion.getresponse()
+                if resp.status != 200:
+                    raise IOError(f"La cámara respondió {resp.status} a {self.ruta}")
+                espera = 0.5
+                self._procesar(resp)
+            except (http.client.HTTPException, OSError) as e:
+                self.error = e
+                self._detener.wait(espera)
+                espera = min(espera * 2, 5)
+            finally:
+                if conexion is not None:
+                    conexion.close()
+
+    def _procesar(self, resp):
+        datos = b""
+        while not self._detener.is_set():
+            bloque = resp.read1(65536)
+            if not bloque:
+                raise IOError("Se cerró el stream de la cámara")
+            datos += bloque
+            # Se busca el último JPEG completo del bloque (SOI ... EOI) y se descarta lo anterior
+            fin = datos.rfind(b"\xff\xd9")
+            if fin < 0:
+                continue
+            inicio = datos.rfind(b"\xff\xd8", 0, fin)
+            if inicio < 0:
+                datos = datos[fin + 2:]
+                continue
+            frame = decodificar_jpeg(datos[inicio:fin + 2])
+            datos = datos[fin + 2:]
+            if frame is None:
+                continue
+            with self._cond:
+                self.frames.append(frame)
+                self.contador += 1
+                self.error = None
+                self._cond.notify_all()
+
+    def leer(self, timeout=TIMEOUT_S):
+        """Devuelve el frame más reciente; espera al primero si todavía no llegó."""
+        return self.leer_nuevo(0, timeout)[0]
+
+    def leer_nuevo(self, ultimo=0, timeout=TIMEOUT_S):
+        """
+        Espera un frame con número mayor a 'ultimo' y devuelve (frame, número).
+        Sirve para no procesar dos veces el mismo frame. El frame es una copia:
+        quien lo recibe puede dibujar sobre él sin tocar el buffer.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.contador > ultimo, timeout):
+                raise TimeoutError(f"No llegan frames de la cámara ({self.error})")
+            return self.frames[-1].copy(), self.contador
+
+    def cerrar(self):
+        self._detener.set()
+        self._hilo.join(timeout=self.timeout + 1)
+
+
+# ---------------- ARCHIVOS (PRUEBAS) ----------------
+
+class CamaraArchivo(FuenteCamara):
+    """
+    Devuelve imágenes desde disco: una sola imagen siempre, o las de una carpeta
+    en orden alfabético (al terminar vuelve a empezar si repetir=True).
+    """
+
+    def __init__(self, ruta, repetir=True):
+        if os.path.isdir(ruta):
+            self.rutas = sorted(p for p in glob.glob(os.path.join(ruta, "*"))
+                                if p.lower().endswith(EXTENSIONES))
+        else:
+            self.rutas = [ruta]
+        if not self.rutas:
+            raise FileNotFoundError(f"No hay imágenes en {ruta}")
+        self.repetir = repetir
+        self._i = 0
+
+    def leer(self):
+        if self._i >= len(self.rutas):
+            if not self.repetir:
+                raise EOFError("No quedan imágenes")
+            self._i = 0
+        frame = cv2.imread(self.rutas[self._i])
+        if frame is None:
+            raise IOError(f"No se pudo leer {self.rutas[self._i]}")
+        if len(self.rutas) > 1:
+            self._i += 1
+        return frame
+
+
+def abrir_camara(fuente, modo="mjpeg"):
+    """
+    Crea la fuente de imagen:
+    - una FuenteCamara se devuelve tal cual
+    - una ruta a un archivo o carpeta existente -> CamaraArchivo
+    - "ip:puerto" -> CamaraMJPEG (modo="mjpeg") o CamaraFoto (modo="foto")
+    """
+    if isinstance(fuente, FuenteCamara):
+        return fuente
+    if os.path.exists(fuente):
+        return CamaraArchivo(fuente)
+    if modo == "mjpeg":
+        return CamaraMJPEG(fuente)
+    if modo == "foto":
+        return CamaraFoto(fuente)
+    raise ValueError("modo debe ser 'mjpeg' o 'foto'")
@@ -0,0 +1,127 @@
+"""
+Detección automática de la jugada del humano a partir de la cámara.
+
+En vez de esperar a que el operador presione S, DetectorMovimiento compara
+miniaturas de cada frame: cuando la escena cambió respecto
+al último tablero confirmado y luego se queda quieta varios frames seguidos (ya
+no hay una mano frente a la cámara), recién entonces corre el detector completo
+y verifica que haya exactamente una ficha nueva en una posición legal.
+
+Los tableros que entra y sale de aquí están en la orientación de la IA (fila 0 =
+abajo), es decir, np.flipud de lo que entrega detectar_tablero.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from detector_tablero import analizar_frame, obtener_frame
+
+# ---------------- CONFIGURACIÓN ----------------
+TAMANO_MINIATURA = (80, 60)     # ancho, alto
+UMBRAL_PIXEL = 25               # diferencia de intensidad para contar un píxel como cambiado
+UMBRAL_MOVIMIENTO = 6           # píxeles cambiados entre frames seguidos para considerar que hay movimiento
+UMBRAL_CAMBIO = 6               # píxeles cambiados respecto a la referencia (una ficha nueva ocupa ~30)
+FRAMES_ESTABLES = 8             # frames quietos seguidos antes de analizar
+INTERVALO_S = 0.05              # pausa entre lecturas para fuentes sin stream
+# ------------------------------------------------
+
+
+def miniatura(frame):
+    """Versión reducida y suavizada del frame (en color) para comparar barato."""
+    chica = cv2.resize(frame, TAMANO_MINIATURA, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(chica, (3, 3), 0)
+
+
+def diferencia(a, b):
+    """Número de píxeles de la miniatura que cambiaron en algún canal."""
+    return int(np.count_nonzero(cv2.absdiff(a, b).max(axis=2) > UMBRAL_PIXEL))
+
+
+def validar_jugada(anterior, nuevo, color):
+    """
+    Revisa que 'nuevo' sea 'anterior' más una sola ficha de 'color' apoyada en
+    la primera celda libre de su columna. Devuelve (True, columna) o (False, motivo).
+    """
+    cambios = np.argwhere(anterior != nuevo)
+    if len(cambios) == 0:
+        return False, "no hay fichas nuevas"
+    if len(cambios) > 1:
+        return False, f"cambiaron {len(cambios)} celdas"
+    fila, col = cambios[0]
+    if anterior[fila, col] != 0:
+        return False, f"la ficha de la celda ({fila},{col}) cambió de color"
+    if nuevo[fila, col] != color:
+        return False, "la ficha nueva no es del color del humano"
+    if fila > 0 and anterior[fila - 1, col] == 0:
+        return False, f"ficha flotando en la columna {col}"
+    return True, int(col)
+
+
+class DetectorMovimiento:
+    """Espera la jugada del humano leyendo la cámara de forma continua."""
+
+    def __init__(self, camara, frames_estables=FRAMES_ESTABLES, coords_file=None):
+        self.camara = camara
+        self.frames_estables = frames_estables
+        self.coords_file = coords_file      # calibración de esta cámara (None = COORDS_FILE)
+        self.referencia = None
+        self._ultimo = 0
+
+    def _leer(self):
+        # Con CamaraMJPEG se espera el siguiente frame nuevo; con otras fuentes se lee a intervalos
+        if hasattr(self.camara, "leer_nuevo"):
+            frame, self._ultimo = self.camara.leer_nuevo(self._ultimo)
+            return frame
+        time.sleep(INTERVALO_S)
+        return obtener_frame(self.camara)
+
+    def fijar_referencia(self, frame=None):
+        """Toma la escena actual como la del último tablero confirmado."""
+        self.referencia = miniatura(frame if frame is not None else self._leer())
+
+    def esperar_jugada(self, anterior, color_humano, detener=None, avisar=print):
+        """
+        Bloquea hasta detectar una jugada legal del humano sobre 'anterior' y
+        devuelve el tablero nuevo. 'detener' es un threading.Event opcional para
+        cancelar la espera (devuelve None).
+
+        La referencia es siempre la escena del último tablero confirmado: si una
+        lectura no cuadra (mano, sombra o celda mal leída) se vuelve a leer tras
+        otros frames quietos, hasta que la jugada sea válida o la escena vuelva
+        a ser la de la referencia.
+        """
+        if self.referencia is None:
+            self.fijar_referencia()
+        previo = self.referencia
+        quietos = 0
+        motivo = None       # último motivo avisado, para no repetirlo en cada lectura
+        while detener is None or not detener.is_set():
+            frame = self._leer()
+            actual = miniatura(frame)
+            if diferencia(actual, previo) > UMBRAL_MOVIMIENTO:
+                quietos = 0
+            else:
+                quietos += 1
+            previo = actual
+
+            if diferencia(actual, self.referencia) <= UMBRAL_CAMBIO:
+                motivo = None
+                continue
+            if quietos < self.frames_estables:
+                continue
+
+            # La escena cambió y ya está quieta: se analiza el tablero completo
+            tablero = np.flipud(analizar_frame(frame, mostrar=False, coords_file=self.coords_file))
+            ok, resultado = validar_jugada(anterior, tablero, color_humano)
+            if ok:
+                self.referencia = actual
+                return tablero
+            # La referencia no se toca: se espera otra ventana de frames quietos
+            # y se vuelve a leer
+            quietos = 0
+            if resultado != motivo:
+                avisar(f"Cambio en la cámara ignorado: {resultado}")
+                motivo = resultado
+        return None
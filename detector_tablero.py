@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import threading
 import urllib.request
 
 # ---------------- CONFIGURACIÓN ----------------
@@ -20,6 +21,15 @@ UPPER_RED2 = np.array([180, 255, 255])
 REF_RED_BGR = np.array([0, 0, 255], dtype=np.float32)
 REF_YELLOW_BGR = np.array([0, 255, 255], dtype=np.float32)
 
+# Color con que se dibuja cada celda según lo detectado (vacía, amarillo, rojo)
+COLORES_DIBUJO = {0: (180, 180, 180), 1: (0, 255, 255), 2: (0, 0, 255)}
+
+# Seguimiento del tablero entre turnos
+FILAS, COLUMNAS = 6, 7
+RESCAN_CADA = 6         # lecturas parciales seguidas antes de volver a analizar las 42 celdas
+MAX_MASCARAS = 64       # subconjuntos de celdas cuyas máscaras se guardan
+MAX_CLASIFICADORES = 8  # calibraciones distintas en memoria (una por estación en servidor.py)
+
 # ------------------------------------------------
 
 def obtener_frame_desde_ip(ip):
@@ -30,6 +40,15 @@ def obtener_frame_desde_ip(ip):
     frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
     return frame
 
+def obtener_frame(fuente):
+    """
+    Frame desde una fuente de camara.py (CamaraMJPEG, CamaraFoto, CamaraArchivo)
+    o, si se pasa un texto "ip:puerto", con una foto única como antes.
+    """
+    if isinstance(fuente, str):
+        return obtener_frame_desde_ip(fuente)
+    return fuente.leer()
+
 def circle_mask(h, w, cx, cy, r):
     Y, X = np.ogrid[:h, :w]
     dist = (X - cx)**2 + (Y - cy)**2
@@ -42,13 +61,148 @@ def mean_bgr_in_mask(img_bgr, mask):
     vals = img_bgr[mask_bool]
     return vals.mean(axis=0).astype(np.float32)
 
-def calibrar_celdas(ip_cam):
-    """Permite seleccionar manualmente los 42 centros del tablero."""
+# ---------------- CLASIFICADOR DE CELDAS ----------------
+
+class ClasificadorCeldas:
+    """
+    Clasificador de las 42 celdas armado una sola vez a partir de la calibración.
+
+    Guarda, para cada celda, los índices de los píxeles de su ROI de 2R x 2R y su
+    máscara circular local. En cada frame se juntan todas las ROI en un mosaico
+    (una fila de 1 px de separación entre celdas), se umbraliza una vez y se
+    cuentan los píxeles de las 42 celdas en una sola reducción. El resultado es
+    el mismo que procesar cada ROI por separado como antes: los píxeles fuera
+    de la imagen y la separación se tratan como borde neutro en la apertura.
+    """
+
+    def __init__(self, coords, img_h, img_w, r=R_ADAPT):
+        self.coords = coords
+        self.shape = (img_h, img_w)
+        self.n = len(coords)
+        self.r = r
+        lado = 2 * r
+        self.paso = paso = lado + 1
+
+        j = np.arange(paso)
+        ys = np.empty((self.n, paso, paso), dtype=np.intp)
+        xs = np.empty((self.n, paso, paso), dtype=np.intp)
+        for idx, (cx, cy) in enumerate(coords):
+            cx, cy = int(cx), int(cy)
+            ys[idx] = (cy - r + j)[:, None]
+            xs[idx] = (cx - r + j)[None, :]
+        centros = np.array([(int(cx), int(cy)) for cx, cy in coords]).reshape(self.n, 2)
+
+        # Píxeles que pertenecen a la ROI de su celda (dentro de la imagen y fuera de la separación)
+        dentro = (ys >= 0) & (ys < img_h) & (xs >= 0) & (xs < img_w)
+        dentro[:, lado, :] = False
+        dentro[:, :, lado] = False
+        dist = (xs - centros[:, 0, None, None]) ** 2 + (ys - centros[:, 1, None, None]) ** 2
+        circulo = dentro & (dist <= r * r)
+
+        self.areas = circulo.sum(axis=(1, 2))
+        self._flat = (np.clip(ys, 0, img_h - 1) * img_w + np.clip(xs, 0, img_w - 1)).reshape(self.n, -1)
+        self._circulo_celdas = circulo
+        self._dentro = dentro
+        # Máscaras del mosaico por subconjunto de celdas (None = las 42)
+        self._mascaras = {}
+
+    def _mascaras_de(self, indices):
+        """Máscaras del mosaico con amarillo y rojo lado a lado: (m * paso, 2 * paso)."""
+        clave = None if indices is None else tuple(indices)
+        if clave not in self._mascaras:
+            if len(self._mascaras) >= MAX_MASCARAS:
+                self._mascaras = {k: v for k, v in self._mascaras.items() if k is None}
+            sel = slice(None) if indices is None else list(indices)
+            circulo = self._mosaico(self._circulo_celdas[sel])
+            neutro = self._mosaico(~self._dentro[sel])
+            self._mascaras[clave] = (np.hstack([circulo] * 2).astype(np.uint8) * 255,
+                                     np.hstack([neutro] * 2))
+        return self._mascaras[clave]
+
+    def _mosaico(self, arr):
+        return arr.reshape(len(arr) * self.paso, self.paso)
+
+    def ratios(self, frame, indices=None):
+        """
+        Devuelve (ratio_amarillo, ratio_rojo) de las celdas 'indices' (fila * 7 +
+        columna, en orden de calibración); con None, de las 42.
+        """
+        if indices is None:
+            flat, areas = self._flat, self.areas
+        else:
+            flat, areas = self._flat[list(indices)], self.areas[list(indices)]
+        m = len(flat)
+        circulo, neutro = self._mascaras_de(indices)
+
+        pixels = np.take(frame.reshape(-1, 3), flat.reshape(-1), axis=0)
+        roi_bgr = pixels.reshape(m * self.paso, self.paso, 3)
+        roi_hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
+
+        mask_y = cv2.inRange(roi_hsv, LOWER_YELLOW, UPPER_YELLOW)
+        mask_r = cv2.bitwise_or(cv2.inRange(roi_hsv, LOWER_RED1, UPPER_RED1),
+                                cv2.inRange(roi_hsv, LOWER_RED2, UPPER_RED2))
+        masks = cv2.bitwise_and(np.hstack([mask_y, mask_r]), circulo)
+
+        # Apertura (erosión + dilatación) con borde neutro fuera de cada ROI
+        masks[neutro] = 255
+        masks = cv2.erode(masks, MORPH_KERNEL)
+        masks[neutro] = 0
+        masks = cv2.dilate(masks, MORPH_KERNEL)
+        masks[neutro] = 0
+
+        cuentas = (masks.reshape(m, self.paso, 2, self.paso) > 0).sum(axis=(1, 3))
+        area = np.maximum(1, areas).astype(float)
+        return cuentas[:, 0] / area, cuentas[:, 1] / area
+
+
+def clasificar_color(ratio_y, ratio_r):
+    """0 = vacía, 1 = amarillo, 2 = rojo."""
+    if ratio_y >= MIN_RATIO and ratio_y > ratio_r:
+        return 1
+    elif ratio_r >= MIN_RATIO and ratio_r > ratio_y:
+        return 2
+    return 0
+
+
+_clasificadores = {}
+_clasificadores_lock = threading.Lock()
+
+
+def obtener_clasificador(img_h, img_w, path=None):
+    """
+    Reutiliza el clasificador de cada archivo de calibración (por defecto
+    COORDS_FILE) y tamaño de frame. Las coordenadas se leen del disco solo al
+    armarlo; si el archivo cambia (se recalibró) su fecha de modificación ya no
+    coincide y se arma otro. Se guardan varios para que las estaciones de
+    servidor.py (cada una con su calibración y su hilo) no se reconstruyan el
+    suyo una a la otra.
+    """
+    path = path or COORDS_FILE
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No existe {path}. Primero calibra con la tecla C.") from None
+    clave = (os.path.abspath(path), st.st_mtime_ns, st.st_size, img_h, img_w)
+    with _clasificadores_lock:
+        clasificador = _clasificadores.get(clave)
+        if clasificador is None:
+            if len(_clasificadores) >= MAX_CLASIFICADORES:
+                _clasificadores.pop(next(iter(_clasificadores)))
+            clasificador = _clasificadores[clave] = ClasificadorCeldas(cargar_coords(path), img_h, img_w)
+    return clasificador
+
+
+def calibrar_celdas(ip_cam, path=None):
+    """
+    Permite seleccionar manualmente los 42 centros del tablero. ip_cam: "ip:puerto"
+    o FuenteCamara. Se guardan en 'path' (por defecto COORDS_FILE).
+    """
+    path = path or COORDS_FILE
     print("\n--- MODO CALIBRACIÓN ---")
     print("Presiona con clic en el centro de cada celda (de arriba a abajo, izquierda a derecha).")
     print("Presiona 'S' cuando termines para guardar.\n")
 
-    frame = obtener_frame_desde_ip(ip_cam)
+    frame = obtener_frame(ip_cam)
     puntos = []
 
     def click_event(event, x, y, flags, param):
@@ -69,61 +223,58 @@ def calibrar_celdas(ip_cam):
             cv2.destroyAllWindows()
             return
 
-    np.save(COORDS_FILE, np.array(puntos))
+    np.save(path, np.array(puntos))
     cv2.destroyAllWindows()
-    print(f"Guardadas {len(puntos)} coordenadas en {COORDS_FILE}")
+    print(f"Guardadas {len(puntos)} coordenadas en {path}")
 
 def detectar_tablero(ip_cam):
-    """Toma una foto desde la cámara y analiza el tablero."""
+    """Toma una foto desde la cámara y analiza el tablero. ip_cam: "ip:puerto" o FuenteCamara."""
     if not os.path.exists(COORDS_FILE):
         raise FileNotFoundError(f"No existe {COORDS_FILE}. Primero calibra con la tecla C.")
 
-    coords = np.load(COORDS_FILE)
-    frame = obtener_frame_desde_ip(ip_cam)
+    frame = obtener_frame(ip_cam)
+    return analizar_frame(frame)
+
+def analizar_frame(frame, mostrar=True, coords_file=None):
+    """
+    Analiza un frame ya capturado; con mostrar=False no imprime ni abre ventanas.
+    'coords_file' es la calibración de la cámara (por defecto COORDS_FILE).
+    """
     img_h, img_w = frame.shape[:2]
-    img_hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    img_vis = frame.copy()
+    clasificador = obtener_clasificador(img_h, img_w, coords_file)
+    tablero = tablero_completo(clasificador, frame)
 
-    filas, columnas = 6, 7
-    tablero = np.zeros((filas, columnas), dtype=int)
+    if mostrar:
+        mostrar_resultado(frame, clasificador.coords, tablero)
 
-    for idx, (cx, cy) in enumerate(coords):
-        cx, cy = int(cx), int(cy)
-        mask = circle_mask(img_h, img_w, cx, cy, R_ADAPT)
-        roi_hsv = img_hsv[max(0, cy - R_ADAPT):cy + R_ADAPT, max(0, cx - R_ADAPT):cx + R_ADAPT]
-        roi_bgr = frame[max(0, cy - R_ADAPT):cy + R_ADAPT, max(0, cx - R_ADAPT):cx + R_ADAPT]
-        mask_local = mask[max(0, cy - R_ADAPT):cy + R_ADAPT, max(0, cx - R_ADAPT):cx + R_ADAPT]
+    return tablero
 
-        mask_y = cv2.inRange(roi_hsv, LOWER_YELLOW, UPPER_YELLOW)
-        mask_r1 = cv2.inRange(roi_hsv, LOWER_RED1, UPPER_RED1)
-        mask_r2 = cv2.inRange(roi_hsv, LOWER_RED2, UPPER_RED2)
-        mask_r = cv2.bitwise_or(mask_r1, mask_r2)
-
-        mask_y = cv2.bitwise_and(mask_y, mask_local)
-        mask_r = cv2.bitwise_and(mask_r, mask_local)
-
-        mask_y = cv2.morphologyEx(mask_y, cv2.MORPH_OPEN, MORPH_KERNEL)
-        mask_r = cv2.morphologyEx(mask_r, cv2.MORPH_OPEN, MORPH_KERNEL)
-
-        cnt_y = cv2.countNonZero(mask_y)
-        cnt_r = cv2.countNonZero(mask_r)
-        area = cv2.countNonZero(mask_local)
-        ratio_y = cnt_y / float(max(1, area))
-        ratio_r = cnt_r / float(max(1, area))
-
-        detected = 0
-        color_draw = (180, 180, 180)
-        if ratio_y >= MIN_RATIO and ratio_y > ratio_r:
-            detected = 1
-            color_draw = (0, 255, 255)
-        elif ratio_r >= MIN_RATIO and ratio_r > ratio_y:
-            detected = 2
-            color_draw = (0, 0, 255)
-
-        row = idx // columnas
-        col = idx % columnas
-        tablero[row, col] = detected
-        cv2.circle(img_vis, (cx, cy), R_ADAPT, color_draw, 2)
+
+def tablero_completo(clasificador, frame):
+    """Clasifica las 42 celdas del frame (orientación de la cámara)."""
+    tablero = np.zeros((FILAS, COLUMNAS), dtype=int)
+
+    ratios_y, ratios_r = clasificador.ratios(frame)
+
+    for idx in range(clasificador.n):
+        row = idx // COLUMNAS
+        col = idx % COLUMNAS
+        tablero[row, col] = clasificar_color(ratios_y[idx], ratios_r[idx])
+
+    return tablero
+
+def cargar_coords(path=None):
+    path = path or COORDS_FILE
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe {path}. Primero calibra con la tecla C.")
+    return np.load(path)
+
+def mostrar_resultado(frame, coords, tablero):
+    """Imprime la matriz y muestra cada celda marcada con el color detectado."""
+    img_vis = frame.copy()
+    for idx, (cx, cy) in enumerate(coords):
+        color_draw = COLORES_DIBUJO[tablero[idx // COLUMNAS, idx % COLUMNAS]]
+        cv2.circle(img_vis, (int(cx), int(cy)), R_ADAPT, color_draw, 2)
 
     print("\nMatriz del tablero:")
     print(tablero)
@@ -132,4 +283,109 @@ def detectar_tablero(ip_cam):
     cv2.waitKey(1000)
     cv2.destroyWindow("Resultado")
 
-    return tablero
+
+# ---------------- SEGUIMIENTO DEL TABLERO ----------------
+
+class TransicionImposible(ValueError):
+    """El tablero leído no puede salir del último tablero confirmado."""
+
+
+def validar_transicion(anterior, nuevo, max_nuevas=1):
+    """
+    Lanza TransicionImposible si 'nuevo' (orientación de la cámara, fila 0 =
+    arriba) tiene fichas flotando o no sale de 'anterior' agregando a lo más
+    'max_nuevas' fichas. Con anterior=None solo se revisa la gravedad.
+    """
+    flotando = (nuevo[:-1] != 0) & (nuevo[1:] == 0)
+    if flotando.any():
+        cols = sorted(set(np.nonzero(flotando)[1].tolist()))
+        raise TransicionImposible(f"ficha flotando en la columna {', '.join(map(str, cols))}")
+    if anterior is None:
+        return
+    cambiadas = np.argwhere((anterior != 0) & (nuevo != anterior))
+    if len(cambiadas):
+        fila, col = cambiadas[0]
+        raise TransicionImposible(f"cambió o desapareció la ficha de la celda ({fila},{col})")
+    nuevas = int(np.count_nonzero((anterior == 0) & (nuevo != 0)))
+    if nuevas > max_nuevas:
+        raise TransicionImposible(f"aparecieron {nuevas} fichas nuevas (máximo {max_nuevas})")
+
+
+class TableroSeguido:
+    """
+    Guarda el último tablero confirmado (orientación de la cámara) y, por la
+    gravedad, en cada lectura clasifica solo la primera celda libre de cada
+    columna (a lo más 7 de 42). Si aparece una ficha nueva se revisa también la
+    celda de arriba. Cada 'rescan_cada' lecturas, o cuando lo leído no cuadra,
+    se analizan las 42 celdas; si tampoco cuadra se lanza TransicionImposible y
+    el estado no cambia. 'coords_file' es la calibración de esta cámara (por
+    defecto COORDS_FILE).
+    """
+
+    def __init__(self, max_nuevas=1, rescan_cada=RESCAN_CADA, coords_file=None):
+        self.max_nuevas = max_nuevas
+        self.rescan_cada = rescan_cada
+        self.coords_file = coords_file
+        self.estado = None
+        self.parciales = 0
+
+    def reiniciar(self):
+        """Olvida el estado: la siguiente lectura analiza el tablero completo."""
+        self.estado = None
+        self.parciales = 0
+
+    def confirmar(self, tablero):
+        """Fija el estado con un tablero ya validado por otro camino."""
+        self.estado = np.array(tablero, dtype=int)
+
+    def candidatas(self):
+        """Índices (fila * 7 + columna) de la primera celda libre de cada columna no llena."""
+        libres = (self.estado == 0).sum(axis=0)
+        return [(libres[c] - 1) * COLUMNAS + c for c in range(COLUMNAS) if libres[c] > 0]
+
+    def detectar(self, fuente, mostrar=True):
+        """Como detectar_tablero, pero siguiendo el estado entre lecturas."""
+        return self.analizar(obtener_frame(fuente), mostrar)
+
+    def analizar(self, frame, mostrar=True):
+        img_h, img_w = frame.shape[:2]
+        clasificador = obtener_clasificador(img_h, img_w, self.coords_file)
+        tablero = None
+        if self.estado is not None and self.parciales < self.rescan_cada:
+            tablero = self._parcial(frame, clasificador)
+        if tablero is None:
+            tablero = tablero_completo(clasificador, frame)
+            validar_transicion(self.estado, tablero, self.max_nuevas)
+            self.parciales = 0
+        else:
+            self.parciales += 1
+        self.estado = tablero
+
+        if mostrar:
+            mostrar_resultado(frame, clasificador.coords, tablero)
+        return tablero.copy()
+
+    @staticmethod
+    def _clasificar(frame, clasificador, indices):
+        ratios_y, ratios_r = clasificador.ratios(frame, indices)
+        return [clasificar_color(y, r) for y, r in zip(ratios_y, ratios_r)]
+
+    def _parcial(self, frame, clasificador):
+        """Tablero nuevo leyendo solo las celdas candidatas, o None si no cuadra."""
+        indices = self.candidatas()
+        if not indices:
+            return self.estado.copy()
+        colores = self._clasificar(frame, clasificador, indices)
+        nuevas = [(idx, c) for idx, c in zip(indices, colores) if c != 0]
+        if len(nuevas) > self.max_nuevas:
+            return None
+
+        # Sobre una ficha nueva no puede haber otra: si la hay, el tablero cambió más de lo esperado
+        arriba = [idx - COLUMNAS for idx, _ in nuevas if idx >= COLUMNAS]
+        if arriba and any(self._clasificar(frame, clasificador, arriba)):
+            return None
+
+        tablero = self.estado.copy()
+        for idx, color in nuevas:
+            tablero[idx // COLUMNAS, idx % COLUMNAS] = color
+        return tablero
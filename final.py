@@ -1,10 +1,18 @@
+import os
 import time
 import numpy as np
 import cv2
 import serial
 
-from detector_tablero import detectar_tablero, calibrar_celdas
-from ai_conecta4 import get_best_move, check_winner  
+from detector_tablero import calibrar_celdas, TableroSeguido
+from camara import abrir_camara
+from deteccion_movimiento import DetectorMovimiento
+from ai_conecta4 import get_best_move, check_winner, SearchStats
+from transposition import TranspositionTable
+from opening_book import OpeningBook, DEFAULT_BOOK_FILE
+from pondering import Ponderer
+from protocolo_serial import EnlaceSerial
+from trayectoria import planear_turno
 
 # Importamos tu función CINEMÁTICA INVERSA
 from CI import mover_robot
@@ -12,12 +20,50 @@ from CI import mover_robot
 
 # ------------------ CONFIG ------------------
 IP_CAMARA = "192.168.1.181:8080"
+PUERTO_SERIAL = "COM13"
+MODO_CAMARA = "mjpeg"   # "mjpeg" (stream en segundo plano) o "foto" (una petición por frame)
+TIEMPO_IA_MS = 3000   # tiempo máximo de búsqueda por jugada (None = profundidad fija)
+LIBRO_APERTURAS = DEFAULT_BOOK_FILE   # se genera con: python opening_book.py
+WORKERS_IA = os.cpu_count() or 1      # procesos para la búsqueda (1 = en serie)
+MOSTRAR_ESTADISTICAS = False          # imprime nodos, cortes, tiempos y variante principal de cada búsqueda
+# True si el firmware del ESP32 contesta ACK/DONE (ver protocolo_serial.py);
+# con False se manda cada pose y se espera un tiempo fijo como antes
+USAR_PROTOCOLO = False
+# Con protocolo, manda el turno completo como una sola trayectoria que pasa por el
+# punto medio (9) sin detenerse (ver trayectoria.py)
+USAR_TRAYECTORIA = True
 # --------------------------------------------
 
 # ========= PUERTO SERIAL =========
-# Se abre solo UNA VEZ
-ser = serial.Serial('COM13', 115200, timeout=1)
-time.sleep(2)
+# Se abre solo UNA VEZ, la primera vez que se necesita (importar final no abre el puerto)
+ser = None
+enlace = None
+
+
+def abrir_serial():
+    global ser, enlace
+    if ser is None:
+        ser = serial.Serial(PUERTO_SERIAL, 115200, timeout=1)
+        time.sleep(2)
+        enlace = EnlaceSerial(ser) if USAR_PROTOCOLO else None
+    return ser
+
+
+# ========= CÁMARA =========
+# Se abre la primera vez que se necesita y se reutiliza en todas las partidas
+camara = None
+
+
+def obtener_camara():
+    global camara
+    if camara is None:
+        camara = abrir_camara(IP_CAMARA, MODO_CAMARA)
+    return camara
+
+
+# ========= LIBRO DE APERTURAS =========
+# Es opcional: si no existe el archivo se busca desde la primera jugada
+libro = OpeningBook(LIBRO_APERTURAS) if os.path.exists(LIBRO_APERTURAS) else None
 
 
 # ========= FUNCIÓN PARA ENVIAR =========
@@ -26,36 +72,55 @@ def enviar_movimiento(arr):
     Envía al ESP32 el arreglo EXACTO que entrega mover_robot()
     sin modificar nada.
     """
+    if enlace is not None:
+        # Bloquea hasta que el ESP32 avisa que terminó el movimiento
+        dt = enlace.enviar(arr)
+        print(f"ESP32 completó el movimiento en {dt:.2f} s")
+        return
     msg = ",".join(str(v) for v in arr) + "\n"
     ser.write(msg.encode())
     print("Sent to ESP32:", msg.strip())
 
 
+def esperar_movimiento(segundos):
+    """Pausa fija para el firmware sin protocolo; con protocolo no hace falta."""
+    if enlace is None:
+        time.sleep(segundos)
+
+
 # ========= SECUENCIA COMPLETA DEL ROBOT =========
 def ejecutar_secuencia_robot(columna_robot):
+    if enlace is not None and USAR_TRAYECTORIA:
+        print(f"\n[MOVIMIENTO] Trayectoria completa hacia la columna {columna_robot}")
+        tray = planear_turno(columna_robot)
+        print(f"{len(tray.tramos)} tramos, {tray.duracion:.2f} s estimados")
+        dt = enlace.enviar_trayectoria(tray)
+        print(f"ESP32 completó la trayectoria en {dt:.2f} s")
+        return
+
     print("\n[MOVIMIENTO] Ir a punto de toma (7)")
     arr = mover_robot(10)
     print("Arreglo:", arr)
     enviar_movimiento(arr)
-    time.sleep(10)
+    esperar_movimiento(10)
 
     print("\n[MOVIMIENTO] Ir a punto medio (9)")
     arr = mover_robot(9)
     print("Arreglo:", arr)
     enviar_movimiento(arr)
-    time.sleep(5)
+    esperar_movimiento(5)
 
     print(f"\n[MOVIMIENTO] Ir a columna {columna_robot}")
     arr = mover_robot(columna_robot)
     print("Arreglo:", arr)
     enviar_movimiento(arr)
-    time.sleep(5)
+    esperar_movimiento(5)
 
     print("\n[MOVIMIENTO] Regresar a punto medio (9)")
     arr = mover_robot(9)
     print("Arreglo:", arr)
     enviar_movimiento(arr)
-    time.sleep(5)
+    esperar_movimiento(5)
 
     print("\n[MOVIMIENTO] Regresar a punto de toma (8)")
     arr = mover_robot(11)
@@ -67,67 +132,117 @@ def ejecutar_secuencia_robot(columna_robot):
 # =============== LOGICA JUEGO ===============
 def jugar_partida():
     print("\n=== CONECTA 4 con Visión Artificial + Robot ===")
+    abrir_serial()
     humano_color = input("Elige tu color (R=rojo, Y=amarillo): ").strip().upper()
     color_humano = 2 if humano_color == "R" else 1
     color_robot = 1 if color_humano == 2 else 2
 
     print(f"Tu color: {'ROJO' if color_humano == 2 else 'AMARILLO'}")
-    print("Presiona S para analizar el tablero, C para recalibrar, Q para salir.\n")
 
-    while True:
-        tecla = input(">> ").lower()
-
-        if tecla == "s":
-            try:
-                tablero = detectar_tablero(IP_CAMARA)
-                tablero_para_ia = np.flipud(tablero)
-                print("Tablero detectado por cámara:\n", tablero)
+    # Tabla de transposición que se conserva entre jugadas de esta partida
+    tabla = TranspositionTable()
+    # Mientras el humano piensa, se precalculan las respuestas a sus 7 jugadas posibles
+    ponderador = Ponderer(color_robot, color_humano, tt=tabla, time_ms=TIEMPO_IA_MS, book=libro)
+    # Último tablero confirmado: entre turnos solo se clasifican las celdas que pueden cambiar
+    seguidor = TableroSeguido()
+
+    def turno_robot(tablero):
+        """
+        Responde al tablero detectado (orientación de la cámara). Devuelve el
+        tablero después de la jugada del robot en orientación de la IA, o None si
+        no se jugó o la partida terminó.
+        """
+        tablero_para_ia = np.flipud(tablero)
+        print("Tablero detectado por cámara:\n", tablero)
+
+        # Revisar ganador antes de jugar
+        previo = check_winner(tablero_para_ia)
+
+        if previo == color_robot:
+            print("\n>>> El robot YA HABÍA GANADO antes de mover.")
+            return None
+        elif previo == color_humano:
+            print("\n>>> TÚ YA HABÍAS GANADO antes de mover.")
+            return None
+
+        columna = ponderador.take(tablero_para_ia)
+        if columna is not None:
+            print("Jugada ya calculada mientras pensabas.")
+        else:
+            estadisticas = SearchStats() if MOSTRAR_ESTADISTICAS else None
+            columna = get_best_move(tablero_para_ia, color_robot, color_humano, tt=tabla,
+                                    time_ms=TIEMPO_IA_MS, book=libro, workers=WORKERS_IA, stats=estadisticas)
+            if estadisticas is not None:
+                print(estadisticas)
 
-                # Revisar ganador antes de jugar
-                previo = check_winner(tablero_para_ia)
+        if columna is None:
+            print("\nNo hay jugadas disponibles. TABLERO LLENO.")
+            return None
 
-                if previo == color_robot:
-                    print("\n>>> El robot YA HABÍA GANADO antes de mover.")
-                    continue
-                elif previo == color_humano:
-                    print("\n>>> TÚ YA HABÍAS GANADO antes de mover.")
-                    continue
+        print(f"\n>>> El robot jugará en la columna {columna}")
 
-                columna = get_best_move(tablero_para_ia, color_robot, color_humano)
+        ejecutar_secuencia_robot(columna)
 
-                if columna is None:
-                    print("\nNo hay jugadas disponibles. TABLERO LLENO.")
-                    continue
+        esperar_movimiento(2)
+        tablero_despues = seguidor.detectar(obtener_camara())
+        tablero_final = np.flipud(tablero_despues)
 
-                print(f"\n>>> El robot jugará en la columna {columna}")
+        ganador = check_winner(tablero_final)
 
-                ejecutar_secuencia_robot(columna)
+        if ganador == color_robot:
+            print("\n>>> El robot gana la partida.")
+        elif ganador == color_humano:
+            print("\n>>> Tú ganas la partida.")
+        else:
+            print("\n>>> Jugada completada. No hay ganador todavía.\n")
+            ponderador.start(tablero_final)
+            return tablero_final
+        return None
 
-                time.sleep(2)
-                tablero_despues = detectar_tablero(IP_CAMARA)
-                tablero_final = np.flipud(tablero_despues)
+    print("Presiona S para analizar el tablero, A para modo automático, C para recalibrar, Q para salir.\n")
 
-                ganador = check_winner(tablero_final)
+    while True:
+        tecla = input(">> ").lower()
 
-                if ganador == color_robot:
-                    print("\n>>> El robot gana la partida.")
-                elif ganador == color_humano:
-                    print("\n>>> Tú ganas la partida.")
-                else:
-                    print("\n>>> Jugada completada. No hay ganador todavía.\n")
+        if tecla == "s":
+            try:
+                turno_robot(seguidor.detectar(obtener_camara()))
+            except Exception as e:
+                ponderador.stop()
+                print("Error:", e)
 
+        elif tecla == "a":
+            # Modo automático: la cámara detecta sola la jugada del humano
+            print("Modo automático. Juega tu ficha y retira la mano; Ctrl+C para volver al modo manual.")
+            detector = DetectorMovimiento(obtener_camara())
+            try:
+                actual = np.flipud(seguidor.detectar(obtener_camara()))
+                detector.fijar_referencia()
+                while True:
+                    tablero_para_ia = detector.esperar_jugada(actual, color_humano)
+                    seguidor.confirmar(np.flipud(tablero_para_ia))
+                    actual = turno_robot(np.flipud(tablero_para_ia))
+                    if actual is None:
+                        break
+                    detector.fijar_referencia()
+            except KeyboardInterrupt:
+                ponderador.stop()
+                print("\nModo manual.")
             except Exception as e:
+                ponderador.stop()
                 print("Error:", e)
 
         elif tecla == "c":
-            calibrar_celdas(IP_CAMARA)
+            ponderador.stop()
+            calibrar_celdas(obtener_camara())
 
         elif tecla == "q":
+            ponderador.stop()
             print("Saliendo...")
             return
 
         else:
-            print("Tecla inválida. Usa S, C o Q.")
+            print("Tecla inválida. Usa S, A, C o Q.")
 
 
 
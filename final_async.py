@@ -0,0 +1,351 @@
+"""
+Ciclo de juego de final.py con asyncio, con las mismas reglas.
+
+La cámara, la búsqueda de la IA (en un hilo) y el puerto serial corren como
+tareas concurrentes. En cuanto el robot suelta la ficha, el brazo regresa al
+reposo mientras la cámara verifica la caída; si la ficha ya se ve, se revisa
+el ganador y el ponderador empieza a pensar antes de que el brazo termine.
+Cada turno imprime cuándo empezó y terminó cada etapa, para ver qué está en
+la ruta crítica.
+
+La jugada del humano se detecta sola con la cámara (deteccion_movimiento);
+con --manual se espera a que el operador presione Enter, como la tecla S.
+
+Uso:
+    python final_async.py
+    python final_async.py --manual
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import functools
+import sys
+import threading
+import time
+
+import numpy as np
+
+import final
+from ai_conecta4 import get_best_move, check_winner
+from CI import mover_robot
+from deteccion_movimiento import DetectorMovimiento
+from detector_tablero import TableroSeguido, TransicionImposible, obtener_frame
+from pondering import Ponderer
+from trayectoria import planear_turno
+from transposition import TranspositionTable
+
+# ---------------- CONFIGURACIÓN ----------------
+# Secuencia sin protocolo: (objetivo de valor(), espera en s); None es la columna elegida
+IDA = [(10, 10), (9, 5), (None, 5)]
+REGRESO = [(9, 5), (11, 2)]
+T_VERIFICAR_S = 8.0       # cuánto se intenta ver la ficha del robot mientras el brazo regresa
+INTERVALO_VERIFICAR_S = 0.2
+INTENTOS_LECTURA = 10     # lecturas que no cuadran antes de pedir confirmación al operador
+ANCHO_BARRA = 40
+# ------------------------------------------------
+
+
+async def en_hilo(fn, *args, **kwargs):
+    """Corre una función bloqueante en el executor por defecto."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+class Teclado:
+    """
+    Lee stdin en un hilo daemon que deja cada línea en una cola de asyncio. A
+    diferencia de input() en el executor, la espera se puede cancelar (Ctrl+C)
+    sin que asyncio.run se quede esperando a que alguien presione Enter.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._cola = None
+        self._terminado = False   # stdin se cerró (EOF): se responde Q
+
+    async def leer(self, mensaje):
+        if self._cola is None:
+            self._loop = asyncio.get_running_loop()
+            self._cola = asyncio.Queue()
+            threading.Thread(target=self._correr, daemon=True).start()
+        # Lo que se escribió mientras no se preguntaba no cuenta como respuesta
+        while not self._cola.empty():
+            self._cola.get_nowait()
+        print(mensaje, end="", flush=True)
+        if self._terminado:
+            return "q"
+        return await self._cola.get()
+
+    def _correr(self):
+        while True:
+            linea = sys.stdin.readline()
+            if not linea:
+                self._terminado = True
+            try:
+                self._loop.call_soon_threadsafe(self._cola.put_nowait, linea.rstrip("\n") if linea else "q")
+            except RuntimeError:      # el loop ya terminó
+                return
+            if not linea:
+                return
+
+
+class Cronometro:
+    """Marca el inicio y fin de cada etapa de un turno, relativo al inicio del turno."""
+
+    def __init__(self, titulo):
+        self.titulo = titulo
+        self.t0 = time.perf_counter()
+        self.etapas = []
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter() - self.t0
+        try:
+            yield
+        finally:
+            self.etapas.append((nombre, inicio, time.perf_counter() - self.t0))
+
+    async def medir(self, nombre, coro):
+        with self.etapa(nombre):
+            return await coro
+
+    def marcar(self, nombre):
+        t = time.perf_counter() - self.t0
+        self.etapas.append((nombre, t, t))
+
+    def imprimir(self):
+        if not self.etapas:
+            return
+        total = max(fin for _, _, fin in self.etapas) or 1.0
+        print(f"\n--- {self.titulo}: {total:.2f} s ---")
+        for nombre, inicio, fin in sorted(self.etapas, key=lambda e: e[1]):
+            a = int(inicio / total * ANCHO_BARRA)
+            b = max(a + 1, int(fin / total * ANCHO_BARRA))
+            barra = " " * a + "#" * (b - a)
+            print(f"{nombre:22s} {inicio:7.2f} -> {fin:7.2f} s  |{barra:{ANCHO_BARRA}s}|")
+
+
+# ---------------- MOVIMIENTO ----------------
+
+async def mover(secuencia, columna):
+    """Manda las poses una por una; sin protocolo espera el tiempo fijo de cada una."""
+    for objetivo, espera in secuencia:
+        arr = await en_hilo(mover_robot, columna if objetivo is None else objetivo)
+        await en_hilo(final.enviar_movimiento, arr)
+        if final.enlace is None:
+            await asyncio.sleep(espera)
+
+
+async def ejecutar_ida(columna):
+    """Lleva la ficha hasta la columna y la suelta. Devuelve lo que falta para regresar."""
+    if final.enlace is not None and final.USAR_TRAYECTORIA:
+        ida, regreso = await en_hilo(planear_turno, columna, partir=True)
+        await en_hilo(final.enlace.enviar_trayectoria, ida)
+        return regreso
+    await mover(IDA, columna)
+    return None
+
+
+async def ejecutar_regreso(regreso):
+    if regreso is not None:
+        await en_hilo(final.enlace.enviar_trayectoria, regreso)
+    else:
+        await mover(REGRESO, None)
+
+
+# ---------------- PARTIDA ----------------
+
+class PartidaAsync:
+    def __init__(self, color_humano, manual=False):
+        self.color_humano = color_humano
+        self.color_robot = 1 if color_humano == 2 else 2
+        self.manual = manual
+        self.teclado = Teclado()
+        final.abrir_serial()
+        self.camara = final.obtener_camara()
+        self.tabla = TranspositionTable()
+        self.ponderador = Ponderer(self.color_robot, self.color_humano, tt=self.tabla,
+                                   time_ms=final.TIEMPO_IA_MS, book=final.libro)
+        self.seguidor = TableroSeguido()
+        self.detector = DetectorMovimiento(self.camara)
+        self.turno = 0
+        self.frame_confirmado = None    # frame del último tablero confirmado
+
+    async def leer_tablero(self, intentos=INTENTOS_LECTURA):
+        """
+        Tablero actual en orientación de la IA. Si la lectura no cuadra con el
+        último tablero confirmado se avisa y se vuelve a leer, hasta 'intentos'
+        veces; después devuelve None.
+        """
+        for intento in range(intentos):
+            if intento:
+                await asyncio.sleep(INTERVALO_VERIFICAR_S)
+            frame = await en_hilo(obtener_frame, self.camara)
+            try:
+                tablero = np.flipud(await en_hilo(self.seguidor.analizar, frame, False))
+            except TransicionImposible as e:
+                print("Lectura descartada:", e)
+                continue
+            self.frame_confirmado = frame
+            return tablero
+        return None
+
+    async def confirmar_con_enter(self, mensaje, cron, etapa="espera humano"):
+        """Espera Enter y lee el tablero; si no cuadra lo vuelve a pedir. None si se presiona Q."""
+        while True:
+            with cron.etapa(etapa):
+                tecla = await self.teclado.leer(f"{mensaje} (Q para salir): ")
+            if tecla.strip().lower() == "q":
+                return None
+            with cron.etapa("detección"):
+                tablero = await self.leer_tablero(intentos=1)
+            if tablero is not None:
+                return tablero
+            print("Revisa el tablero y presiona Enter otra vez.")
+
+    async def esperar_humano(self, actual, cron):
+        if self.manual:
+            return await self.confirmar_con_enter("Enter cuando hayas jugado", cron)
+        # Si se cancela la tarea (Ctrl+C) el hilo de la espera no se entera solo: sin
+        # este evento seguiría leyendo la cámara y asyncio.run no podría terminar
+        detener = threading.Event()
+        try:
+            with cron.etapa("espera humano"):
+                tablero = await en_hilo(self.detector.esperar_jugada, actual, self.color_humano, detener)
+        finally:
+            detener.set()
+        if tablero is None:
+            return None
+        self.seguidor.confirmar(np.flipud(tablero))
+        return tablero
+
+    def revisar_ganador(self, tablero):
+        ganador = check_winner(tablero)
+        if ganador == self.color_robot:
+            print("\n>>> El robot gana la partida.")
+        elif ganador == self.color_humano:
+            print("\n>>> Tú ganas la partida.")
+        return ganador != 0
+
+    async def verificar_caida(self, esperado, cron):
+        """
+        Mientras el brazo regresa, busca en la cámara el tablero con la ficha del
+        robot. Si lo ve, lo confirma, revisa el ganador y arranca el ponderador;
+        devuelve el tablero (orientación de la IA) o None si no se alcanzó a ver.
+        """
+        esperado_cam = np.flipud(esperado)
+        limite = time.monotonic() + T_VERIFICAR_S
+        with cron.etapa("verificación caída"):
+            while time.monotonic() < limite:
+                frame = await en_hilo(obtener_frame, self.camara)
+                # Se lee sobre una copia: con el brazo enfrente la lectura puede estar mal
+                prueba = copy.deepcopy(self.seguidor)
+                try:
+                    tablero = await en_hilo(prueba.analizar, frame, False)
+                except TransicionImposible:
+                    tablero = None
+                if tablero is not None and np.array_equal(tablero, esperado_cam):
+                    self.seguidor.confirmar(tablero)
+                    self.frame_confirmado = frame
+                    break
+                await asyncio.sleep(INTERVALO_VERIFICAR_S)
+            else:
+                return None
+        if not self.revisar_ganador(esperado):
+            self.ponderador.start(esperado)
+            cron.marcar("inicio ponderación")
+        return esperado
+
+    async def turno_robot(self, tablero, cron):
+        """Juega el turno del robot sobre 'tablero' (orientación de la IA); None si terminó la partida."""
+        if check_winner(tablero) != 0:
+            self.revisar_ganador(tablero)
+            return None
+
+        with cron.etapa("búsqueda"):
+            columna = await en_hilo(self.ponderador.take, tablero)
+            if columna is None:
+                columna = await en_hilo(get_best_move, tablero, self.color_robot, self.color_humano,
+                                        tt=self.tabla, time_ms=final.TIEMPO_IA_MS, book=final.libro,
+                                        workers=final.WORKERS_IA)
+            else:
+                print("Jugada ya calculada mientras pensabas.")
+        if columna is None:
+            print("\nNo hay jugadas disponibles. TABLERO LLENO.")
+            return None
+        print(f"\n>>> El robot jugará en la columna {columna}")
+
+        esperado = tablero.copy()
+        esperado[np.count_nonzero(tablero[:, columna]), columna] = self.color_robot
+
+        regreso = await cron.medir("ida y caída", ejecutar_ida(columna))
+        # El regreso del brazo y la verificación de la caída van al mismo tiempo
+        movimiento = asyncio.create_task(cron.medir("regreso", ejecutar_regreso(regreso)))
+        verificado = await self.verificar_caida(esperado, cron)
+        await movimiento
+
+        if verificado is None:
+            # No se alcanzó a ver durante el regreso: lectura normal con el brazo en reposo
+            with cron.etapa("detección final"):
+                verificado = await self.leer_tablero()
+            if verificado is None:
+                # Lo más probable es que la ficha no haya caído: que lo revise el operador
+                print("\nNo se pudo confirmar la jugada del robot en la cámara.")
+                verificado = await self.confirmar_con_enter(
+                    "Revisa que la ficha del robot esté en el tablero y presiona Enter", cron, "espera operador")
+                if verificado is None:
+                    return None
+            if self.revisar_ganador(verificado):
+                return None
+            self.ponderador.start(verificado)
+        elif check_winner(verificado) != 0:
+            return None
+        print("\n>>> Jugada completada. No hay ganador todavía.\n")
+        return verificado
+
+    async def jugar(self, empieza_robot=False):
+        actual = await self.leer_tablero()
+        if actual is None:
+            actual = await self.confirmar_con_enter("Revisa el tablero y presiona Enter", Cronometro("Inicio"))
+            if actual is None:
+                return
+        try:
+            while True:
+                self.turno += 1
+                cron = Cronometro(f"Turno {self.turno}")
+                if not empieza_robot or self.turno > 1:
+                    if not self.manual:
+                        # Referencia: el frame donde se confirmó el tablero. Si el humano
+                        # ya jugó mientras el brazo regresaba, su ficha cuenta como cambio
+                        self.detector.fijar_referencia(self.frame_confirmado)
+                    actual = await self.esperar_humano(actual, cron)
+                    if actual is None:
+                        return
+                actual = await self.turno_robot(actual, cron)
+                cron.imprimir()
+                if actual is None:
+                    return
+        finally:
+            self.ponderador.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conecta 4 con el ciclo de juego asíncrono")
+    parser.add_argument("--manual", action="store_true", help="esperar Enter en vez de detectar la jugada")
+    args = parser.parse_args()
+
+    print("\n=== CONECTA 4 con Visión Artificial + Robot (asíncrono) ===")
+    humano_color = input("Elige tu color (R=rojo, Y=amarillo): ").strip().upper()
+    color_humano = 2 if humano_color == "R" else 1
+    print(f"Tu color: {'ROJO' if color_humano == 2 else 'AMARILLO'}")
+    empieza_robot = input("¿Empieza el robot? (s/n): ").strip().lower() == "s"
+
+    try:
+        asyncio.run(PartidaAsync(color_humano, args.manual).jugar(empieza_robot))
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Cinemática inversa analítica (cerrada) del brazo RRRR de CI.
+
+Con los parámetros DH de CI la primera articulación gira el plano del brazo y
+las otras tres son un brazo plano de 3 eslabones (l2, l3, l4) dentro de ese
+plano. Solo se pide la posición (como la máscara [1,1,1,0,0,0] de ikine_LM),
+así que sobra un grado de libertad: el cabeceo del último eslabón,
+
+    cabeceo = θ2 + θ3 ± θ4      (θi = qi + offset; el signo lo da alpha3)
+
+Fijado el cabeceo, la muñeca queda determinada y el resto es la solución
+geométrica de un brazo de 2 eslabones: hay hasta 4 ramas (base hacia el
+objetivo o girada 180°, codo arriba o abajo). soluciones() devuelve todas las
+ramas que respetan qlim; resolver() además elige el cabeceo y la rama más
+cercanos al estado actual de las articulaciones.
+
+Solo la parte con el cabeceo fijo es cerrada. El cabeceo libre no tiene
+fórmula: el criterio es la distancia a q_actual con los límites qlim de por
+medio, así que resolver() lo busca en una malla (cada 2° en toda la vuelta y
+luego cada 0.05° alrededor del mejor, unas 260 evaluaciones vectorizadas).
+Costo medido en una CPU: soluciones() 25-40 µs, resolver() con cabeceo dado
+~50 µs y resolver() con búsqueda de cabeceo 0.5-0.7 ms. Para los objetivos fijos
+del tablero CI guarda en caché la solución de cada uno.
+
+Validación contra robot.fkine de roboticstoolbox y contra ikine_LM:
+    python ik_analitica.py
+    python ik_analitica.py --muestras 20000
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+# ---------------- CONFIGURACIÓN ----------------
+PASO_CABECEO = np.radians(2.0)      # búsqueda gruesa del cabeceo
+PASO_FINO = np.radians(0.05)        # refinamiento alrededor del mejor
+TOLERANCIA_QLIM = 1e-9
+TOLERANCIA_POS = 1e-9               # m, error aceptado en la validación
+MUESTRAS = 2000
+# ------------------------------------------------
+
+
+class SinSolucionIK(ValueError):
+    """El objetivo está fuera del alcance o de los límites de las articulaciones."""
+
+
+def _envolver(a):
+    return (a + np.pi) % (2 * np.pi) - np.pi
+
+
+class IKAnalitica:
+    """IK cerrada a partir de la lista DH de CI: (d, a, alpha, offset, qlim) por articulación."""
+
+    def __init__(self, dh):
+        (self.l1, _, alpha1, _, _), (_, self.l2, alpha2, _, _), (_, self.l3, alpha3, _, _), \
+            (_, self.l4, _, _, _) = dh
+        if abs(math.cos(alpha1)) > 1e-9 or abs(math.sin(alpha2)) > 1e-9 or abs(math.sin(alpha3)) > 1e-9:
+            raise ValueError("La geometría DH no es la de una base giratoria con un brazo plano de 3 eslabones")
+        self.dh = dh
+        self.offset = np.array([o for _, _, _, o, _ in dh], dtype=float)
+        self.qmin = np.array([lim[0] for *_, lim in dh], dtype=float)
+        self.qmax = np.array([lim[1] for *_, lim in dh], dtype=float)
+        self.sz = round(math.sin(alpha1))                # el eje y1 apunta hacia +z o -z
+        self.s3 = round(math.cos(alpha2))                # sentido de θ3 en el plano
+        self.s4 = round(math.cos(alpha2) * math.cos(alpha3))  # sentido de θ4 en el plano
+
+    # ---- cinemática directa ----
+
+    def directa(self, q):
+        """Matriz homogénea 4x4 del efector final (producto de las matrices DH)."""
+        T = np.eye(4)
+        for (d, a, alpha, offset, _), qi in zip(self.dh, q):
+            th = qi + offset
+            ct, st, ca, sa = math.cos(th), math.sin(th), math.cos(alpha), math.sin(alpha)
+            T = T @ np.array([[ct, -st * ca, st * sa, a * ct],
+                              [st, ct * ca, -ct * sa, a * st],
+                              [0, sa, ca, d],
+                              [0, 0, 0, 1]])
+        return T
+
+    def posicion(self, q):
+        """(x, y, z) del efector final en forma cerrada."""
+        th = np.asarray(q, dtype=float) + self.offset
+        a2 = th[1]
+        a3 = a2 + self.s3 * th[2]
+        a4 = a3 + self.s4 * th[3]
+        r = self.l2 * math.cos(a2) + self.l3 * math.cos(a3) + self.l4 * math.cos(a4)
+        v = self.l2 * math.sin(a2) + self.l3 * math.sin(a3) + self.l4 * math.sin(a4)
+        return r * math.cos(th[0]), r * math.sin(th[0]), self.l1 + self.sz * v
+
+    def cabeceo(self, q):
+        """Ángulo del último eslabón dentro del plano del brazo."""
+        th = np.asarray(q, dtype=float) + self.offset
+        return float(_envolver(th[1] + self.s3 * th[2] + self.s4 * th[3]))
+
+    # ---- cinemática inversa ----
+
+    def soluciones(self, x, y, z, cabeceo):
+        """Todas las ramas (ángulos en radianes) que llegan a (x, y, z) con ese cabeceo."""
+        base = math.atan2(y, x)
+        rho = math.hypot(x, y)
+        v = (z - self.l1) * self.sz
+        l2, l3, l4 = self.l2, self.l3, self.l4
+        resultado = []
+        for th1, r in ((base, rho), (base + math.pi, -rho)):
+            # Muñeca: se le quita el último eslabón al objetivo
+            rw = r - l4 * math.cos(cabeceo)
+            vw = v - l4 * math.sin(cabeceo)
+            c3 = (rw * rw + vw * vw - l2 * l2 - l3 * l3) / (2 * l2 * l3)
+            if abs(c3) > 1 + 1e-12:
+                continue
+            for signo in (1, -1):
+                t3 = signo * math.acos(max(-1.0, min(1.0, c3)))     # codo arriba o abajo
+                t2 = math.atan2(vw, rw) - math.atan2(l3 * math.sin(t3), l2 + l3 * math.cos(t3))
+                t4 = cabeceo - t2 - t3
+                q = _envolver(np.array([th1, t2, self.s3 * t3, self.s4 * t4]) - self.offset)
+                if np.all((q >= self.qmin - TOLERANCIA_QLIM) & (q <= self.qmax + TOLERANCIA_QLIM)):
+                    resultado.append(q)
+        return resultado
+
+    def _ramas(self, x, y, z, cabeceos):
+        """
+        Lo mismo que soluciones() para muchos cabeceos a la vez: devuelve
+        (q, validas, cabeceo) con q de forma (4 * n, 4), las 4 ramas de cada cabeceo.
+        """
+        psi = np.asarray(cabeceos, dtype=float).reshape(1, 1, -1)
+        base = math.atan2(y, x)
+        rho = math.hypot(x, y)
+        v = (z - self.l1) * self.sz
+        # Ejes: (base hacia el objetivo / girada 180°, codo arriba / abajo, cabeceo)
+        th1 = np.array([base, base + np.pi]).reshape(2, 1, 1)
+        r = np.array([rho, -rho]).reshape(2, 1, 1)
+        signo = np.array([1.0, -1.0]).reshape(1, 2, 1)
+        rw = r - self.l4 * np.cos(psi)
+        vw = v - self.l4 * np.sin(psi)
+        c3 = (rw ** 2 + vw ** 2 - self.l2 ** 2 - self.l3 ** 2) / (2 * self.l2 * self.l3)
+        t3 = signo * np.arccos(np.clip(c3, -1, 1))
+        t2 = np.arctan2(vw, rw) - np.arctan2(self.l3 * np.sin(t3), self.l2 + self.l3 * np.cos(t3))
+        t4 = psi - t2 - t3
+        forma = t3.shape
+        th = np.stack([np.broadcast_to(th1, forma), t2, self.s3 * t3, self.s4 * t4], axis=-1)
+        q = _envolver(th - self.offset).reshape(-1, 4)
+        validas = (np.broadcast_to(np.abs(c3) <= 1 + 1e-12, forma).reshape(-1)
+                   & np.all((q >= self.qmin - TOLERANCIA_QLIM) & (q <= self.qmax + TOLERANCIA_QLIM), axis=1))
+        return q, validas, np.broadcast_to(psi, forma).reshape(-1)
+
+    def _distancias(self, q, referencia):
+        d = q - referencia
+        d[:, 0] = _envolver(d[:, 0])
+        return np.einsum("ij,ij->i", d, d)
+
+    def resolver(self, x, y, z, q_actual=None, cabeceo=None):
+        """
+        Ángulos (radianes) que llegan a (x, y, z) lo más cerca posible de
+        q_actual. Si no se da el cabeceo se busca el que deja al brazo más cerca
+        de q_actual; sin q_actual se usa [atan2(y, x), 0, 0, 0], el mismo punto
+        de partida que usaba ikine_LM. Lanza SinSolucionIK si no hay solución.
+
+        Sin cabeceo es una búsqueda en malla (0.5-0.7 ms), no una fórmula cerrada;
+        con el cabeceo dado solo evalúa las ramas cerradas (~50 µs).
+        """
+        if q_actual is None:
+            q_actual = [math.atan2(y, x) - self.offset[0], 0.0, 0.0, 0.0]
+        referencia = np.asarray(q_actual, dtype=float)
+        if cabeceo is not None:
+            ramas = self.soluciones(x, y, z, cabeceo)
+            if not ramas:
+                raise SinSolucionIK(f"No hay solución de cinemática inversa para ({x:.4f}, {y:.4f}, {z:.4f}) "
+                                    f"con cabeceo {math.degrees(cabeceo):.2f}°")
+            q, validas = np.array(ramas), np.ones(len(ramas), dtype=bool)
+        else:
+            # Búsqueda gruesa sobre todo el círculo y luego fina alrededor del mejor
+            q, validas, psi = self._ramas(x, y, z, np.arange(-np.pi, np.pi, PASO_CABECEO))
+            if validas.any():
+                dist = np.where(validas, self._distancias(q, referencia), np.inf)
+                mejor = psi[np.argmin(dist)]
+                fino = mejor + np.arange(-PASO_CABECEO, PASO_CABECEO + PASO_FINO / 2, PASO_FINO)
+                q2, validas2, _ = self._ramas(x, y, z, fino)
+                q, validas = np.concatenate([q, q2]), np.concatenate([validas, validas2])
+        if not validas.any():
+            raise SinSolucionIK(f"No hay solución de cinemática inversa para ({x:.4f}, {y:.4f}, {z:.4f})")
+        dist = np.where(validas, self._distancias(q, referencia), np.inf)
+        return q[np.argmin(dist)]
+
+    def resolver_T(self, T, q_actual=None, cabeceo=None):
+        """Igual que resolver() con la posición de una matriz homogénea 4x4."""
+        return self.resolver(T[0, 3], T[1, 3], T[2, 3], q_actual, cabeceo)
+
+
+# ---------------- VALIDACIÓN ----------------
+
+def _q_aleatorio(ik, rng, n):
+    return rng.uniform(ik.qmin, ik.qmax, size=(n, 4))
+
+
+def validar(muestras=MUESTRAS, semilla=0):
+    """
+    Compara contra roboticstoolbox y devuelve la lista de problemas encontrados:
+    1. directa() y posicion() contra robot.fkine en ángulos aleatorios
+    2. ida y vuelta: la IK de la posición de un q aleatorio vuelve a esa posición,
+       y con el cabeceo de q una de las ramas es el mismo q
+    3. los objetivos de valor(): solución analítica contra ikine_LM
+    """
+    import CI
+
+    ik = IKAnalitica(CI.DH)
+    robot = CI.get_robot()
+    rng = np.random.default_rng(semilla)
+    problemas = []
+
+    # 1) Cinemática directa
+    err_T = err_p = 0.0
+    for q in _q_aleatorio(ik, rng, muestras):
+        T_rtb = np.asarray(robot.fkine(q).A)
+        err_T = max(err_T, float(np.abs(ik.directa(q) - T_rtb).max()))
+        err_p = max(err_p, float(np.abs(np.array(ik.posicion(q)) - T_rtb[:3, 3]).max()))
+    print(f"directa contra fkine: error máximo {err_T:.2e} (matriz), {err_p:.2e} m (posición)")
+    if max(err_T, err_p) > TOLERANCIA_POS:
+        problemas.append(f"la cinemática directa difiere de fkine en {max(err_T, err_p):.2e}")
+
+    # 2) Ida y vuelta
+    err_ik = err_rama = 0.0
+    for q in _q_aleatorio(ik, rng, muestras):
+        p = ik.posicion(q)
+        sol = ik.resolver(*p, q_actual=q + rng.normal(0, 0.05, 4))
+        err_ik = max(err_ik, float(np.abs(np.array(ik.posicion(sol)) - p).max()))
+        ramas = ik.soluciones(*p, ik.cabeceo(q))
+        err_rama = max(err_rama, min(float(np.abs(_envolver(r - q)).max()) for r in ramas))
+    print(f"ida y vuelta: error máximo {err_ik:.2e} m; rama original recuperada con error {err_rama:.2e} rad")
+    if err_ik > TOLERANCIA_POS:
+        problemas.append(f"la IK no vuelve a la posición pedida (error {err_ik:.2e} m)")
+    if err_rama > 1e-6:
+        problemas.append(f"las ramas no incluyen el q original (error {err_rama:.2e} rad)")
+
+    # 3) Objetivos fijos contra ikine_LM
+    print("\nobjetivo  analítica (°)                      error (m)  ikine_LM (°)                       error (m)")
+    for c, T in zip(CI.OBJETIVOS, CI.poses_objetivo()):
+        x, y = T[0, 3], T[1, 3]
+        q_lm = robot.ikine_LM(T, [round(math.atan2(y, x), 4), 0, 0, 0], mask=[1, 1, 1, 0, 0, 0],
+                              joint_limits=True).q
+        q_an = ik.resolver_T(T)
+        e_lm = float(np.abs(np.array(ik.posicion(q_lm)) - T[:3, 3]).max())
+        e_an = float(np.abs(np.array(ik.posicion(q_an)) - T[:3, 3]).max())
+        print(f"{c:8d}  {np.round(np.degrees(q_an), 2)!s:34s} {e_an:9.1e}  "
+              f"{np.round(np.degrees(q_lm), 2)!s:34s} {e_lm:9.1e}")
+        if e_an > TOLERANCIA_POS:
+            problemas.append(f"objetivo {c}: error {e_an:.2e} m")
+
+    # Tiempos
+    T = CI.poses_objetivo()[3]
+    n = 200
+    t = time.perf_counter()
+    for _ in range(n):
+        ik.soluciones(T[0, 3], T[1, 3], T[2, 3], -0.36)
+    t_ramas = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(n):
+        ik.resolver_T(T)
+    t_resolver = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(5):
+        robot.ikine_LM(T, [math.pi / 2, 0, 0, 0], mask=[1, 1, 1, 0, 0, 0], joint_limits=True)
+    t_lm = (time.perf_counter() - t) / 5
+    print(f"\nsoluciones(): {t_ramas * 1e6:.0f} µs   resolver(): {t_resolver * 1e6:.0f} µs   "
+          f"ikine_LM: {t_lm * 1e3:.1f} ms")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida la IK analítica contra roboticstoolbox")
+    parser.add_argument("--muestras", type=int, default=MUESTRAS)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    problemas = validar(args.muestras, args.semilla)
+    if problemas:
+        print("\nProblemas:")
+        for p in problemas:
+            print(" -", p)
+        sys.exit(1)
+    print("\nValidación correcta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Mide el tiempo de importación de los módulos del proyecto para detectar
+regresiones en el arranque.
+
+Cada módulo se importa en un proceso nuevo de Python (varias veces, se toma el
+mínimo). Falla con código 1 si algún módulo supera su límite o si carga una
+librería pesada que debería cargarse de forma diferida.
+
+Uso:
+    python medir_arranque.py
+    python medir_arranque.py --json arranque.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Límite de tiempo de importación por módulo, en milisegundos
+LIMITES_MS = {
+    "ai_conecta4": 400,
+    "detector_tablero": 800,
+    "CI": 300,
+}
+
+# Librerías que no deben cargarse solo por importar el módulo
+PROHIBIDOS = {
+    "ai_conecta4": ["roboticstoolbox", "spatialmath", "cv2"],
+    "CI": ["roboticstoolbox", "spatialmath"],
+}
+
+REPETICIONES = 5
+
+_CODIGO = """
+import sys, time, json
+t = time.perf_counter()
+import {modulo}
+dt = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": dt, "modulos": sorted(sys.modules)}}))
+"""
+
+
+def medir_modulo(modulo, repeticiones=REPETICIONES):
+    """Devuelve (ms mínimo, módulos cargados) de importar 'modulo' en un proceso nuevo."""
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    mejor = None
+    cargados = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", _CODIGO.format(modulo=modulo)], cwd=carpeta,
+                                capture_output=True, text=True, check=True)
+        datos = json.loads(salida.stdout.strip().splitlines()[-1])
+        if mejor is None or datos["ms"] < mejor:
+            mejor = datos["ms"]
+        cargados = datos["modulos"]
+    return mejor, cargados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de los módulos")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = {}
+    errores = []
+    for modulo, limite in LIMITES_MS.items():
+        ms, cargados = medir_modulo(modulo, args.repeticiones)
+        pesados = [p for p in PROHIBIDOS.get(modulo, []) if p in cargados]
+        resultados[modulo] = {"ms": round(ms, 1), "limite_ms": limite, "pesados": pesados}
+        estado = "OK"
+        if ms > limite:
+            estado = "LENTO"
+            errores.append(f"{modulo}: {ms:.0f} ms > {limite} ms")
+        if pesados:
+            estado = "PESADO"
+            errores.append(f"{modulo} carga {', '.join(pesados)} al importarse")
+        print(f"{modulo:20s} {ms:8.1f} ms  (límite {limite} ms)  {estado}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, indent=2)
+
+    if errores:
+        print("\nRegresiones en el arranque:")
+        for e in errores:
+            print(" -", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
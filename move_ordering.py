@@ -0,0 +1,71 @@
+"""
+Ordenamiento barato de jugadas para el minimax de ai_conecta4.
+
+En vez de aplicar cada jugada y evaluar el tablero resultante (lo que cuesta
+casi tanto como buscar el nodo), el orden sale de lo que la búsqueda ya
+aprendió, en este orden de prioridad:
+
+1. la mejor jugada guardada en la tabla de transposición
+2. las dos jugadas "killer" de esa misma profundidad (las últimas que
+   provocaron un corte beta en nodos hermanos)
+3. la tabla de historia: cuántas veces, pesado por profundidad², jugar en
+   esa casilla provocó un corte para esa pieza
+4. a igual historia, del centro hacia afuera
+
+Un objeto MoveOrdering vive lo que dura una búsqueda (todas las iteraciones
+de la profundización iterativa) y no se comparte entre procesos.
+"""
+
+from bitboard import ROWS, COLS, H1
+
+# Columnas del centro hacia afuera; el prior solo desempata la historia
+CENTER_ORDER = sorted(range(COLS), key=lambda c: (abs(c - COLS // 2), c))
+PRIOR = [COLS - CENTER_ORDER.index(c) for c in range(COLS)]
+MAX_PLY = ROWS * COLS + 1
+EVAL_DEPTH = 3
+
+
+class MoveOrdering:
+    __slots__ = ("killers", "history")
+
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[pieza][bit de la casilla]
+        self.history = [None, [0] * (COLS * H1), [0] * (COLS * H1)]
+
+    def order(self, pos, moves, piece, ply, hash_move=None, depth=0):
+        """Jugadas de 'moves' (columnas) en el orden en que conviene probarlas."""
+        if depth >= EVAL_DEPTH and pos.table is not None:
+            # Lejos de las hojas el subárbol es grande y vale la pena evaluar cada
+            # hijo (sin aplicar la jugada, con el puntaje incremental)
+            own = pos.scores[piece]
+            scored = [(own + pos.delta(c, piece)[0] + PRIOR[c], c) for c in moves]
+        else:
+            hist = self.history[piece]
+            heights = pos.heights
+            scored = [(hist[c * H1 + heights[c]] + PRIOR[c], c) for c in moves]
+        scored.sort(reverse=True)
+        ordered = [c for _, c in scored]
+        # Se ponen al frente de menor a mayor prioridad
+        k1, k2 = self.killers[ply]
+        for c in (k2, k1, hash_move):
+            if c is not None and c in ordered and ordered[0] != c:
+                ordered.remove(c)
+                ordered.insert(0, c)
+        return ordered
+
+    def cutoff(self, pos, col, piece, ply, depth):
+        """Registra que jugar 'col' (ya deshecha en pos) provocó un corte beta."""
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[piece][col * H1 + pos.heights[col]] += depth * depth
+
+    def source(self, col, ply, hash_move):
+        """De dónde salió la jugada en el orden: "tt", "killer" o "history"."""
+        if col == hash_move:
+            return "tt"
+        if col in self.killers[ply]:
+            return "killer"
+        return "history"
@@ -0,0 +1,195 @@
+"""
+Libro de aperturas para ai_conecta4.
+
+generate_book() busca offline todas las posiciones alcanzables hasta N jugadas
+y escribe un archivo binario ordenado de registros clave -> (columna, puntaje).
+OpeningBook abre ese archivo con mmap y busca por bisección, sin cargarlo
+completo en memoria.
+
+Uso para generar el libro:
+    python opening_book.py --plies 6 --depth 8 --out libro_aperturas.bin
+"""
+
+import argparse
+import math
+import mmap
+import random
+import struct
+import time
+
+import numpy as np
+
+import ai_conecta4 as ai
+from bitboard import ROWS, COLS, H1, cell_bit
+from transposition import TranspositionTable
+
+# --------------------
+# Formato del archivo
+# --------------------
+MAGIC = b"C4BK"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBI")     # magic, versión, plies, profundidad, registros
+RECORD = struct.Struct("<Qbi")        # clave, columna, puntaje
+KEY = struct.Struct("<Q")
+
+DEFAULT_BOOK_FILE = "libro_aperturas.bin"
+DEFAULT_PLIES = 4
+DEFAULT_BOOK_DEPTH = 8
+
+BOTTOM_MASK = sum(cell_bit(0, c) for c in range(COLS))
+COLUMN_MASK = (1 << H1) - 1
+
+
+def _is_stacked(pos):
+    # La clave solo es válida si las fichas de cada columna están apiladas sin huecos
+    occ = pos.occupied()
+    return all((occ >> (c * H1)) & COLUMN_MASK == (1 << pos.heights[c]) - 1 for c in range(COLS))
+
+
+def position_key(pos, piece):
+    """
+    Clave única de la posición desde el punto de vista de quien mueve ('piece'):
+    fichas propias + máscara de ocupadas + fila inferior (cabe en 49 bits).
+    """
+    return pos.bits[piece] + pos.occupied() + BOTTOM_MASK
+
+
+def mirror_key(key):
+    # Refleja el tablero izquierda-derecha columna por columna
+    m = 0
+    for c in range(COLS):
+        m |= ((key >> (c * H1)) & COLUMN_MASK) << ((COLS - 1 - c) * H1)
+    return m
+
+
+def canonical_key(pos, piece):
+    """Devuelve (clave, reflejada) usando la menor de la posición y su espejo."""
+    key = position_key(pos, piece)
+    mirrored = mirror_key(key)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+# --------------------
+# Lectura
+# --------------------
+
+class OpeningBook:
+    """Libro de aperturas de solo lectura abierto con mmap."""
+
+    def __init__(self, path=DEFAULT_BOOK_FILE):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.depth, self.size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} no es un libro de aperturas válido")
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def _find(self, key):
+        lo, hi = 0, self.size
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = KEY.unpack_from(mm, HEADER.size + mid * RECORD.size)[0]
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return RECORD.unpack_from(mm, HEADER.size + mid * RECORD.size)
+        return None
+
+    def lookup(self, pos, piece):
+        """
+        Devuelve (columna, puntaje) para 'piece' en la posición, o None si no
+        está en el libro.
+        """
+        if pos.count() > self.plies or not _is_stacked(pos):
+            return None
+        key, mirrored = canonical_key(pos, piece)
+        record = self._find(key)
+        if record is None:
+            return None
+        _, col, score = record
+        if mirrored:
+            col = COLS - 1 - col
+        return col, score
+
+
+# --------------------
+# Generación
+# --------------------
+
+def _positions(plies):
+    # Recorre todas las posiciones alcanzables hasta 'plies' jugadas, sin repetir
+    seen = set()
+    pos = ai.new_position(np.zeros((ROWS, COLS), dtype=int))
+
+    def walk(piece):
+        key, _ = canonical_key(pos, piece)
+        if key in seen:
+            return
+        seen.add(key)
+        yield pos, piece
+        if pos.count() >= plies:
+            return
+        for col in pos.valid_moves():
+            pos.make(col, piece)
+            if not pos.is_win(piece):
+                yield from walk(3 - piece)
+            pos.unmake()
+
+    yield from walk(1)
+
+
+def generate_book(path=DEFAULT_BOOK_FILE, plies=DEFAULT_PLIES, depth=DEFAULT_BOOK_DEPTH, verbose=True):
+    """Busca todas las posiciones hasta 'plies' jugadas a 'depth' y escribe el libro."""
+    random.seed(0)
+    tt = TranspositionTable()
+    records = {}
+    start = time.time()
+    for pos, piece in _positions(plies):
+        key, mirrored = canonical_key(pos, piece)
+        tt.new_search()
+        col, score = ai.minimax(pos, depth, -math.inf, math.inf, True, piece, 3 - piece, tt)
+        if col is None:
+            continue
+        if mirrored:
+            col = COLS - 1 - col
+        records[key] = (col, max(-2**31, min(2**31 - 1, int(score))))
+        if verbose and len(records) % 500 == 0:
+            print(f"{len(records)} posiciones ({time.time() - start:.0f} s)")
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, plies, depth, len(records)))
+        for key in sorted(records):
+            col, score = records[key]
+            f.write(RECORD.pack(key, col, score))
+    if verbose:
+        print(f"Guardadas {len(records)} posiciones en {path} ({time.time() - start:.0f} s)")
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el libro de aperturas de Conecta 4")
+    parser.add_argument("--plies", type=int, default=DEFAULT_PLIES)
+    parser.add_argument("--depth", type=int, default=DEFAULT_BOOK_DEPTH)
+    parser.add_argument("--out", default=DEFAULT_BOOK_FILE)
+    args = parser.parse_args()
+    generate_book(args.out, args.plies, args.depth)
@@ -0,0 +1,86 @@
+"""
+Búsqueda en segundo plano mientras el humano piensa su jugada.
+
+Después de que el robot mueve, Ponderer calcula en un hilo la respuesta del
+robot para cada una de las (hasta 7) jugadas posibles del humano. Cuando llega
+el tablero real de la cámara, take() devuelve la jugada ya calculada si coincide
+con alguna; si no, la tabla de transposición compartida queda caliente para la
+búsqueda normal.
+"""
+
+import threading
+
+import numpy as np
+
+from ai_conecta4 import (get_best_move, new_position, order_moves_bitboard, check_winner,
+                         SearchTimeout, DEFAULT_DEPTH)
+
+
+def board_key(board):
+    return np.asarray(board, dtype=np.int8).tobytes()
+
+
+class Ponderer:
+    """
+    Parámetros de búsqueda iguales a los de get_best_move; tt debe ser la misma
+    tabla que usa la partida para aprovechar lo buscado aunque no haya coincidencia.
+
+    Siempre busca en este proceso (workers=1): la búsqueda en serie revisa stop
+    en cada nodo, mientras que los procesos de parallel_root_search seguirían
+    hasta su propio límite de tiempo y retrasarían take() y la jugada real.
+    """
+
+    def __init__(self, color_robot, color_human, depth=DEFAULT_DEPTH, tt=None, time_ms=None, book=None):
+        self.color_robot = color_robot
+        self.color_human = color_human
+        self.search_args = dict(depth=depth, tt=tt, time_ms=time_ms, book=book, workers=1)
+        self.results = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, board):
+        """Empieza a pensar sobre 'board' (orientación de la IA, después de mover el robot)."""
+        self.stop()
+        self.results = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(np.array(board),), daemon=True)
+        self._thread.start()
+
+    def _replies(self, board):
+        # Respuestas del humano, en el orden en que las probaría la búsqueda
+        pos = new_position(board)
+        for col in order_moves_bitboard(pos, pos.valid_moves(), self.color_human):
+            reply = board.copy()
+            reply[pos.heights[col], col] = self.color_human
+            yield reply
+
+    def _run(self, board):
+        for reply in self._replies(board):
+            if self._stop.is_set():
+                return
+            if check_winner(reply) != 0:
+                continue
+            try:
+                col = get_best_move(reply, self.color_robot, self.color_human, stop=self._stop,
+                                    **self.search_args)
+            except SearchTimeout:
+                return
+            # Una búsqueda con tiempo cortada por stop() no es la que se haría en vivo
+            if self._stop.is_set():
+                return
+            self.results[board_key(reply)] = col
+
+    def stop(self):
+        """Cancela la búsqueda en segundo plano (al presionar C o Q, o al llegar el tablero)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def take(self, board):
+        """Detiene la búsqueda y devuelve la jugada precalculada para 'board', o None."""
+        self.stop()
+        return self.results.get(board_key(board))
@@ -0,0 +1,265 @@
+"""
+Protocolo con acuse de recibo entre la computadora y el ESP32.
+
+En vez de mandar una pose y esperar un tiempo fijo, cada pose lleva un número
+de secuencia y el ESP32 avisa cuando la recibió y cuando terminó de moverse:
+
+    PC    -> ESP32:  #<seq>:<q1>,<q2>,<q3>,<q4>,<servo>\n
+    ESP32 -> PC:     ACK <seq>\n      al recibir y aceptar la pose
+    ESP32 -> PC:     DONE <seq>\n     al terminar el movimiento
+    ESP32 -> PC:     ERR <seq> <motivo>\n   si no pudo interpretarla
+
+Una trayectoria completa (ver trayectoria.py) va en un solo mensaje, con un
+tramo de aceleración constante por bloque separado por ';':
+
+    PC    -> ESP32:  #<seq>:T;<dur>,<q0 x4>,<v0 x4>,<a x4>,<servo>;<dur>,...\n
+
+El ESP32 evalúa q(t) = q0 + v0*t + a*t²/2 en cada tramo, pone el servo de cada
+tramo al empezarlo y contesta un solo DONE al terminar el último. Si al llegar
+el mensaje el brazo no está en el q0 del primer tramo, primero va ahí.
+
+Si el ACK no llega a tiempo la PC reenvía la misma línea (mismo seq). El ESP32
+no repite una pose cuyo seq ya recibió: vuelve a contestar ACK si se sigue
+moviendo o DONE si ya terminó. Así también se recupera un DONE perdido.
+Cualquier otra línea que mande el ESP32 (mensajes de depuración) se imprime y
+se ignora.
+
+ESP32Simulado hace de ESP32 sobre una pseudo-terminal (pty, solo Linux/macOS;
+el resto del módulo funciona en cualquier sistema) para probar el protocolo sin hardware:
+    python protocolo_serial.py
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import serial
+
+T_ACK_S = 0.5           # espera máxima del ACK antes de reenviar
+T_DONE_S = 20.0         # duración máxima de un movimiento
+REINTENTOS = 3          # reenvíos antes de dar el enlace por perdido
+MAX_SEQ = 10000         # el número de secuencia da la vuelta aquí
+SONDEO_S = 0.005        # pausa entre lecturas del puerto mientras no llega nada
+
+
+class ErrorProtocolo(IOError):
+    """El ESP32 no contestó como se esperaba."""
+
+
+class EnlaceSerial:
+    """Envía poses por un serial.Serial ya abierto y espera a que el ESP32 las termine."""
+
+    def __init__(self, ser, t_ack=T_ACK_S, t_done=T_DONE_S, reintentos=REINTENTOS):
+        self.ser = ser
+        self.t_ack = t_ack
+        self.t_done = t_done
+        self.reintentos = reintentos
+        self.seq = 0
+        self._buffer = b""
+
+    def _leer_linea(self, limite):
+        """Siguiente línea completa recibida antes del instante 'limite', o None."""
+        while b"\n" not in self._buffer:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            # Se lee solo lo que ya llegó para no quedar bloqueado con el timeout del puerto
+            pendientes = self.ser.in_waiting
+            if pendientes:
+                self._buffer += self.ser.read(pendientes)
+            else:
+                time.sleep(min(restante, SONDEO_S))
+        linea, self._buffer = self._buffer.split(b"\n", 1)
+        return linea.decode(errors="replace").strip()
+
+    def _esperar(self, seq, limite):
+        """Devuelve 'ACK' o 'DONE' para 'seq', o None si se acabó el tiempo."""
+        while True:
+            linea = self._leer_linea(limite)
+            if linea is None:
+                return None
+            partes = linea.split(maxsplit=2)
+            if len(partes) >= 2 and partes[0] in ("ACK", "DONE", "ERR") and partes[1].isdigit():
+                if int(partes[1]) != seq:
+                    continue        # respuesta atrasada de un mensaje anterior
+                if partes[0] == "ERR":
+                    motivo = partes[2] if len(partes) > 2 else ""
+                    raise ErrorProtocolo(f"El ESP32 rechazó el mensaje {seq}: {motivo}")
+                return partes[0]
+            if linea:
+                print("ESP32:", linea)
+
+    def enviar(self, arr, t_done=None):
+        """
+        Manda una pose y bloquea hasta el DONE del ESP32. Devuelve los segundos
+        que tardó el movimiento completo.
+        """
+        return self._transaccion(",".join(str(v) for v in arr), t_done)
+
+    def enviar_trayectoria(self, trayectoria, t_done=None):
+        """Manda todos los tramos de una Trayectoria en un mensaje y espera su DONE."""
+        if t_done is None:
+            t_done = trayectoria.duracion + self.t_done
+        cuerpo = "T;" + ";".join(",".join(str(v) for v in tramo) for tramo in trayectoria.valores())
+        return self._transaccion(cuerpo, t_done)
+
+    def _transaccion(self, cuerpo, t_done=None):
+        t_done = self.t_done if t_done is None else t_done
+        self.seq = self.seq % MAX_SEQ + 1
+        seq = self.seq
+        msg = f"#{seq}:{cuerpo}\n"
+        inicio = time.monotonic()
+
+        reenvios = 0
+        espera = self.t_ack       # primero se espera el ACK, después el DONE
+        while True:
+            self.ser.write(msg.encode())
+            respuesta = self._esperar(seq, time.monotonic() + espera)
+            while respuesta == "ACK":
+                espera = t_done
+                respuesta = self._esperar(seq, time.monotonic() + espera)
+            if respuesta == "DONE":
+                return time.monotonic() - inicio
+            reenvios += 1
+            if reenvios > self.reintentos:
+                raise ErrorProtocolo(f"Sin respuesta del ESP32 al mensaje {seq} tras {self.reintentos} reintentos")
+            print(f"Sin respuesta al mensaje {seq}, reenviando ({reenvios}/{self.reintentos})")
+            espera = self.t_ack
+
+
+# ---------------- ESP32 SIMULADO ----------------
+
+class ESP32Simulado:
+    """
+    Imita al ESP32 en una pseudo-terminal: contesta ACK, "mueve" el brazo a
+    'velocidad' grados por segundo y contesta DONE. 'perder_acks' y
+    'perder_dones' descartan esa cantidad de respuestas para probar los reintentos.
+    'escala_tiempo' multiplica la duración de cada movimiento (0 = DONE en
+    cuanto se recibe, para simular partidas a máxima velocidad).
+    Se abre con serial.Serial(sim.puerto).
+    """
+
+    def __init__(self, velocidad=90.0, perder_acks=0, perder_dones=0, escala_tiempo=1.0):
+        self.velocidad = velocidad
+        self.escala_tiempo = escala_tiempo
+        self.perder_acks = perder_acks
+        self.perder_dones = perder_dones
+        self.recibidos = []          # (seq, valores) de cada pose ejecutada
+        # tty y select (sobre una pty) solo existen en Linux/macOS: se importan aquí
+        # para que EnlaceSerial siga funcionando en Windows
+        import tty
+        self._maestro, esclavo = os.openpty()
+        tty.setraw(esclavo)
+        self.puerto = os.ttyname(esclavo)
+        self._esclavo = esclavo
+        self._q = None
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, daemon=True)
+        self._hilo.start()
+
+    def _responder(self, texto):
+        os.write(self._maestro, (texto + "\n").encode())
+
+    def _duracion(self, valores):
+        if self._q is None or len(self._q) != len(valores):
+            return 0.0
+        return max(abs(a - b) for a, b in zip(valores, self._q)) / self.velocidad
+
+    @staticmethod
+    def _final_trayectoria(tramos):
+        # Pose al terminar el último tramo: q0 + v0*t + a*t²/2, más el servo
+        dur, *resto = tramos[-1]
+        q0, v0, a, servo = resto[0:4], resto[4:8], resto[8:12], resto[12]
+        return [q + v * dur + 0.5 * ac * dur ** 2 for q, v, ac in zip(q0, v0, a)] + [servo]
+
+    def _correr(self):
+        import select
+        buffer = b""
+        ultimo_seq = None
+        fin_movimiento = 0.0
+        pendiente = None             # seq cuyo DONE falta mandar
+        while not self._detener.is_set():
+            espera = 0.05 if pendiente is None else max(0.0, min(0.05, fin_movimiento - time.monotonic()))
+            listos, _, _ = select.select([self._maestro], [], [], espera)
+            if pendiente is not None and time.monotonic() >= fin_movimiento:
+                if self.perder_dones > 0:
+                    self.perder_dones -= 1
+                else:
+                    self._responder(f"DONE {pendiente}")
+                pendiente = None
+            if not listos:
+                continue
+            try:
+                buffer += os.read(self._maestro, 1024)
+            except OSError:
+                return
+            while b"\n" in buffer:
+                linea, buffer = buffer.split(b"\n", 1)
+                linea = linea.decode(errors="replace").strip()
+                if not linea.startswith("#") or ":" not in linea:
+                    continue
+                cabecera, datos = linea[1:].split(":", 1)
+                try:
+                    seq = int(cabecera)
+                    if datos.startswith("T;"):
+                        tramos = [[float(v) for v in t.split(",")] for t in datos[2:].split(";")]
+                        duracion = sum(t[0] for t in tramos)
+                        valores = self._final_trayectoria(tramos)
+                    else:
+                        valores = [float(v) for v in datos.split(",")]
+                        duracion = self._duracion(valores)
+                except (ValueError, IndexError):
+                    self._responder(f"ERR {cabecera} formato")
+                    continue
+                if seq == ultimo_seq:
+                    # Reenvío: no se repite el movimiento, solo se contesta el estado
+                    self._responder(f"ACK {seq}" if pendiente == seq else f"DONE {seq}")
+                    continue
+                if self.perder_acks > 0:
+                    self.perder_acks -= 1
+                    continue
+                ultimo_seq = seq
+                self._responder(f"ACK {seq}")
+                self.recibidos.append((seq, valores))
+                fin_movimiento = time.monotonic() + duracion * self.escala_tiempo
+                self._q = valores
+                pendiente = seq
+
+    def cerrar(self):
+        self._detener.set()
+        self._hilo.join(timeout=1)
+        for fd in (self._maestro, self._esclavo):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba el protocolo contra un ESP32 simulado")
+    parser.add_argument("--velocidad", type=float, default=90.0, help="grados por segundo")
+    parser.add_argument("--perder-acks", type=int, default=1)
+    parser.add_argument("--perder-dones", type=int, default=1)
+    args = parser.parse_args()
+
+    poses = [[0, 40, -30, 20, 180], [30, 60, -45, 10, 180], [30, 60, -45, 10, 60], [0, 40, -30, 20, 60]]
+    with ESP32Simulado(args.velocidad, args.perder_acks, args.perder_dones) as sim:
+        ser = serial.Serial(sim.puerto, 115200, timeout=1)
+        enlace = EnlaceSerial(ser, t_done=2.0)
+        total = time.monotonic()
+        for pose in poses:
+            dt = enlace.enviar(pose)
+            print(f"Pose {pose} terminada en {dt:.2f} s")
+        print(f"Secuencia completa en {time.monotonic() - total:.2f} s ({len(sim.recibidos)} poses ejecutadas)")
+        ser.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Servidor para varias estaciones (cámara + brazo + tablero) desde una sola computadora.
+
+Cada Sesion tiene su propia cámara, su enlace serial y su tablero, y corre en
+su propio hilo el ciclo automático de final.py: espera la jugada del humano
+con DetectorMovimiento, pide la jugada del robot, manda la trayectoria del
+turno (el firmware debe tener el protocolo ACK/DONE) y verifica que la ficha
+cayó. Al terminar una partida espera a que se vacíe el tablero y empieza otra.
+
+Las búsquedas de todas las sesiones van a un solo PoolBusqueda: un número fijo
+de procesos (por defecto uno por núcleo) que corren get_best_move en serie.
+
+- Equidad: cada sesión tiene su cola y se despacha por turnos (una petición de
+  cada sesión con pendientes), así una sesión no acapara los procesos.
+- Plazos: cada petición trae un plazo; al despacharla se busca con el tiempo
+  que queda (hasta TIEMPO_IA_MS de final.py), repartido entre las rondas que
+  hacen falta para atender lo que ya está en cola. Si ya casi no queda, se
+  busca a PROFUNDIDAD_URGENTE para contestar a tiempo.
+- Cada proceso guarda la tabla de transposición de las últimas partidas que
+  atendió, así que las búsquedas de una misma partida se aprovechan entre sí.
+
+Las estaciones se describen en un JSON (coords es la calibración de esa
+cámara, se genera con detector_tablero.calibrar_celdas):
+    [{"nombre": "mesa1", "camara": "192.168.1.181:8080", "puerto": "COM13",
+      "coords": "coords_mesa1.npy", "color_humano": 2, "empieza_robot": false}, ...]
+
+Uso:
+    python servidor.py estaciones.json
+    python servidor.py --simuladas 4 --partidas 3        # estaciones de simulacion.py, sin hardware
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import functools
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import serial
+
+import final
+from ai_conecta4 import get_best_move, get_valid_locations, check_winner, DEFAULT_DEPTH
+from camara import abrir_camara
+from deteccion_movimiento import DetectorMovimiento
+from detector_tablero import TableroSeguido, TransicionImposible, obtener_frame, FILAS, COLUMNAS
+from opening_book import OpeningBook
+from protocolo_serial import EnlaceSerial, ESP32Simulado
+from simulacion import CamaraSimulada, HumanoGuionado
+from transposition import TranspositionTable
+from trayectoria import planear_turno
+
+# ---------------- CONFIGURACIÓN ----------------
+PLAZO_S = 5.0             # desde que una sesión pide la jugada hasta que la necesita
+MARGEN_MS = 100           # parte del plazo que se reserva para contestar
+MIN_BUSQUEDA_MS = 50      # con menos tiempo que esto se busca a PROFUNDIDAD_URGENTE
+PROFUNDIDAD_URGENTE = 4
+TT_MB = 8                 # tabla de transposición de cada partida en cada proceso
+MAX_TABLAS = 8            # partidas cuyas tablas guarda cada proceso
+T_VERIFICAR_S = 10.0      # cuánto se intenta ver la ficha del robot después de moverlo
+INTERVALO_S = 0.2         # pausa entre lecturas al verificar y al esperar el tablero vacío
+# ------------------------------------------------
+
+
+# ---------------- PROCESOS DE BÚSQUEDA ----------------
+
+# Estado de cada proceso del pool
+_tablas = collections.OrderedDict()
+_libro = None
+
+
+def _iniciar_proceso(ruta_libro):
+    global _libro
+    _libro = OpeningBook(ruta_libro) if ruta_libro and os.path.exists(ruta_libro) else None
+
+
+def _listo():
+    return os.getpid()
+
+
+def _buscar(clave, tablero, color_robot, color_humano, depth, time_ms):
+    # Corre en un proceso del pool; 'clave' identifica la partida para reutilizar su tabla
+    tabla = _tablas.pop(clave, None)
+    if tabla is None:
+        tabla = TranspositionTable(TT_MB)
+        while len(_tablas) >= MAX_TABLAS:
+            _tablas.popitem(last=False)
+    _tablas[clave] = tabla
+    return get_best_move(tablero, color_robot, color_humano, depth=depth, tt=tabla, time_ms=time_ms, book=_libro)
+
+
+class PeticionBusqueda:
+    __slots__ = ("sesion", "clave", "tablero", "color_robot", "color_humano", "plazo", "creada", "futuro")
+
+    def __init__(self, sesion, clave, tablero, color_robot, color_humano, plazo):
+        self.sesion = sesion
+        self.clave = clave
+        self.tablero = tablero
+        self.color_robot = color_robot
+        self.color_humano = color_humano
+        self.plazo = plazo
+        self.creada = time.monotonic()
+        self.futuro = concurrent.futures.Future()
+
+
+class PoolBusqueda:
+    """
+    Reparte las búsquedas de varias sesiones entre 'workers' procesos. Nunca
+    hay más búsquedas en curso que procesos: el resto espera en la cola de su
+    sesión y se despacha por turnos entre sesiones.
+    Con time_ms=None se busca a profundidad fija y el plazo solo decide si hay
+    que buscar a PROFUNDIDAD_URGENTE.
+    """
+
+    def __init__(self, workers=None, time_ms=final.TIEMPO_IA_MS, depth=DEFAULT_DEPTH,
+                 libro=final.LIBRO_APERTURAS):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_ms = time_ms
+        self.depth = depth
+        # spawn: los procesos no heredan los hilos de cámaras y puertos de este proceso
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_iniciar_proceso, initargs=(libro,))
+        self._colas = {}                        # sesión -> peticiones pendientes en orden de llegada
+        self._turno = collections.deque()       # sesiones con pendientes, en el orden en que les toca
+        self._libres = self.workers
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self.estadisticas = collections.defaultdict(
+            lambda: {"busquedas": 0, "espera_s": 0.0, "busqueda_s": 0.0, "urgentes": 0, "vencidas": 0})
+        self._hilo = threading.Thread(target=self._despachar, daemon=True)
+        self._hilo.start()
+
+    def calentar(self):
+        """Arranca los procesos (importan el motor y cargan el libro) antes de la primera jugada."""
+        concurrent.futures.wait([self._pool.submit(_listo) for _ in range(self.workers)])
+
+    def buscar(self, sesion, clave, tablero, color_robot, color_humano, plazo_s=PLAZO_S):
+        """
+        Encola una búsqueda y devuelve un concurrent.futures.Future con la columna.
+        'clave' identifica la partida (su tabla de transposición); 'plazo_s' son
+        los segundos desde ahora en que hace falta la respuesta (None = sin plazo).
+        """
+        plazo = None if plazo_s is None else time.monotonic() + plazo_s
+        peticion = PeticionBusqueda(sesion, clave, np.array(tablero), color_robot, color_humano, plazo)
+        with self._cond:
+            if self._cerrado:
+                raise RuntimeError("El pool de búsqueda está cerrado")
+            cola = self._colas.setdefault(sesion, collections.deque())
+            if not cola:
+                self._turno.append(sesion)
+            cola.append(peticion)
+            self._cond.notify_all()
+        return peticion.futuro
+
+    def _siguiente(self):
+        # Primera petición de la sesión a la que le toca; si le quedan más, vuelve al final de la fila
+        sesion = self._turno.popleft()
+        cola = self._colas[sesion]
+        peticion = cola.popleft()
+        if cola:
+            self._turno.append(sesion)
+        else:
+            del self._colas[sesion]
+        return peticion
+
+    def _presupuesto(self, peticion, pendientes):
+        """
+        (profundidad, time_ms, urgente) según lo que le queda del plazo a la
+        petición. Con 'pendientes' peticiones en cola, el tiempo se reparte para
+        que las que esperan no lleguen a su plazo sin tiempo para buscar.
+        """
+        if peticion.plazo is None:
+            return self.depth, self.time_ms, False
+        restante_ms = (peticion.plazo - time.monotonic()) * 1000 - MARGEN_MS
+        if restante_ms < MIN_BUSQUEDA_MS:
+            return PROFUNDIDAD_URGENTE, None, True
+        if self.time_ms is None:
+            return self.depth, None, False
+        rondas = 1 + pendientes // self.workers
+        return self.depth, int(max(MIN_BUSQUEDA_MS, min(self.time_ms, restante_ms / rondas))), False
+
+    def _despachar(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._cerrado or (self._libres > 0 and self._turno))
+                if self._cerrado:
+                    return
+                peticion = self._siguiente()
+                self._libres -= 1
+                pendientes = sum(len(cola) for cola in self._colas.values())
+            depth, time_ms, urgente = self._presupuesto(peticion, pendientes)
+            despachada = time.monotonic()
+            try:
+                tarea = self._pool.submit(_buscar, peticion.clave, peticion.tablero, peticion.color_robot,
+                                          peticion.color_humano, depth, time_ms)
+            except Exception as e:
+                self._terminar(peticion, despachada, urgente, None, e)
+                continue
+            tarea.add_done_callback(functools.partial(self._terminar, peticion, despachada, urgente))
+
+    def _terminar(self, peticion, despachada, urgente, tarea, error=None):
+        ahora = time.monotonic()
+        with self._cond:
+            self._libres += 1
+            est = self.estadisticas[peticion.sesion]
+            est["busquedas"] += 1
+            est["espera_s"] += despachada - peticion.creada
+            est["busqueda_s"] += ahora - despachada
+            est["urgentes"] += urgente
+            est["vencidas"] += peticion.plazo is not None and ahora > peticion.plazo
+            self._cond.notify_all()
+        if error is None:
+            try:
+                peticion.futuro.set_result(tarea.result())
+                return
+            except BaseException as e:
+                error = e
+        peticion.futuro.set_exception(error)
+
+    def cerrar(self):
+        """Cancela lo que sigue en cola y espera a que terminen las búsquedas en curso."""
+        with self._cond:
+            self._cerrado = True
+            pendientes = [p for cola in self._colas.values() for p in cola]
+            self._colas.clear()
+            self._turno.clear()
+            self._cond.notify_all()
+        for peticion in pendientes:
+            peticion.futuro.cancel()
+        self._hilo.join()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# ---------------- TRAYECTORIAS ----------------
+
+_trayectorias = {}
+
+
+def precalcular_trayectorias():
+    """
+    Trayectoria del turno para cada columna. Los ángulos de CI.mover_robot solo
+    dependen del objetivo, pero el servo del punto 9 sale de ultimoservo, una
+    variable global que comparten todos los hilos: se calculan todas antes de
+    arrancar las sesiones y después solo se leen.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        for columna in range(COLUMNAS):
+            _trayectorias[columna] = planear_turno(columna)
+
+
+# ---------------- SESIONES ----------------
+
+class Sesion:
+    """Una estación: cámara, enlace serial y tablero propios, con su propio hilo."""
+
+    def __init__(self, nombre, camara, enlace, pool, color_humano=2, empieza_robot=False, coords_file=None,
+                 plazo_s=PLAZO_S):
+        self.nombre = nombre
+        self.camara = camara
+        self.enlace = enlace
+        self.pool = pool
+        self.color_humano = color_humano
+        self.color_robot = 1 if color_humano == 2 else 2
+        self.empieza_robot = empieza_robot
+        self.plazo_s = plazo_s
+        self.seguidor = TableroSeguido(coords_file=coords_file)
+        self.detector = DetectorMovimiento(camara, coords_file=coords_file)
+        self.detener = threading.Event()
+        self.partida = 0
+        self.resultados = {"robot": 0, "humano": 0, "empates": 0}
+        self.esperas = []        # segundos desde que se pide cada jugada hasta tenerla
+        self.error = None
+        self._hilo = None
+
+    def log(self, msg):
+        print(f"[{self.nombre}] {msg}")
+
+    # ---- cámara ----
+
+    def leer(self):
+        """(tablero en orientación de la IA, frame) con el seguimiento de la sesión."""
+        frame = obtener_frame(self.camara)
+        return np.flipud(self.seguidor.analizar(frame, mostrar=False)), frame
+
+    def esperar_tablero_vacio(self):
+        """Espera a que se retiren las fichas; devuelve el frame del tablero vacío o None si se detuvo."""
+        self.seguidor.reiniciar()
+        while not self.detener.is_set():
+            try:
+                tablero, frame = self.leer()
+                if not tablero.any():
+                    return frame
+            except TransicionImposible:
+                pass
+            self.seguidor.reiniciar()
+            self.detener.wait(INTERVALO_S)
+        return None
+
+    def esperar_humano(self, actual, frame):
+        """Tablero después de la jugada del humano, o None si se detuvo la sesión."""
+        self.detector.fijar_referencia(frame)
+        tablero = self.detector.esperar_jugada(actual, self.color_humano, detener=self.detener, avisar=self.log)
+        if tablero is None:
+            return None, None
+        self.seguidor.confirmar(np.flipud(tablero))
+        return tablero, None
+
+    def verificar(self, esperado):
+        """Lee la cámara hasta ver la ficha del robot; devuelve el frame donde se vio."""
+        limite = time.monotonic() + T_VERIFICAR_S
+        while True:
+            frame = obtener_frame(self.camara)
+            # Se lee sobre una copia: si la ficha todavía no cae, el estado no debe cambiar
+            prueba = copy.deepcopy(self.seguidor)
+            try:
+                tablero = np.flipud(prueba.analizar(frame, mostrar=False))
+            except TransicionImposible:
+                tablero = None
+            if tablero is not None and np.array_equal(tablero, esperado):
+                self.seguidor = prueba
+                return frame
+            if time.monotonic() >= limite or self.detener.is_set():
+                self.log("No se vio la ficha del robot; se sigue con el tablero esperado")
+                self.seguidor.confirmar(np.flipud(esperado))
+                return frame
+            self.detener.wait(INTERVALO_S)
+
+    # ---- robot ----
+
+    def ejecutar(self, columna):
+        """Manda la trayectoria del turno y bloquea hasta el DONE del ESP32."""
+        self.enlace.enviar_trayectoria(_trayectorias[columna])
+
+    def turno_robot(self, tablero):
+        """Juega el turno del robot. Devuelve (tablero esperado, frame) o (None, None) sin jugadas."""
+        inicio = time.monotonic()
+        futuro = self.pool.buscar(self.nombre, (self.nombre, self.partida), tablero, self.color_robot,
+                                  self.color_humano, self.plazo_s)
+        columna = futuro.result()
+        self.esperas.append(time.monotonic() - inicio)
+        if columna is None:
+            return None, None
+        self.log(f"El robot juega en la columna {columna} ({self.esperas[-1]:.2f} s)")
+        self.ejecutar(columna)
+        esperado = tablero.copy()
+        esperado[np.count_nonzero(tablero[:, columna]), columna] = self.color_robot
+        return esperado, self.verificar(esperado)
+
+    # ---- partidas ----
+
+    def jugar_partida(self):
+        """Una partida completa. Devuelve el ganador (0 = empate) o None si se detuvo la sesión."""
+        self.partida += 1
+        frame = self.esperar_tablero_vacio()
+        if frame is None:
+            return None
+        self.log(f"Partida {self.partida}")
+        actual = np.zeros((FILAS, COLUMNAS), dtype=int)
+        turno_robot = self.empieza_robot
+        while not self.detener.is_set():
+            if turno_robot:
+                nuevo, frame = self.turno_robot(actual)
+            else:
+                nuevo, frame = self.esperar_humano(actual, frame)
+            if nuevo is None:
+                return None if self.detener.is_set() else 0
+            actual = nuevo
+            ganador = check_winner(actual)
+            if ganador != 0:
+                return ganador
+            if not get_valid_locations(actual):
+                return 0
+            turno_robot = not turno_robot
+        return None
+
+    def correr(self, partidas=None):
+        """Juega 'partidas' partidas (None = hasta que se detenga)."""
+        try:
+            while partidas is None or self.partida < partidas:
+                ganador = self.jugar_partida()
+                if ganador is None:
+                    return
+                clave = "empates" if ganador == 0 else ("robot" if ganador == self.color_robot else "humano")
+                self.resultados[clave] += 1
+                self.log(f"Partida {self.partida}: {clave if ganador == 0 else 'gana el ' + clave}")
+        except concurrent.futures.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+            self.log(f"Error: {e}")
+
+    def iniciar(self, partidas=None):
+        self._hilo = threading.Thread(target=self.correr, args=(partidas,), name=self.nombre, daemon=True)
+        self._hilo.start()
+
+    def esperar(self, timeout=None):
+        self._hilo.join(timeout)
+        return not self._hilo.is_alive()
+
+    def cerrar(self):
+        self.detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self.camara.cerrar()
+        self.enlace.ser.close()
+
+
+class SesionSimulada(Sesion):
+    """
+    Estación sin hardware (ver simulacion.py): CamaraSimulada, ESP32Simulado y
+    un HumanoGuionado que juega en cuanto le toca.
+    """
+
+    def __init__(self, nombre, pool, coords_file, humano, escala=0.0, seed=0, **kwargs):
+        self.esp32 = ESP32Simulado(escala_tiempo=escala)
+        enlace = EnlaceSerial(serial.Serial(self.esp32.puerto, 115200, timeout=1))
+        super().__init__(nombre, CamaraSimulada(seed=seed), enlace, pool, humano.pieza,
+                         coords_file=coords_file, **kwargs)
+        self.humano = humano
+        self._jugadas_humano = 0
+
+    def esperar_tablero_vacio(self):
+        self.camara.reiniciar()
+        self._jugadas_humano = 0
+        return super().esperar_tablero_vacio()
+
+    def esperar_humano(self, actual, frame):
+        columna = self.humano.jugada(actual, self._jugadas_humano)
+        if columna is None:
+            return None, None
+        self._jugadas_humano += 1
+        self.camara.soltar(columna, self.humano.pieza)
+        tablero, frame = self.leer()
+        return tablero, frame
+
+    def ejecutar(self, columna):
+        super().ejecutar(columna)
+        self.camara.soltar(columna, self.color_robot)
+
+    def cerrar(self):
+        super().cerrar()
+        self.esp32.cerrar()
+
+
+def abrir_estacion(cfg, pool, plazo_s=PLAZO_S):
+    """Sesion de una estación real a partir de su entrada en el JSON de configuración."""
+    camara = abrir_camara(cfg["camara"], cfg.get("modo", final.MODO_CAMARA))
+    ser = serial.Serial(cfg["puerto"], 115200, timeout=1)
+    time.sleep(2)
+    return Sesion(cfg["nombre"], camara, EnlaceSerial(ser), pool, cfg.get("color_humano", 2),
+                  cfg.get("empieza_robot", False), cfg.get("coords"), plazo_s)
+
+
+# ---------------- RESUMEN ----------------
+
+def imprimir_resumen(sesiones, pool, segundos):
+    total = sum(len(s.esperas) for s in sesiones)
+    print(f"\n{total} jugadas del robot en {segundos:.1f} s ({total / segundos:.2f} por segundo) "
+          f"con {pool.workers} procesos de búsqueda")
+    for s in sesiones:
+        est = pool.estadisticas.get(s.nombre)
+        esperas = sorted(s.esperas)
+        linea = (f"  {s.nombre:12s} robot {s.resultados['robot']}, humano {s.resultados['humano']}, "
+                 f"empates {s.resultados['empates']}")
+        if esperas and est:
+            n = est["busquedas"]
+            linea += (f"; jugada en {1000 * esperas[len(esperas) // 2]:.0f} ms (p50), "
+                      f"{1000 * esperas[-1]:.0f} ms (máx); en cola {1000 * est['espera_s'] / n:.0f} ms, "
+                      f"buscando {1000 * est['busqueda_s'] / n:.0f} ms en promedio; "
+                      f"{est['urgentes']} urgentes, {est['vencidas']} fuera de plazo")
+        if s.error is not None:
+            linea += f"; error: {s.error}"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varias estaciones de Conecta 4 con un pool de búsqueda compartido")
+    parser.add_argument("config", nargs="?", help="JSON con las estaciones")
+    parser.add_argument("--simuladas", type=int, default=0, help="agrega estaciones simuladas (sin hardware)")
+    parser.add_argument("--partidas", type=int, help="partidas por estación (por defecto, sin fin)")
+    parser.add_argument("--workers", type=int, help="procesos de búsqueda (por defecto, uno por núcleo)")
+    parser.add_argument("--time-ms", type=int, default=final.TIEMPO_IA_MS, help="tiempo por jugada; 0 = profundidad fija")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--plazo", type=float, default=PLAZO_S, help="segundos para contestar cada jugada")
+    parser.add_argument("--rival", choices=("aleatorio", "ia"), default="aleatorio", help="humano de las simuladas")
+    parser.add_argument("--escala", type=float, default=0.0, help="duración de los movimientos simulados")
+    args = parser.parse_args()
+
+    if not args.config and not args.simuladas:
+        parser.error("hace falta un JSON de estaciones o --simuladas N")
+
+    print("Calculando trayectorias...")
+    precalcular_trayectorias()
+    sesiones = []
+    inicio = time.monotonic()
+    with PoolBusqueda(args.workers, args.time_ms or None, args.depth) as pool, \
+            tempfile.TemporaryDirectory(prefix="servidor_") as carpeta:
+        print(f"Arrancando {pool.workers} procesos de búsqueda...")
+        pool.calentar()
+        try:
+            if args.config:
+                with open(args.config) as f:
+                    for cfg in json.load(f):
+                        sesiones.append(abrir_estacion(cfg, pool, args.plazo))
+            if args.simuladas:
+                coords_file = os.path.join(carpeta, "cell_coords.npy")
+                CamaraSimulada().guardar_coords(coords_file)
+                for i in range(args.simuladas):
+                    humano = HumanoGuionado(1 + i % 2, args.rival, seed=i)
+                    sesiones.append(SesionSimulada(f"sim{i + 1}", pool, coords_file, humano, args.escala, seed=i,
+                                                   empieza_robot=i % 2 == 1, plazo_s=args.plazo))
+            inicio = time.monotonic()
+            for s in sesiones:
+                s.iniciar(args.partidas)
+            for s in sesiones:
+                while not s.esperar(0.5):
+                    pass
+        except KeyboardInterrupt:
+            print("\nDeteniendo estaciones...")
+        finally:
+            for s in sesiones:
+                s.detener.set()
+            for s in sesiones:
+                s.cerrar()
+        imprimir_resumen(sesiones, pool, time.monotonic() - inicio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Simulación de partidas completas sin cámara, sin ESP32 y sin persona.
+
+Corre el mismo ciclo de turno que final.py, pero con cada pieza de hardware
+reemplazada por una simulada:
+
+- CamaraSimulada dibuja el tablero (fondo azul, huecos grises y fichas de
+  color, con ruido y un pequeño error de calibración) en las coordenadas que
+  guarda como calibración. Así la detección procesa frames de verdad.
+- ESP32Simulado (protocolo_serial) contesta ACK/DONE sobre una pseudo-terminal;
+  con --escala 0 el DONE llega en cuanto se recibe la trayectoria y con 1 tarda
+  lo que tardaría el brazo.
+- HumanoGuionado juega por la persona: un guion fijo de columnas al inicio y
+  después jugadas al azar o de la IA a poca profundidad.
+
+Las partidas corren una tras otra a máxima velocidad. Por cada turno del robot
+se mide cada etapa (detección de la jugada del humano, búsqueda, cinemática
+inversa + trayectoria, envío serial y verificación de la ficha) y al final se
+imprime un histograma de latencias por etapa. Con --frames se guardan los
+frames dibujados para repetirlos después con camara.CamaraArchivo.
+
+Uso:
+    python simulacion.py --partidas 20
+    python simulacion.py --partidas 5 --rival ia --profundidad-rival 4 --time-ms 500
+    python simulacion.py --guion 3,3,2 --escala 1 --out simulacion.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import serial
+
+from ai_conecta4 import get_best_move, get_valid_locations, check_winner, DEFAULT_DEPTH
+from camara import FuenteCamara
+from detector_tablero import TableroSeguido, TransicionImposible, FILAS, COLUMNAS
+from opening_book import OpeningBook, DEFAULT_BOOK_FILE
+from protocolo_serial import EnlaceSerial, ESP32Simulado
+from transposition import TranspositionTable
+from trayectoria import planear_turno
+
+# ---------------- CONFIGURACIÓN ----------------
+ANCHO, ALTO = 640, 480
+PASO_CELDA = 64           # px entre centros de celdas vecinas
+RADIO_FICHA = 26          # px; mayor que detector_tablero.R_ADAPT para llenar la ROI
+RUIDO = 6.0               # desviación estándar del ruido por píxel
+ERROR_CALIBRACION = 3     # px máximos entre el centro guardado y el dibujado
+PATRONES_RUIDO = 8        # patrones de ruido precalculados que se alternan entre frames
+COLOR_FONDO = (40, 30, 20)
+COLOR_TABLERO = (150, 70, 20)
+COLOR_FICHA = {0: (200, 200, 200), 1: (0, 215, 255), 2: (30, 30, 210)}
+
+ETAPAS = ("detección", "búsqueda", "ik", "serial", "verificación", "turno")
+# Límites de los intervalos del histograma, en ms (el último es abierto)
+LIMITES_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+ANCHO_BARRA = 40
+SEED = 1234
+# ------------------------------------------------
+
+
+# ---------------- CÁMARA ----------------
+
+def coords_simuladas(ancho=ANCHO, alto=ALTO, paso=PASO_CELDA):
+    """42 centros (x, y) de arriba a abajo y de izquierda a derecha, como calibrar_celdas."""
+    x0 = (ancho - (COLUMNAS - 1) * paso) / 2
+    y0 = (alto - (FILAS - 1) * paso) / 2
+    return np.array([(round(x0 + c * paso), round(y0 + f * paso))
+                     for f in range(FILAS) for c in range(COLUMNAS)])
+
+
+class CamaraSimulada(FuenteCamara):
+    """
+    Dibuja el tablero en orientación de la cámara (fila 0 = arriba). soltar()
+    deja caer una ficha; leer() devuelve un frame nuevo con ruido distinto.
+    """
+
+    def __init__(self, coords=None, ruido=RUIDO, error=ERROR_CALIBRACION, seed=SEED, carpeta=None):
+        self.coords = coords_simuladas() if coords is None else np.asarray(coords)
+        self.tablero = np.zeros((FILAS, COLUMNAS), dtype=int)
+        self.rng = np.random.default_rng(seed)
+        # El tablero se dibuja un poco corrido respecto a lo que "se calibró"
+        self._centros = self.coords + self.rng.integers(-error, error + 1, self.coords.shape)
+        # Generar ruido nuevo en cada frame costaría más que detectarlo
+        self._ruidos = [np.rint(self.rng.normal(0.0, ruido, (ALTO, ANCHO, 3))).astype(np.int16)
+                        for _ in range(PATRONES_RUIDO)] if ruido > 0 else []
+        self.carpeta = carpeta
+        self.contador = 0
+        self._base = None
+
+    def reiniciar(self):
+        self.tablero[:] = 0
+        self._base = None
+
+    def soltar(self, columna, pieza):
+        """Pone la ficha en la primera celda libre de 'columna' (desde abajo)."""
+        libres = np.flatnonzero(self.tablero[:, columna] == 0)
+        if not len(libres):
+            raise ValueError(f"La columna {columna} está llena")
+        self.tablero[libres[-1], columna] = pieza
+        self._base = None
+
+    def _dibujar(self):
+        img = np.full((ALTO, ANCHO, 3), COLOR_FONDO, dtype=np.uint8)
+        xs, ys = self._centros[:, 0], self._centros[:, 1]
+        margen = PASO_CELDA // 2
+        cv2.rectangle(img, (int(xs.min()) - margen, int(ys.min()) - margen),
+                      (int(xs.max()) + margen, int(ys.max()) + margen), COLOR_TABLERO, -1)
+        for idx, (cx, cy) in enumerate(self._centros):
+            color = COLOR_FICHA[int(self.tablero[idx // COLUMNAS, idx % COLUMNAS])]
+            cv2.circle(img, (int(cx), int(cy)), RADIO_FICHA, color, -1, cv2.LINE_AA)
+        return img
+
+    def leer(self):
+        if self._base is None:
+            self._base = self._dibujar()
+        if self._ruidos:
+            ruido = self._ruidos[self.rng.integers(len(self._ruidos))]
+            frame = np.clip(self._base + ruido, 0, 255).astype(np.uint8)
+        else:
+            frame = self._base.copy()
+        self.contador += 1
+        if self.carpeta is not None:
+            cv2.imwrite(os.path.join(self.carpeta, f"frame_{self.contador:06d}.png"), frame)
+        return frame
+
+    def guardar_coords(self, path):
+        """Guarda las coordenadas en el formato de calibrar_celdas."""
+        np.save(path, self.coords)
+
+
+# ---------------- RIVAL ----------------
+
+class HumanoGuionado:
+    """
+    Juega por la persona. Primero sigue 'guion' (columnas; si alguna no se
+    puede jugar se salta) y después juega al azar o, con modo="ia", con
+    get_best_move a 'profundidad', equivocándose al azar con probabilidad 'error'.
+    """
+
+    def __init__(self, pieza, modo="aleatorio", guion=(), profundidad=2, error=0.0, seed=SEED):
+        self.pieza = pieza
+        self.modo = modo
+        self.guion = list(guion)
+        self.profundidad = profundidad
+        self.error = error
+        self.rng = random.Random(seed)
+        self.tabla = TranspositionTable(4)
+
+    def jugada(self, tablero, turno):
+        """Columna para el tablero (orientación de la IA); 'turno' cuenta desde 0."""
+        validas = get_valid_locations(tablero)
+        if not validas:
+            return None
+        if turno < len(self.guion) and self.guion[turno] in validas:
+            return self.guion[turno]
+        if self.modo == "ia" and self.rng.random() >= self.error:
+            return get_best_move(tablero, self.pieza, 3 - self.pieza, depth=self.profundidad, tt=self.tabla)
+        return self.rng.choice(validas)
+
+
+# ---------------- LATENCIAS ----------------
+
+class Latencias:
+    """Muestras en segundos por etapa."""
+
+    def __init__(self):
+        self.muestras = {etapa: [] for etapa in ETAPAS}
+
+    @contextlib.contextmanager
+    def medir(self, etapa, turno):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - inicio
+            self.muestras[etapa].append(dt)
+            turno[etapa] = dt
+
+    def resumen(self, etapa):
+        m = sorted(self.muestras[etapa])
+        if not m:
+            return None
+
+        def percentil(p):
+            return m[min(len(m) - 1, int(math.ceil(p * len(m))) - 1)]
+
+        return {"n": len(m), "media_ms": round(1000 * sum(m) / len(m), 3),
+                "p50_ms": round(1000 * percentil(0.5), 3), "p90_ms": round(1000 * percentil(0.9), 3),
+                "p99_ms": round(1000 * percentil(0.99), 3), "max_ms": round(1000 * m[-1], 3)}
+
+    def histograma(self, etapa):
+        """Cuántas muestras caen en cada intervalo de LIMITES_MS."""
+        cuentas = [0] * (len(LIMITES_MS) + 1)
+        for dt in self.muestras[etapa]:
+            ms = 1000 * dt
+            cuentas[next((i for i, lim in enumerate(LIMITES_MS) if ms < lim), len(LIMITES_MS))] += 1
+        return cuentas
+
+def imprimir_latencias(etapas, histogramas):
+    """Resumen e histograma de cada etapa, a partir de lo que devuelve simular()."""
+    limites = histogramas["limites_ms"]
+    for etapa in ETAPAS:
+        r = etapas.get(etapa)
+        if r is None:
+            continue
+        print(f"\n{etapa}: {r['n']} muestras, media {r['media_ms']:.2f} ms, p50 {r['p50_ms']:.2f}, "
+              f"p90 {r['p90_ms']:.2f}, p99 {r['p99_ms']:.2f}, máx {r['max_ms']:.2f} ms")
+        cuentas = histogramas[etapa]
+        # Solo del primer al último intervalo con muestras
+        usados = [i for i, n in enumerate(cuentas) if n]
+        mayor = max(cuentas)
+        for i in range(usados[0], usados[-1] + 1):
+            desde = 0 if i == 0 else limites[i - 1]
+            hasta = f"{limites[i]:g}" if i < len(limites) else "..."
+            barra = "#" * round(cuentas[i] / mayor * ANCHO_BARRA)
+            print(f"  {desde:>6g} - {hasta:>6s} ms {cuentas[i]:6d} |{barra}")
+
+
+# ---------------- PARTIDA ----------------
+
+class Simulacion:
+    """Cámara, enlace serial y motor compartidos por todas las partidas simuladas."""
+
+    def __init__(self, enlace, camara, coords_file, depth=DEFAULT_DEPTH, time_ms=None, book=None, workers=1,
+                 verbose=False):
+        self.enlace = enlace
+        self.camara = camara
+        self.coords_file = coords_file
+        self.depth = depth
+        self.time_ms = time_ms
+        self.book = book
+        self.workers = workers
+        self.verbose = verbose
+        self.latencias = Latencias()
+        self.turnos = []
+        self.errores_deteccion = 0
+
+    def _leer(self, seguidor, frame):
+        """Tablero detectado (orientación de la IA); cuenta si no coincide con el dibujado."""
+        try:
+            tablero = seguidor.analizar(frame, mostrar=False)
+        except TransicionImposible:
+            tablero = None
+        if tablero is None or not np.array_equal(tablero, self.camara.tablero):
+            self.errores_deteccion += 1
+            # Se sigue con el tablero real para no arrastrar el error
+            seguidor.confirmar(self.camara.tablero)
+            tablero = self.camara.tablero.copy()
+        return np.flipud(tablero)
+
+    def turno_robot(self, seguidor, tabla, color_robot, color_humano, partida):
+        """Un turno completo del robot. Devuelve la columna jugada o None si no hay jugadas."""
+        turno = {"partida": partida}
+        with self.latencias.medir("turno", turno):
+            # La cámara simulada no cuenta: solo se mide el análisis del frame
+            frame = self.camara.leer()
+            with self.latencias.medir("detección", turno):
+                tablero = self._leer(seguidor, frame)
+            with self.latencias.medir("búsqueda", turno):
+                columna = get_best_move(tablero, color_robot, color_humano, depth=self.depth, tt=tabla,
+                                        time_ms=self.time_ms, book=self.book, workers=self.workers)
+            if columna is None:
+                return None
+            # mover_robot imprime cada pose; en la simulación solo estorba
+            salida = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+            with self.latencias.medir("ik", turno), salida:
+                trayectoria = planear_turno(columna)
+            with self.latencias.medir("serial", turno):
+                self.enlace.enviar_trayectoria(trayectoria)
+            self.camara.soltar(columna, color_robot)
+            frame = self.camara.leer()
+            with self.latencias.medir("verificación", turno):
+                self._leer(seguidor, frame)
+        turno["columna"] = columna
+        self.turnos.append(turno)
+        return columna
+
+    def jugar(self, humano, color_robot, empieza_robot, partida=0):
+        """Juega una partida completa. Devuelve (ganador 0/1/2, jugadas)."""
+        color_humano = humano.pieza
+        self.camara.reiniciar()
+        seguidor = TableroSeguido(coords_file=self.coords_file)
+        self._leer(seguidor, self.camara.leer())
+        tabla = TranspositionTable()
+        jugadas_humano = 0
+        turno_robot = empieza_robot
+        for jugadas in range(FILAS * COLUMNAS):
+            if turno_robot:
+                columna = self.turno_robot(seguidor, tabla, color_robot, color_humano, partida)
+                pieza = color_robot
+            else:
+                columna = humano.jugada(np.flipud(self.camara.tablero), jugadas_humano)
+                jugadas_humano += 1
+                pieza = color_humano
+                if columna is not None:
+                    self.camara.soltar(columna, pieza)
+            if columna is None:
+                return 0, jugadas
+            if self.verbose:
+                print(f"Partida {partida}: {'robot' if turno_robot else 'humano'} juega en la columna {columna}")
+            if check_winner(np.flipud(self.camara.tablero)) == pieza:
+                return pieza, jugadas + 1
+            turno_robot = not turno_robot
+        return 0, FILAS * COLUMNAS
+
+
+def simular(partidas, rival="aleatorio", guion=(), profundidad_rival=2, error_rival=0.0,
+            depth=DEFAULT_DEPTH, time_ms=None, book=None, workers=1, escala=0.0, ruido=RUIDO,
+            seed=SEED, carpeta_frames=None, verbose=False, progreso=print):
+    """
+    Juega 'partidas' partidas alternando quién empieza y el color del robot.
+    Devuelve un diccionario con resultados, latencias e histogramas.
+    """
+    random.seed(seed)
+    if carpeta_frames is not None:
+        os.makedirs(carpeta_frames, exist_ok=True)
+    camara = CamaraSimulada(ruido=ruido, seed=seed, carpeta=carpeta_frames)
+
+    # La calibración de la cámara simulada queda junto a los frames o en una carpeta temporal
+    temporal = tempfile.TemporaryDirectory(prefix="simulacion_") if carpeta_frames is None else None
+    coords_file = os.path.join(carpeta_frames or temporal.name, "cell_coords.npy")
+    camara.guardar_coords(coords_file)
+
+    resultados = {"robot": 0, "humano": 0, "empates": 0}
+    jugadas_totales = 0
+    inicio = time.perf_counter()
+    try:
+        with ESP32Simulado(escala_tiempo=escala) as esp32:
+            ser = serial.Serial(esp32.puerto, 115200, timeout=1)
+            sim = Simulacion(EnlaceSerial(ser), camara, coords_file, depth, time_ms, book, workers, verbose)
+            for p in range(partidas):
+                color_robot = 1 + p % 2
+                humano = HumanoGuionado(3 - color_robot, rival, guion, profundidad_rival, error_rival, seed + p)
+                empieza_robot = (p // 2) % 2 == 1
+                ganador, jugadas = sim.jugar(humano, color_robot, empieza_robot, p)
+                jugadas_totales += jugadas
+                clave = "empates" if ganador == 0 else ("robot" if ganador == color_robot else "humano")
+                resultados[clave] += 1
+                if progreso is not None:
+                    progreso(f"Partida {p + 1}/{partidas}: {clave if ganador == 0 else 'gana el ' + clave} "
+                             f"en {jugadas} jugadas ({time.perf_counter() - inicio:.1f} s)")
+            ser.close()
+    finally:
+        if temporal is not None:
+            temporal.cleanup()
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "partidas": partidas, **resultados,
+        "jugadas": jugadas_totales, "turnos_robot": len(sim.turnos),
+        "errores_deteccion": sim.errores_deteccion, "segundos": round(segundos, 2),
+        "turnos_por_segundo": round(len(sim.turnos) / segundos, 2) if segundos > 0 else None,
+        "etapas": {e: sim.latencias.resumen(e) for e in ETAPAS},
+        "histogramas": {"limites_ms": list(LIMITES_MS), **{e: sim.latencias.histograma(e) for e in ETAPAS}},
+        "turnos": [{k: round(v, 6) if isinstance(v, float) else v for k, v in t.items()} for t in sim.turnos],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partidas completas simuladas sin cámara, ESP32 ni persona")
+    parser.add_argument("--partidas", type=int, default=10)
+    parser.add_argument("--rival", choices=("aleatorio", "ia"), default="aleatorio",
+                        help="cómo juega el humano simulado después del guion")
+    parser.add_argument("--guion", default="", help="primeras columnas del humano, p. ej. 3,3,2")
+    parser.add_argument("--profundidad-rival", type=int, default=2)
+    parser.add_argument("--error-rival", type=float, default=0.0, help="probabilidad de una jugada al azar")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--time-ms", type=int, help="tiempo por jugada del robot (en vez de profundidad fija)")
+    parser.add_argument("--libro", default=DEFAULT_BOOK_FILE, help="libro de aperturas (si existe)")
+    parser.add_argument("--workers", type=int, default=1, help="procesos para la búsqueda del robot")
+    parser.add_argument("--escala", type=float, default=0.0,
+                        help="duración de los movimientos del ESP32 simulado (0 = instantáneo, 1 = tiempo real)")
+    parser.add_argument("--ruido", type=float, default=RUIDO, help="ruido de la cámara simulada")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--frames", help="carpeta donde guardar los frames dibujados")
+    parser.add_argument("--out", help="archivo JSON con resultados, latencias y cada turno")
+    parser.add_argument("--verbose", action="store_true", help="imprime cada jugada y las poses")
+    args = parser.parse_args()
+
+    guion = [int(c) for c in args.guion.split(",") if c.strip()]
+    libro = OpeningBook(args.libro) if args.libro and os.path.exists(args.libro) else None
+    r = simular(args.partidas, args.rival, guion, args.profundidad_rival, args.error_rival, args.depth,
+                args.time_ms, libro, args.workers, args.escala, args.ruido, args.seed, args.frames, args.verbose)
+
+    print(f"\n{r['partidas']} partidas en {r['segundos']} s: robot {r['robot']}, humano {r['humano']}, "
+          f"empates {r['empates']}; {r['turnos_robot']} turnos del robot ({r['turnos_por_segundo']} por segundo), "
+          f"{r['errores_deteccion']} errores de detección")
+    imprimir_latencias(r["etapas"], r["histogramas"])
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(r, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
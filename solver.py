@@ -0,0 +1,209 @@
+"""
+Solucionador exacto para el final de la partida.
+
+Con pocas casillas vacías el árbol completo es chico y no hace falta adivinar
+con la heurística: se busca hasta el final con negamax y se obtiene el
+resultado demostrado (gana, empata o pierde) y en cuántas jugadas.
+
+El puntaje sigue la convención habitual de los solucionadores de Conecta 4:
+para quien mueve, 0 es empate, positivo es ganar y negativo perder, y su valor
+absoluto es (ROWS*COLS/2 + 1) menos las fichas que tiene el ganador al hacer
+4 en línea; ganar antes vale más. Con esos límites conocidos la búsqueda se
+hace con ventanas nulas (dicotomía sobre el puntaje), que cortan mucho más que
+una ventana completa:
+
+- solo se prueban jugadas que no le dejan una victoria inmediata al rival
+- las jugadas se ordenan por cuántas amenazas nuevas crean (y luego al centro)
+- una tabla guarda la cota superior de cada posición ya resuelta
+
+La posición es la de bitboard (bit = columna * (ROWS + 1) + fila) reducida a
+dos máscaras: las fichas de quien mueve y todas las fichas.
+"""
+
+from bitboard import ROWS, COLS, H1
+
+# --------------------
+# Configuración / constantes
+# --------------------
+CELLS = ROWS * COLS
+MAX_TABLE = 1 << 16           # entradas de la tabla antes de vaciarla (~100 B cada una)
+CHECK_NODES = 4096            # cada cuántos nodos se revisa 'stop'
+
+BOTTOM_MASK = sum(1 << (c * H1) for c in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+COLUMN_MASKS = [((1 << ROWS) - 1) << (c * H1) for c in range(COLS)]
+# Columnas del centro hacia afuera: 3, 2, 4, 1, 5, 0, 6
+COLUMN_ORDER = sorted(range(COLS), key=lambda c: (abs(c - COLS // 2), c))
+
+
+class SolverAborted(Exception):
+    """Se lanza cuando se cancela la resolución con 'stop'."""
+
+
+def winning_cells(position, mask):
+    """Casillas vacías donde 'position' completaría 4 en línea."""
+    # vertical
+    r = (position << 1) & (position << 2) & (position << 3)
+    # horizontal y las dos diagonales
+    for s in (H1, H1 - 1, H1 + 1):
+        p = (position << s) & (position << 2 * s)
+        r |= p & (position << 3 * s)
+        r |= p & (position >> s)
+        p = (position >> s) & (position >> 2 * s)
+        r |= p & (position << s)
+        r |= p & (position >> 3 * s)
+    return r & (BOARD_MASK ^ mask)
+
+
+def possible(mask):
+    """Casillas donde se puede jugar ahora (la primera libre de cada columna)."""
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+def score_to_result(score, moves):
+    """
+    Traduce un puntaje exacto a (resultado, jugadas), con resultado 1 si gana
+    quien mueve, 0 si es empate y -1 si pierde, y jugadas = medias jugadas
+    desde ahora hasta el 4 en línea (None en empate).
+    """
+    if score == 0:
+        return 0, None
+    stones = CELLS // 2 + 1 - abs(score)          # fichas del ganador al ganar
+    if score > 0:
+        return 1, 2 * (stones - moves // 2) - 1
+    return -1, 2 * (stones - (moves + 1) // 2)
+
+
+class Solver:
+    """
+    Resuelve posiciones de forma exacta. La tabla se conserva entre llamadas,
+    así que conviene reutilizar el mismo Solver durante una partida, pero no
+    desde dos hilos a la vez. Con 16 casillas vacías una resolución guarda
+    menos de 2000 posiciones, así que MAX_TABLE alcanza para varias jugadas.
+    """
+
+    def __init__(self, max_table=MAX_TABLE):
+        self.max_table = max_table
+        self.table = {}
+        self.nodes = 0
+
+    # ---- búsqueda ----
+
+    def _negamax(self, current, mask, moves, alpha, beta, stop):
+        # Precondición: quien mueve no puede ganar en esta jugada
+        self.nodes += 1
+        if stop is not None and self.nodes % CHECK_NODES == 0 and stop.is_set():
+            raise SolverAborted()
+
+        opp_win = winning_cells(current ^ mask, mask)
+        moves_mask = possible(mask)
+        forced = moves_mask & opp_win
+        if forced:
+            if forced & (forced - 1):
+                # Dos amenazas del rival: se pierde en su próxima jugada
+                return -((CELLS - moves) // 2)
+            moves_mask = forced
+        # No jugar debajo de una casilla donde el rival gana
+        moves_mask &= ~(opp_win >> 1)
+        if not moves_mask:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            return 0
+
+        lower = -((CELLS - 2 - moves) // 2)
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+        upper = (CELLS - 1 - moves) // 2
+        key = current + mask
+        cached = self.table.get(key)
+        if cached is not None:
+            upper = cached
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        # Primero las jugadas que crean más casillas ganadoras propias
+        children = []
+        for c in COLUMN_ORDER:
+            move = moves_mask & COLUMN_MASKS[c]
+            if move:
+                threats = winning_cells(current | move, mask).bit_count()
+                children.append((-threats, len(children), move))
+        children.sort()
+
+        for _, _, move in children:
+            score = -self._negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha, stop)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        if len(self.table) >= self.max_table:
+            self.table.clear()
+        self.table[key] = alpha
+        return alpha
+
+    def _value(self, current, mask, moves, alpha, beta, stop):
+        # negamax sin la precondición: primero revisa la victoria inmediata
+        if winning_cells(current, mask) & possible(mask):
+            return (CELLS + 1 - moves) // 2
+        return self._negamax(current, mask, moves, alpha, beta, stop)
+
+    def _solve(self, current, mask, moves, stop):
+        # Dicotomía con ventanas nulas hasta que las cotas se juntan
+        if winning_cells(current, mask) & possible(mask):
+            return (CELLS + 1 - moves) // 2
+        lo = -((CELLS - moves) // 2)
+        hi = (CELLS + 1 - moves) // 2
+        while lo < hi:
+            med = lo + (hi - lo) // 2
+            # Se prueba primero cerca de 0: empates y resultados cortos son los más comunes
+            if med <= 0 and -(-lo // 2) < med:
+                med = -(-lo // 2)
+            elif med >= 0 and hi // 2 > med:
+                med = hi // 2
+            r = self._negamax(current, mask, moves, med, med + 1, stop)
+            if r <= med:
+                hi = r
+            else:
+                lo = r
+        return lo
+
+    # ---- interfaz ----
+
+    @staticmethod
+    def _masks(pos, piece):
+        mask = pos.bits[1] | pos.bits[2]
+        return pos.bits[piece], mask, mask.bit_count()
+
+    def solve(self, pos, piece, stop=None):
+        """Puntaje exacto de la posición (BitBoard) para 'piece', que es quien mueve."""
+        return self._solve(*self._masks(pos, piece), stop)
+
+    def best_move(self, pos, piece, stop=None):
+        """
+        Mejor columna para 'piece' en la posición (BitBoard) y su puntaje exacto.
+        Entre jugadas con el mismo puntaje se queda con la más central. Devuelve
+        (None, None) si no hay jugadas.
+        """
+        current, mask, moves = self._masks(pos, piece)
+        playable = possible(mask)
+        best_col, best = None, None
+        for c in COLUMN_ORDER:
+            move = playable & COLUMN_MASKS[c]
+            if not move:
+                continue
+            if winning_cells(current, mask) & move:
+                return c, (CELLS + 1 - moves) // 2
+            child = (current ^ mask, mask | move, moves + 1)
+            if best is not None:
+                # Ventana nula: solo interesa saber si supera a la mejor hasta ahora
+                if -self._value(*child, -(best + 1), -best, stop) <= best:
+                    continue
+            score = -self._solve(*child, stop)
+            if best is None or score > best:
+                best_col, best = c, score
+        return best_col, best
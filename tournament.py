@@ -0,0 +1,280 @@
+"""
+Torneo de autojuego para ajustar los pesos de la heurística de ai_conecta4.
+
+Cada motor es un juego de pesos (EvalParams). Todos juegan contra todos desde
+aperturas aleatorias sembradas: cada apertura se juega dos veces, una con cada
+motor empezando, para que la ventaja de salida se cancele. Las partidas se
+reparten en un pool de procesos y corren sin cámara ni puerto serial.
+
+Por cada par se reporta victorias/empates/derrotas, el puntaje con su intervalo
+de confianza, la diferencia de Elo equivalente y la probabilidad de que el
+primero sea mejor (LOS). Con la misma semilla el torneo se repite igual.
+
+El solucionador exacto del final queda apagado: con él los dos motores juegan
+perfecto en cuanto quedan pocas casillas y el final no mide los pesos. Con
+--solver N se enciende igual que en get_best_move.
+
+Un motor se escribe como pesos separados por comas sobre los de siempre
+("base" = sin cambios):
+    python tournament.py base "three=200,opp_three=-400" "center=12" --openings 500
+    python tournament.py base "two=5" --depth 4 --workers 8 --out torneo.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ai_conecta4 as ai
+from bitboard import ROWS, COLS
+from transposition import TranspositionTable
+
+DEFAULT_ENGINES = ("base", "center=12")
+DEFAULT_OPENINGS = 100        # aperturas por par de motores (2 partidas por apertura)
+OPENING_PLIES = 4             # jugadas aleatorias antes de que empiecen los motores
+DEFAULT_DEPTH = 4
+SEED = 1234
+GAME_TT_MB = 4                # tabla de cada motor en cada partida
+Z_95 = 1.959964               # intervalos de confianza al 95 %
+MAX_ELO = 800                 # tope del Elo reportado cuando un motor gana o pierde todo
+
+
+# --------------------
+# Motores
+# --------------------
+
+def parse_engine(spec):
+    """'base' o 'peso=valor,peso=valor' -> EvalParams."""
+    spec = spec.strip()
+    if spec in ("", "base"):
+        return ai.DEFAULT_PARAMS
+    values = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in ai.EvalParams._fields:
+            raise ValueError(f"Peso desconocido en '{item}'; se aceptan {', '.join(ai.EvalParams._fields)}")
+        values[name] = int(value)
+    return ai.DEFAULT_PARAMS._replace(**values)
+
+
+# --------------------
+# Aperturas y partidas
+# --------------------
+
+def _apply(board, col, piece):
+    ai.drop_piece(board, ai.get_next_open_row(board, col), col, piece)
+
+
+def random_opening(rng, plies=OPENING_PLIES):
+    """
+    Jugadas aleatorias desde el tablero vacío. Se descartan las que dejan una
+    victoria inmediata para el que mueve, porque decidirían la partida solas.
+    """
+    while True:
+        board = np.zeros((ROWS, COLS), dtype=int)
+        moves = []
+        for i in range(plies):
+            col = rng.choice(ai.get_valid_locations(board))
+            _apply(board, col, 1 + i % 2)
+            moves.append(col)
+        piece = 1 + plies % 2
+        if not any(ai.try_move_and_win(board, c, piece) for c in ai.get_valid_locations(board)):
+            return moves
+
+
+def make_openings(n, plies=OPENING_PLIES, seed=SEED):
+    """n aperturas distintas (si hay suficientes) generadas con la semilla."""
+    rng = random.Random(seed)
+    openings, seen = [], set()
+    for _ in range(n * 20):
+        if len(openings) == n:
+            break
+        moves = random_opening(rng, plies)
+        if tuple(moves) not in seen:
+            seen.add(tuple(moves))
+            openings.append(moves)
+    return openings
+
+
+def play_game(first, second, opening, depth=DEFAULT_DEPTH, time_ms=None, seed=0, solve_empty=None):
+    """
+    Juega una partida: 'first' (EvalParams) mueve con la pieza 1 después de la
+    apertura y 'second' con la 2. Devuelve (ganador 0/1/2, jugadas totales).
+    solve_empty se pasa a get_best_move (None = sin solucionador exacto).
+    """
+    random.seed(seed)
+    params = {1: first, 2: second}
+    tables = {1: TranspositionTable(GAME_TT_MB), 2: TranspositionTable(GAME_TT_MB)}
+    board = np.zeros((ROWS, COLS), dtype=int)
+    for i, col in enumerate(opening):
+        _apply(board, col, 1 + i % 2)
+    piece = 1 + len(opening) % 2
+    plies = len(opening)
+    while True:
+        col = ai.get_best_move(board, piece, 3 - piece, depth=depth, tt=tables[piece], time_ms=time_ms,
+                               params=params[piece], solve_empty=solve_empty)
+        if col is None:
+            return 0, plies
+        _apply(board, col, piece)
+        plies += 1
+        if ai.winning_move(board, piece):
+            return piece, plies
+        piece = 3 - piece
+
+
+def _play_task(task):
+    # Corre en un proceso del pool
+    i, j, opening, depth, time_ms, seed, engines, solve_empty = task
+    winner, plies = play_game(engines[i], engines[j], opening, depth, time_ms, seed, solve_empty)
+    return i, j, winner, plies
+
+
+# --------------------
+# Estadística
+# --------------------
+
+def elo_from_score(score):
+    """Diferencia de Elo que corresponde a un puntaje esperado (0..1)."""
+    if score <= 0:
+        return -MAX_ELO
+    if score >= 1:
+        return MAX_ELO
+    return max(-MAX_ELO, min(MAX_ELO, -400 * math.log10(1 / score - 1)))
+
+
+def score_interval(wins, draws, losses, z=Z_95):
+    """Puntaje medio y su intervalo de confianza (aproximación normal por partida)."""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.5, 0.0, 1.0
+    score = (wins + 0.5 * draws) / n
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    margin = z * math.sqrt(var / n)
+    return score, max(0.0, score - margin), min(1.0, score + margin)
+
+
+def likelihood_of_superiority(wins, losses):
+    """Probabilidad de que el primero sea más fuerte (los empates no cuentan)."""
+    if wins + losses == 0:
+        return 0.5
+    return 0.5 * (1 + math.erf((wins - losses) / math.sqrt(2 * (wins + losses))))
+
+
+def summarize(wins, draws, losses):
+    score, lo, hi = score_interval(wins, draws, losses)
+    return {
+        "games": wins + draws + losses, "wins": wins, "draws": draws, "losses": losses,
+        "score": round(score, 4), "score_ci": [round(lo, 4), round(hi, 4)],
+        "elo": round(elo_from_score(score), 1),
+        "elo_ci": [round(elo_from_score(lo), 1), round(elo_from_score(hi), 1)],
+        "los": round(likelihood_of_superiority(wins, losses), 4),
+    }
+
+
+# --------------------
+# Torneo
+# --------------------
+
+def run_tournament(engines, openings, depth=DEFAULT_DEPTH, time_ms=None, workers=None, seed=SEED,
+                   progress=print, solve_empty=None):
+    """
+    Todos contra todos: cada par juega cada apertura con ambos colores.
+    'engines' es una lista de EvalParams. Devuelve un diccionario con los
+    resultados por par y por motor.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    for i, j in itertools.combinations(range(len(engines)), 2):
+        for opening in openings:
+            tasks.append((i, j, opening, depth, time_ms, rng.getrandbits(32), engines, solve_empty))
+            tasks.append((j, i, opening, depth, time_ms, rng.getrandbits(32), engines, solve_empty))
+
+    n = len(engines)
+    # record[i][j] = [victorias, empates, derrotas] de i contra j
+    record = [[[0, 0, 0] for _ in range(n)] for _ in range(n)]
+    plies = []
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    step = max(1, len(tasks) // 10)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunk = max(1, len(tasks) // (workers * 8))
+        for k, (i, j, winner, p) in enumerate(pool.map(_play_task, tasks, chunksize=chunk), 1):
+            # i jugó con la pieza 1: gana si gana la 1, pierde si gana la 2
+            outcome = {1: 0, 0: 1, 2: 2}[winner]
+            record[i][j][outcome] += 1
+            record[j][i][2 - outcome] += 1
+            plies.append(p)
+            if progress is not None and (k % step == 0 or k == len(tasks)):
+                progress(f"{k}/{len(tasks)} partidas ({time.perf_counter() - start:.1f} s)")
+    elapsed = time.perf_counter() - start
+
+    pairs = []
+    for i, j in itertools.combinations(range(n), 2):
+        pairs.append({"a": i, "b": j, **summarize(*record[i][j])})
+    totals = []
+    for i in range(n):
+        w, d, l = (sum(record[i][j][k] for j in range(n) if j != i) for k in range(3))
+        totals.append({"engine": i, **summarize(w, d, l)})
+    return {
+        "pairs": pairs, "totals": totals, "games": len(tasks), "seconds": round(elapsed, 2),
+        "games_per_second": round(len(tasks) / elapsed, 2) if elapsed > 0 else None,
+        "mean_plies": round(sum(plies) / len(plies), 2) if plies else None,
+    }
+
+
+def print_results(names, results):
+    print(f"\n{results['games']} partidas en {results['seconds']} s "
+          f"({results['games_per_second']} por segundo, {results['mean_plies']} jugadas en promedio)")
+    print("\nPor par (puntaje del primero, IC 95 %):")
+    for p in results["pairs"]:
+        print(f"  {names[p['a']]} vs {names[p['b']]}: +{p['wins']} ={p['draws']} -{p['losses']}  "
+              f"{p['score']:.1%} [{p['score_ci'][0]:.1%}, {p['score_ci'][1]:.1%}]  "
+              f"Elo {p['elo']:+.0f} [{p['elo_ci'][0]:+.0f}, {p['elo_ci'][1]:+.0f}]  LOS {p['los']:.1%}")
+    print("\nContra todos los demás:")
+    for t in sorted(results["totals"], key=lambda t: -t["score"]):
+        print(f"  {names[t['engine']]:30s} {t['score']:.1%} [{t['score_ci'][0]:.1%}, {t['score_ci'][1]:.1%}]  "
+              f"Elo {t['elo']:+.0f} [{t['elo_ci'][0]:+.0f}, {t['elo_ci'][1]:+.0f}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Torneo de autojuego entre juegos de pesos de la heurística")
+    parser.add_argument("engines", nargs="*", default=list(DEFAULT_ENGINES),
+                        help="'base' o pesos como 'three=200,center=8' (campos de EvalParams)")
+    parser.add_argument("--openings", type=int, default=DEFAULT_OPENINGS, help="aperturas por par de motores")
+    parser.add_argument("--plies", type=int, default=OPENING_PLIES, help="jugadas aleatorias de cada apertura")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--time-ms", type=int, help="tiempo por jugada (en vez de profundidad fija)")
+    parser.add_argument("--workers", type=int, help="procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--solver", type=int, metavar="N",
+                        help="resolver de forma exacta con N casillas vacías o menos (por defecto, apagado)")
+    parser.add_argument("--out", help="archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    if len(args.engines) < 2:
+        parser.error("hacen falta al menos dos motores")
+    engines = [parse_engine(spec) for spec in args.engines]
+    openings = make_openings(args.openings, args.plies, args.seed)
+    print(f"{len(args.engines)} motores, {len(openings)} aperturas de {args.plies} jugadas, "
+          f"{'%d ms' % args.time_ms if args.time_ms else 'profundidad %d' % args.depth}")
+
+    results = run_tournament(engines, openings, args.depth, args.time_ms, args.workers, args.seed,
+                             solve_empty=args.solver)
+    print_results(args.engines, results)
+    if args.out:
+        results["engines"] = [{"name": name, "params": p._asdict()} for name, p in zip(args.engines, engines)]
+        results["settings"] = {"openings": len(openings), "plies": args.plies, "depth": args.depth,
+                               "time_ms": args.time_ms, "seed": args.seed, "solver": args.solver}
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Tabla de transposición para el minimax de ai_conecta4.
+
+Cada entrada guarda (clave, profundidad, puntaje, tipo de cota, mejor columna,
+generación). La tabla tiene tamaño fijo según el límite de memoria y se puede
+conservar entre jugadas de una misma partida.
+"""
+
+import random
+
+# --------------------
+# Tipos de cota
+# --------------------
+EXACT = 0
+LOWER = 1   # el valor real es >= puntaje (corte beta)
+UPPER = 2   # el valor real es <= puntaje (ningún movimiento superó alfa)
+
+DEFAULT_MAX_MB = 16
+# Estimación del costo en memoria de una entrada (tupla + enteros de Python)
+ENTRY_BYTES = 200
+
+POLICIES = ("depth", "two-tier")
+
+# Claves para distinguir quién mueve y con qué pieza juega la IA; se combinan
+# con BitBoard.key (ver search_key).
+_rng = random.Random(0x7AB1E)
+_SIDE_KEYS = {(m, p): _rng.getrandbits(64) for m in (True, False) for p in (1, 2)}
+
+
+def search_key(pos, maximizingPlayer, ai_piece):
+    return pos.key ^ _SIDE_KEYS[(maximizingPlayer, ai_piece)]
+
+
+class TranspositionTable:
+    """
+    Tabla hash de tamaño acotado.
+    - max_mb: memoria aproximada que puede usar la tabla
+    - policy: "depth" (una entrada por índice, se conserva la más profunda) o
+      "two-tier" (una entrada preferida por profundidad y otra que siempre se reemplaza)
+    """
+
+    def __init__(self, max_mb=DEFAULT_MAX_MB, policy="two-tier"):
+        if policy not in POLICIES:
+            raise ValueError(f"policy debe ser uno de {POLICIES}")
+        self.policy = policy
+        slots = max(1, int(max_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.size = slots // 2 if policy == "two-tier" else slots
+        self.size = max(1, self.size)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.clear()
+
+    def clear(self):
+        self._deep = [None] * self.size
+        self._recent = [None] * self.size if self.policy == "two-tier" else None
+
+    def new_search(self):
+        """Llamar antes de cada búsqueda; las entradas viejas pasan a ser reemplazables."""
+        self.generation += 1
+
+    def probe(self, key):
+        """Devuelve (clave, profundidad, puntaje, cota, columna, generación) o None."""
+        self.probes += 1
+        i = key % self.size
+        entry = self._deep[i]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        if self._recent is not None:
+            entry = self._recent[i]
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        i = key % self.size
+        entry = (key, depth, score, flag, move, self.generation)
+        old = self._deep[i]
+        # Las entradas se guardan como una sola tupla para que la escritura sea atómica
+        if old is None or old[0] == key or old[1] <= depth or old[5] != self.generation:
+            if self._recent is not None and old is not None and old[0] != key:
+                self._recent[i] = old
+            self._deep[i] = entry
+        elif self._recent is not None:
+            self._recent[i] = entry
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
@@ -0,0 +1,196 @@
+"""
+Trayectoria completa del turno del robot en el espacio articular.
+
+En vez de mandar los 5 puntos (10 -> 9 -> columna -> 9 -> 11) uno por uno y
+detenerse en cada uno, se calculan todos con CI.mover_robot y se arma una sola
+trayectoria con tramos lineales y mezclas parabólicas (LSPB con puntos de paso):
+
+- El brazo se detiene solo donde cambia la pinza (tomar y soltar la ficha) y
+  en los extremos; en el punto medio 9 pasa sin detenerse, cortando la esquina
+  con una mezcla de aceleración constante.
+- Todas las articulaciones comparten los tiempos de cada tramo y respetan
+  VEL_MAX y ACEL_MAX.
+
+El resultado es una lista de tramos de aceleración constante
+(duración, q0, v0, a, servo) que protocolo_serial manda en un solo mensaje.
+"""
+
+import collections
+
+import numpy as np
+
+from CI import mover_robot
+
+# ---------------- CONFIGURACIÓN ----------------
+VEL_MAX = np.array([60.0, 60.0, 60.0, 90.0])       # °/s por articulación
+ACEL_MAX = np.array([120.0, 120.0, 120.0, 180.0])  # °/s² por articulación
+PAUSA_PINZA_S = 0.5      # tiempo para que el servo abra o cierre la pinza
+PUNTOS_DE_PASO = (9,)    # objetivos de valor() donde no hace falta detenerse
+REPOSO = 11              # donde queda el brazo al terminar cada turno
+AJUSTE = 1.02           # factor con que se alarga un tramo que no cumple
+MAX_AJUSTES = 1000
+# ------------------------------------------------
+
+# Tramo de aceleración constante: q(t) = q0 + v0*t + a*t²/2 para 0 <= t <= duracion
+Tramo = collections.namedtuple("Tramo", "duracion q0 v0 a servo")
+
+
+class Trayectoria:
+    """Secuencia de tramos; puede evaluarse en cualquier instante para revisarla."""
+
+    def __init__(self, tramos, paradas=None):
+        self.tramos = tramos
+        self.inicios = np.concatenate([[0.0], np.cumsum([t.duracion for t in tramos])])
+        # Índice del punto donde se detiene -> número de tramos hasta ahí (incluida la pausa de la pinza)
+        self.paradas = paradas or {}
+
+    def partir(self, punto):
+        """Divide la trayectoria en la parada del punto 'punto': (hasta ahí, desde ahí)."""
+        k = self.paradas[punto]
+        return Trayectoria(self.tramos[:k]), Trayectoria(self.tramos[k:])
+
+    @property
+    def duracion(self):
+        return float(self.inicios[-1])
+
+    def evaluar(self, t):
+        """Devuelve (q, v, a) en grados en el instante t."""
+        i = int(np.clip(np.searchsorted(self.inicios, t, side="right") - 1, 0, len(self.tramos) - 1))
+        tramo = self.tramos[i]
+        tau = min(max(t - self.inicios[i], 0.0), tramo.duracion)
+        q = tramo.q0 + tramo.v0 * tau + 0.5 * tramo.a * tau ** 2
+        return q, tramo.v0 + tramo.a * tau, tramo.a
+
+    def valores(self):
+        """Lista plana por tramo: duración, q0 (4), v0 (4), a (4) y servo."""
+        return [[round(float(t.duracion), 4), *np.round(t.q0, 4).tolist(), *np.round(t.v0, 4).tolist(),
+                 *np.round(t.a, 4).tolist(), t.servo] for t in self.tramos]
+
+
+# ---------------- PLANEACIÓN ----------------
+
+def _mezclas(puntos, td, amax):
+    """
+    Duración común de la mezcla en cada punto y velocidad de cada tramo lineal,
+    o None si con estos tiempos no alcanza la aceleración.
+    """
+    n = len(td)
+    deltas = np.diff(puntos, axis=0)
+    # Aceleración necesaria normalizada: la articulación más exigida fija la mezcla
+    d_ini = np.max(np.abs(deltas[0]) / amax)
+    d_fin = np.max(np.abs(deltas[-1]) / amax)
+    if n == 1:
+        disc = td[0] ** 2 - 4 * d_ini
+        if disc < 0:
+            return None
+        b = (td[0] - np.sqrt(disc)) / 2
+        return np.array([b, b]), deltas / (td[0] - b)
+
+    disc_ini, disc_fin = td[0] ** 2 - 2 * d_ini, td[-1] ** 2 - 2 * d_fin
+    if disc_ini < 0 or disc_fin < 0:
+        return None
+    b = np.empty(n + 1)
+    b[0] = td[0] - np.sqrt(disc_ini)
+    b[-1] = td[-1] - np.sqrt(disc_fin)
+    v = deltas / td[:, None]
+    # Los tramos extremos se extrapolan para llegar en reposo a los puntos de inicio y fin
+    v[0] = deltas[0] / (td[0] - b[0] / 2)
+    v[-1] = deltas[-1] / (td[-1] - b[-1] / 2)
+    for k in range(1, n):
+        b[k] = np.max(np.abs(v[k] - v[k - 1]) / amax)
+    return b, v
+
+
+def _lineales(td, b):
+    """Duración de la parte lineal de cada tramo."""
+    n = len(td)
+    lineal = np.array(td, dtype=float)
+    lineal -= np.where(np.arange(n) == 0, b[:-1], b[:-1] / 2)
+    lineal -= np.where(np.arange(n) == n - 1, b[1:], b[1:] / 2)
+    return lineal
+
+
+def planear_tramo(puntos, servo, vmax=VEL_MAX, amax=ACEL_MAX):
+    """
+    Tramos de aceleración constante que van de puntos[0] a puntos[-1] en reposo,
+    pasando cerca de los puntos intermedios sin detenerse.
+    """
+    puntos = np.asarray(puntos, dtype=float)
+    deltas = np.diff(puntos, axis=0)
+    # Se empieza por el tiempo a velocidad máxima (cota inferior) y se alargan
+    # los tramos hasta que las mezclas caben y se respetan los límites
+    td = np.maximum(np.max(np.abs(deltas) / vmax, axis=1), 1e-3)
+
+    for _ in range(MAX_AJUSTES):
+        r = _mezclas(puntos, td, amax)
+        if r is None:
+            td[[0, -1]] *= AJUSTE
+            continue
+        b, v = r
+        lineal = _lineales(td, b)
+        lentos = (lineal < -1e-9) | np.any(np.abs(v) > vmax + 1e-9, axis=1)
+        if not lentos.any():
+            break
+        td[lentos] *= AJUSTE
+    else:
+        raise ValueError("No se encontraron tiempos que respeten los límites")
+
+    tramos = []
+    q = puntos[0].copy()
+    vel = np.zeros_like(q)
+
+    def agregar(duracion, a):
+        nonlocal q, vel
+        if duracion <= 1e-9:
+            return
+        tramos.append(Tramo(float(duracion), q.copy(), vel.copy(), a, servo))
+        q = q + vel * duracion + 0.5 * a * duracion ** 2
+        vel = vel + a * duracion
+
+    n = len(td)
+    agregar(b[0], v[0] / b[0] if b[0] > 0 else np.zeros_like(q))
+    for k in range(n):
+        agregar(lineal[k], np.zeros_like(q))
+        if k < n - 1:
+            agregar(b[k + 1], (v[k + 1] - v[k]) / b[k + 1])
+    agregar(b[-1], -v[-1] / b[-1] if b[-1] > 0 else np.zeros_like(q))
+    return tramos
+
+
+def planear(puntos, servos, paso=(), vmax=VEL_MAX, amax=ACEL_MAX, pausa=PAUSA_PINZA_S):
+    """
+    Trayectoria por los 'puntos' (ángulos en grados) con el servo de cada uno.
+    Se detiene en los extremos y donde cambia la pinza; los índices en 'paso'
+    se cruzan sin detenerse si la pinza no cambia ahí.
+    """
+    tramos = []
+    paradas = {}
+    inicio = 0
+    for i in range(1, len(puntos)):
+        # El servo de cada punto se aplica al llegar a él
+        if i == len(puntos) - 1 or i not in paso or servos[i] != servos[i - 1]:
+            if not np.allclose(puntos[inicio], puntos[i]):
+                tramos += planear_tramo(puntos[inicio:i + 1], servos[inicio], vmax, amax)
+            if servos[i] != servos[inicio]:
+                # Detenido en el punto, se da tiempo a la pinza
+                tramos.append(Tramo(pausa, np.asarray(puntos[i], dtype=float), np.zeros(len(puntos[i])),
+                                    np.zeros(len(puntos[i])), servos[i]))
+            paradas[i] = len(tramos)
+            inicio = i
+    return Trayectoria(tramos, paradas)
+
+
+def planear_turno(columna, inicio=REPOSO, partir=False):
+    """
+    Trayectoria de un turno: reposo -> toma (10) -> 9 -> columna -> 9 -> reposo (11).
+    Con partir=True devuelve (ida, regreso) divididas después de soltar la ficha.
+    """
+    objetivos = [inicio, 10, 9, columna, 9, 11]
+    puntos, servos = [], []
+    for c in objetivos:
+        arr = mover_robot(c)      # lanza SinSolucionIK si el objetivo no se alcanza
+        puntos.append([float(x) for x in arr[:4]])
+        servos.append(int(arr[4]))
+    paso = [i for i, c in enumerate(objetivos) if c in PUNTOS_DE_PASO]
+    trayectoria = planear(puntos, servos, paso)
+    return trayectoria.partir(3) if partir else trayectoria